@@ -0,0 +1,128 @@
+"""
+Stage declarations for the analysis pipeline, shared by the dashboard and the batch report.
+
+Sources: 'source' (CSV path or uploaded file), 'outlier_cols', 'as_of'
+(tenure reference date, None for today) and 'sample_rows' (size of the
+stratified exploration sample, None for none). Passing 'features' (plus
+'new_features' and 'feature_insights') as sources, e.g. from the feature
+store, skips the feature stage.
+After feature engineering the segmentation, credit-risk and deposit-growth
+stages only read 'features' and run concurrently. The univariate, bivariate
+and geographical tabs read the loaded frame (the session sample when there
+is one), so their stages run alongside capping, features and the models.
+
+Capping and feature engineering run with copy=False: each frame shares the
+unchanged columns of the one before it and only holds its own new or replaced
+columns, so raw, capped and features together cost little more than raw.
+
+backend='arrow' (see arrow_backend) reads the CSV with Arrow's multi-threaded
+reader and caps and engineers features on `threads` threads; processes > 1
+engineers features over row partitions in a process pool (see
+partitioned_features). The stage outputs are the same either way.
+"""
+import importlib
+import threading
+from functools import partial
+
+from banking_analysis import load_and_preprocess, optimize_dtypes, summarize_data
+from outlier_detection import cap_columns
+from feature_engineering import feature_engineering
+from customer_segmentation import SEGMENT_FEATURES, segment_customers
+from credit_risk_modelling import compare_models
+from deposit_growth_analysis import fit_deposit_regression
+from sampling import build_sample
+from stage_scheduler import Stage, StageGraph
+
+
+def _load(source, reader=load_and_preprocess):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    df, memory_report = optimize_dtypes(reader(source))
+    return df, summarize_data(df), memory_report
+
+
+def _cap(raw, cols, n_jobs=1):
+    return cap_columns(raw, cols, copy=False, n_jobs=n_jobs)
+
+
+# First imports of sklearn/seaborn (and the scipy they share) racing in several stage
+# threads can see half-initialised modules, so stages import them under this lock
+_import_lock = threading.Lock()
+
+
+def _import_model_libraries():
+    # The model modules import sklearn lazily. Do it once here, before the three model
+    # stages fan out.
+    with _import_lock:
+        import sklearn.cluster, sklearn.decomposition, sklearn.ensemble, sklearn.metrics  # noqa: F401
+        import sklearn.mixture, sklearn.model_selection, sklearn.pipeline, sklearn.preprocessing, sklearn.svm  # noqa: F401
+
+
+def _features(capped, as_of, n_jobs=1, processes=1):
+    _import_model_libraries()
+    if processes > 1:
+        from partitioned_features import feature_engineering_partitioned
+        return feature_engineering_partitioned(capped, copy=False, as_of=as_of, partitions=processes)
+    return feature_engineering(capped, copy=False, as_of=as_of, n_jobs=n_jobs)
+
+
+def segment_features(df_fe, model_state=None, progress=None):
+    """
+    segment_customers on the engineered frame, or None if a segmentation feature is missing.
+    `model_state` is the directory the GMM warm-starts from (None: always a cold start).
+    """
+    if any(col not in df_fe.columns for col in SEGMENT_FEATURES):
+        return None
+    # Label columns go on a shallow copy so concurrent readers of df_fe are unaffected
+    return segment_customers(df_fe.copy(deep=False), progress=progress, model_state=model_state)
+
+
+# Exploration tab -> (module, function computing its blocks); the modules load seaborn, so on first use
+EXPLORATION_VIEWS = {
+    'univariate': ('univariate_analysis', 'univariate_sections'),
+    'bivariate': ('bivariate_analysis', 'bivariate_blocks'),
+    'geographical': ('geographical_analysis', 'geo_summary'),
+}
+
+
+def _explore(view, raw, sample):
+    with _import_lock:
+        module = importlib.import_module(EXPLORATION_VIEWS[view][0])
+    return getattr(module, EXPLORATION_VIEWS[view][1])(raw if sample is None else sample.take(raw))
+
+
+def pipeline_stages(backend='pandas', threads=None, processes=1):
+    """
+    Stage list for `backend` ('pandas' or 'arrow'; threads defaults to the CPU count).
+    processes > 1 runs feature engineering over row partitions in that many processes.
+    """
+    if backend == 'pandas':
+        load, cap, features = _load, _cap, _features
+    elif backend == 'arrow':
+        import arrow_backend
+        threads = threads or arrow_backend.default_threads()
+        load = partial(_load, reader=arrow_backend.load_and_preprocess)
+        cap = partial(_cap, n_jobs=threads)
+        features = partial(_features, n_jobs=threads)
+    else:
+        raise ValueError(f"Unknown backend {backend!r}; expected 'pandas' or 'arrow'")
+    if processes > 1:
+        features = partial(_features, processes=processes)
+    return [
+        Stage('load', load, inputs=['source'], outputs=['raw', 'summary', 'memory_report']),
+        Stage('sample', build_sample, inputs=['raw', 'sample_rows'], outputs='sample'),
+        Stage('outliers', cap, inputs=['raw', 'outlier_cols'], outputs=['capped', 'outlier_bounds']),
+        Stage('features', features, inputs=['capped', 'as_of'],
+              outputs=['features', 'new_features', 'feature_insights']),
+        Stage('segmentation', segment_features, inputs=['features', 'model_state'], outputs='segments'),
+        Stage('credit', compare_models, inputs=['features'], outputs='credit'),
+        Stage('deposit', fit_deposit_regression, inputs=['features'], outputs='deposit'),
+    ] + [Stage(view, partial(_explore, view), inputs=['raw', 'sample'], outputs=view) for view in EXPLORATION_VIEWS]
+
+
+PIPELINE_STAGES = pipeline_stages()
+
+
+def build_pipeline(cache=None, max_workers=4, backend='pandas', threads=None, processes=1, executor=None):
+    return StageGraph(pipeline_stages(backend, threads, processes), cache=cache, max_workers=max_workers,
+                      executor=executor)
@@ -1,14 +1,12 @@
 import streamlit as st
 import pandas as pd
-from banking_analysis import load_and_preprocess, summarize_data
-from outlier_detection import plot_boxplots_before_after
-from feature_engineering import feature_engineering
-from univariate_analysis import demographics_plots, financials_plots, categorical_plots, create_dashboard
-from bivariate_analysis import create_bivariate_dashboard
-from geographical_analysis import avg_deposits_by_geo
-from customer_segmentation import clustering_dashboard
-from credit_risk_modelling import run_model_comparison
-from deposit_growth_analysis import run_deposit_growth_analysis
+import numpy as np
+import time
+from datetime import date
+from instrumentation import Tracer, activate, span, render_trace_panel
+
+# The analysis modules (matplotlib, seaborn, scipy, sklearn) are imported once a
+# file is uploaded, so the landing page paints without loading them.
 
 # Page configuration
 st.set_page_config(
@@ -175,19 +173,97 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-uploaded_file = st.file_uploader(
-    "Choose a CSV file",
-    type=["csv"],
-    help="Upload your banking dataset in CSV format"
+# Performance trace: spans are only recorded while this is switched on
+trace_enabled = st.sidebar.toggle(
+    "⏱️ Record performance trace",
+    value=False,
+    help="Record wall time, CPU time, peak memory and rows for each stage and heavy call"
+)
+tracer = Tracer() if trace_enabled else None
+activate(tracer)
+
+# Compare mode: several portfolios (branches, quarters) side by side instead of one in depth
+compare_mode = st.sidebar.toggle(
+    "🗂️ Compare portfolios",
+    value=False,
+    help="Upload several CSV files; each is processed once, all on one shared worker pool"
 )
 
-if uploaded_file is not None:
+if compare_mode:
+    portfolio_files = st.file_uploader(
+        "Choose the portfolio CSV files",
+        type=["csv"],
+        accept_multiple_files=True,
+        help="One file per branch or quarter"
+    )
+    uploaded_file = None
+else:
+    uploaded_file = st.file_uploader(
+        "Choose a CSV file",
+        type=["csv"],
+        help="Upload your banking dataset in CSV format"
+    )
+
+if compare_mode:
+    if portfolio_files:
+        with st.spinner('Loading analysis modules...'), span("Import analysis modules"):
+            from background_jobs import job_manager, job_panel
+            from portfolio_comparison import compare_portfolios, portfolio_name, render_comparison
+            from stage_scheduler import fingerprint
+            from cache_manager import cache_manager
+        st.markdown('<div class="section-header">🗂️ Portfolio Comparison</div>', unsafe_allow_html=True)
+        portfolios = {}
+        for f in portfolio_files:
+            name = portfolio_name(f)
+            portfolios[f.name if name in portfolios else name] = f
+        # Stage outputs live in the process-wide cache; the job is keyed by the file contents
+        key = ('portfolios',) + tuple((name, fingerprint(f)) for name, f in portfolios.items())
+        comparison_job = job_manager().submit(key, f"Comparing {len(portfolios)} portfolios",
+                                              compare_portfolios, portfolios, cache_manager())
+        job_panel(comparison_job, render_comparison)
+    else:
+        st.info("Upload two or more portfolio CSV files to compare them side by side.")
+
+elif uploaded_file is not None:
+    with st.spinner('Loading analysis modules...'), span("Import analysis modules"):
+        from analysis_pipeline import build_pipeline, segment_features
+        from background_jobs import job_manager, job_panel
+        from outlier_detection import plot_boxplots
+        from univariate_analysis import demographics_plots, financials_plots, categorical_plots, create_dashboard
+        from bivariate_analysis import create_bivariate_dashboard
+        from geographical_analysis import avg_deposits_by_geo
+        from customer_segmentation import SEGMENT_FEATURES, render_segments
+        from credit_risk_modelling import compare_models, compare_models_cv, render_model_comparison
+        from deposit_growth_analysis import render_deposit_growth
+        from sampling import AUTO_SAMPLE_ROWS, DEFAULT_SAMPLE_ROWS
+        from mixture_model import default_state_dir
+        from cache_manager import cache_manager
+
+    # Stage outputs are memoised by content in one cache shared by all sessions, under a memory budget;
+    # only stages downstream of a changed input rerun, and a dataset another analyst opened is not reprocessed
+    cache = cache_manager()
+    pipeline = build_pipeline(cache=cache)
+    # The date is part of the memo key: tenure and age features are not served from an earlier day
+    sources = {'source': uploaded_file, 'as_of': date.today()}
+
     # Load and preprocess data
-    with st.spinner('Loading and preprocessing data...'):
-        df = load_and_preprocess(uploaded_file)
-        summary = summarize_data(df)
+    with st.spinner('Loading and preprocessing data...'), span("Load & preprocess"):
+        loaded = pipeline.run(sources, targets=['raw', 'summary', 'memory_report'])
+    df, summary, memory_report = loaded['raw'], loaded['summary'], loaded['memory_report']
     
     st.success(f"✅ Successfully loaded dataset with {summary['shape'][0]:,} rows and {summary['shape'][1]} columns")
+
+    # Sampling mode: the exploration tabs run on a stratified sample built once per upload
+    with st.sidebar.expander("🎲 Sampling Mode", expanded=len(df) > AUTO_SAMPLE_ROWS):
+        sampling = st.toggle(
+            "Explore on a stratified sample",
+            value=len(df) > AUTO_SAMPLE_ROWS,
+            help="Univariate, bivariate, geographical and segmentation views use a sample stratified by "
+                 "nationality, loyalty tier and risk; their estimates carry 95% confidence intervals"
+        )
+        sample_rows = st.number_input("Sample rows", min_value=1000, max_value=max(1000, len(df)),
+                                      value=min(DEFAULT_SAMPLE_ROWS, len(df)), step=5000, disabled=not sampling)
+    full_views = st.session_state.setdefault('full_data_views', set())
     
     # Create tabs with enhanced styling
     tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9 = st.tabs([
@@ -203,7 +279,7 @@ if uploaded_file is not None:
     ])
     
     # Dataset Overview Tab
-    with tab1:
+    with tab1, span("Tab: Dataset Overview", rows=len(df)):
         st.markdown('<div class="section-header">📊 Dataset Overview & Summary</div>', unsafe_allow_html=True)
         
         col1, col2, col3 = st.columns(3)
@@ -268,9 +344,17 @@ if uploaded_file is not None:
         st.subheader("📊 Statistical Summary")
         st.dataframe(summary["description"], use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown('<div class="info-card">', unsafe_allow_html=True)
+        st.subheader("💾 Memory Footprint")
+        before_mb, after_mb = memory_report.loc['Total', ['Before MB', 'After MB']]
+        st.caption(f"Compact dtypes: {before_mb:,.2f} MB → {after_mb:,.2f} MB "
+                   f"({(1 - after_mb / before_mb) * 100:.0f}% smaller)")
+        st.dataframe(memory_report.round(3), use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
     
     # Outlier Detection Tab
-    with tab2:
+    with tab2, span("Tab: Outlier Detection", rows=len(df)):
         st.markdown('<div class="section-header">🎯 Outlier Detection & Treatment</div>', unsafe_allow_html=True)
         
         st.markdown('<div class="control-panel">', unsafe_allow_html=True)
@@ -295,9 +379,95 @@ if uploaded_file is not None:
         
         st.markdown('</div>', unsafe_allow_html=True)
         
+        # Capping, feature engineering, the deposit regression and the univariate, bivariate
+        # and geographical tabs run on the scheduler. Segmentation and the credit models
+        # train as background jobs keyed by the engineered features, so reruns (slider
+        # changes) pick up the same jobs.
+        with st.spinner('Running analysis pipeline...'), span("Analysis pipeline", rows=len(df)):
+            results = pipeline.run({**sources, 'outlier_cols': tuple(selected_cols),
+                                    'sample_rows': int(sample_rows) if sampling else None},
+                                   targets=['capped', 'outlier_bounds', 'features', 'new_features',
+                                            'feature_insights', 'deposit', 'sample',
+                                            'univariate', 'bivariate', 'geographical'])
+        features_key = pipeline.last_keys['features']
+        sample = results['sample']
+
+        def on_sample(view):
+            """Whether `view` runs on the session sample (sampling on and not switched to full data)."""
+            return sample is not None and view not in full_views
+
+        def staged(view):
+            """The pipeline's output for an exploration tab, or None once it is switched to full data."""
+            return results[view] if sample is None or on_sample(view) else None
+
+        def sample_banner(view):
+            """Sample caption with the switch to recompute this view on full data (and back)."""
+            if sample is None:
+                return
+            col1, col2 = st.columns([4, 1])
+            if view in full_views:
+                col1.caption(f"Using all {sample.population_rows:,} rows.")
+                if col2.button("🎲 Back to sample", key=f"sample_{view}"):
+                    full_views.discard(view)
+                    st.rerun()
+            else:
+                col1.caption(f"🎲 Stratified sample of {len(sample):,} / {sample.population_rows:,} rows "
+                             f"({sample.fraction:.1%}); estimates below carry 95% confidence intervals.")
+                if col2.button("🔁 Recompute on full data", key=f"full_{view}"):
+                    full_views.add(view)
+                    st.rerun()
+
+        jobs = job_manager()
+        if on_sample('segmentation'):
+            segmentation_job = jobs.submit(('segmentation', features_key, pipeline.last_keys['sample']),
+                                           "Customer segmentation (sample)",
+                                           segment_features, sample.take(results['features']), default_state_dir())
+        else:
+            segmentation_job = jobs.submit(('segmentation', features_key), "Customer segmentation",
+                                           segment_features, results['features'], default_state_dir())
+        credit_job = jobs.submit(('credit', features_key), "Credit risk models",
+                                 compare_models, results['features'])
+        with st.sidebar.expander("🧮 Pipeline Stages", expanded=False):
+            st.dataframe(pipeline.run_report().round(3), use_container_width=True)
+            st.caption("new_mb: frame data a stage added on top of its inputs")
+
+        with st.sidebar.expander("🧠 Shared Cache", expanded=False):
+            usage = cache.usage()
+            col_a, col_b = st.columns(2)
+            col_a.metric("In memory", f"{usage['resident_mb']:,.0f} MB", f"of {usage['budget_mb']:,.0f} MB",
+                         delta_color="off")
+            col_b.metric("Spilled to disk", f"{usage['spilled_mb']:,.0f} MB")
+            st.caption(f"{usage['entries']} entries shared by all sessions, {usage['policy']} eviction; "
+                       f"hit rate {usage['hit_rate']:.0%}, {usage['spilled']} spilled, {usage['dropped']} dropped")
+            st.dataframe(cache.report().round(3), use_container_width=True, hide_index=True)
+
+        with st.sidebar.expander("📄 Export Report", expanded=False):
+            st.caption("Every tab's figures and insights on all rows, in one self-contained HTML file. "
+                       "Figures render in parallel worker processes.")
+            image_format = st.selectbox("Image encoding", ["png", "webp", "jpeg"],
+                                        help="png is lossless; webp and jpeg give smaller files")
+            if st.button("Build report", use_container_width=True):
+                from html_report import export_html, report_sections
+                finished = {name: job.result() if job.status == 'done' else None
+                            for name, job in [('segments', segmentation_job), ('credit', credit_job)]}
+                # Reports live in the shared cache: one built by another analyst for the same data is reused
+                report_key = ('report', features_key, image_format) + tuple(v is not None for v in finished.values())
+                if report_key not in cache:
+                    start = time.perf_counter()
+                    with st.spinner("Rendering report figures..."), span("HTML report"):
+                        document = export_html(report_sections({**loaded, **results, **finished}),
+                                               image_format=image_format)
+                    cache.store(report_key, document, time.perf_counter() - start)
+                st.session_state['report_key'] = report_key
+            report_key = st.session_state.get('report_key')
+            document = cache.lookup(report_key) if report_key and report_key[1] == features_key else None
+            if document is not None:
+                st.download_button("⬇️ Download report", document, file_name="banking_report.html",
+                                   mime="text/html", use_container_width=True)
+
         if selected_cols:
             with st.spinner('Detecting and treating outliers...'):
-                df = plot_boxplots_before_after(df, selected_cols, width, height)
+                plot_boxplots(df, results['capped'], selected_cols, width, height)
             
             st.markdown("""
             <div class="success-message">
@@ -306,14 +476,15 @@ if uploaded_file is not None:
             """, unsafe_allow_html=True)
         else:
             st.warning("Please select at least one column for outlier analysis.")
+
+        df = results['capped']
     
     # Feature Engineering Tab
-    with tab3:
+    with tab3, span("Tab: Feature Engineering", rows=len(df)):
       st.markdown('<div class="section-header">⚙️ Feature Engineering Pipeline</div>', unsafe_allow_html=True)
       
-      # Apply feature engineering
-      with st.spinner('Applying feature engineering transformations...'):
-          df_fe, new_features, insights = feature_engineering(df)  # unpack all three values
+      # Feature engineering output from the pipeline
+      df_fe, new_features, insights = results['features'], results['new_features'], results['feature_insights']
       
       # Enhanced Dataset Preview
       st.markdown('<div class="info-card">', unsafe_allow_html=True)
@@ -352,47 +523,79 @@ if uploaded_file is not None:
 
     
    # Univariate Analysis Tab
-    with tab4:
+    with tab4, span("Tab: Univariate Analysis", rows=len(df)):
         st.markdown('<div class="section-header">📈 Univariate Analysis Dashboard</div>', unsafe_allow_html=True)
         
+        sample_banner('univariate')
+        if on_sample('univariate'):
+            with st.expander("📏 Sample estimates of the means (95% CI)"):
+                st.dataframe(sample.mean_table(df).round(3), use_container_width=True)
+
         # Combined dashboard handles headers, plots, and dynamic insights
-        create_dashboard(df)
+        create_dashboard(sample.take(df) if on_sample('univariate') else df, staged('univariate'))
 
     
     # Bivariate Analysis Tab
-    with tab5:
+    with tab5, span("Tab: Bivariate Analysis", rows=len(df)):
         st.markdown('<div class="section-header">🔍 Bivariate Relationship Analysis</div>', unsafe_allow_html=True)
-        create_bivariate_dashboard(df)
+        sample_banner('bivariate')
+        if on_sample('bivariate'):
+            with st.expander("📏 Sample correlations (95% CI)"):
+                corr = sample.take(df).select_dtypes(include='number').corr().abs()
+                pairs = corr.where(np.triu(np.ones(corr.shape, dtype=bool), k=1)).stack().nlargest(5).index
+                st.dataframe(pd.DataFrame([(f"{a} ↔ {b}", *sample.correlation_interval(df, a, b)) for a, b in pairs],
+                                          columns=['Pair', 'Correlation', 'Lower', 'Upper']).round(3),
+                             use_container_width=True, hide_index=True)
+        create_bivariate_dashboard(sample.take(df) if on_sample('bivariate') else df, staged('bivariate'))
     
     # Geographical Analysis Tab
-    with tab6:
+    with tab6, span("Tab: Geographical Insights", rows=len(df)):
         st.markdown('<div class="section-header">🌍 Geographical Insights Dashboard</div>', unsafe_allow_html=True)
-        avg_deposits_by_geo(df)
+        sample_banner('geographical')
+        geo_cols = ['Nationality', 'Loyalty Classification']
+        if on_sample('geographical') and set(geo_cols + ['Bank Deposits']).issubset(df.columns):
+            with st.expander("📏 Sample estimates of average deposits (95% CI)"):
+                st.dataframe(sample.group_mean_table(df, geo_cols, 'Bank Deposits').round(2),
+                             use_container_width=True)
+        avg_deposits_by_geo(sample.take(df) if on_sample('geographical') else df, staged('geographical'))
     
     # Customer Segmentation Tab
-    with tab7:
+    with tab7, span("Tab: Customer Segmentation", rows=len(df)):
         st.markdown('<div class="section-header">👥 Customer Segmentation Analysis</div>', unsafe_allow_html=True)
         
-        with st.spinner('Applying advanced feature engineering for segmentation...'):
-            df_feature_engineered, new_features, insights = feature_engineering(df)
+        def show_segments(segments):
+            if segments is None:
+                missing_cols = [col for col in SEGMENT_FEATURES if col not in df_fe.columns]
+                st.error(f"Missing columns for clustering: {missing_cols}")
+            else:
+                render_segments(segments)
+                if on_sample('segmentation'):
+                    with st.expander("📏 Estimated population share per segment (95% CI)"):
+                        for method, labels in segments['labels'].items():
+                            st.markdown(f"**{method}**")
+                            st.dataframe(sample.share_table(labels).round(4), use_container_width=True)
 
-        
-        with st.spinner('Performing customer segmentation analysis...'):
-            df_segmented = clustering_dashboard(df_feature_engineered)
+        sample_banner('segmentation')
+        job_panel(segmentation_job, show_segments)
     
     # Credit Risk Modeling Tab
-    with tab8:
+    with tab8, span("Tab: Credit Risk Modeling", rows=len(df)):
         st.markdown('<div class="section-header">💳 Credit Risk Modeling Suite</div>', unsafe_allow_html=True)
         
-        with st.spinner('Running comprehensive model comparison...'):
-            run_model_comparison(df_feature_engineered)
+        validation = st.radio("Validation", ["Single 80/20 split", "5-fold cross-validation"], horizontal=True,
+                              help="Cross-validation fits every model on each fold in parallel and reports the spread")
+        if validation == "Single 80/20 split":
+            job_panel(credit_job, render_model_comparison)
+        else:
+            cv_job = jobs.submit(('credit_cv', features_key, 5), "Credit risk models (5-fold CV)",
+                                 compare_models_cv, results['features'], 5)
+            job_panel(cv_job, render_model_comparison)
     
     # Deposit Growth Analysis Tab
-    with tab9:
+    with tab9, span("Tab: Deposit Growth Analysis", rows=len(df)):
         st.markdown('<div class="section-header">💰 Deposit Growth Analysis</div>', unsafe_allow_html=True)
         
-        with st.spinner('Analyzing deposit growth patterns...'):
-            run_deposit_growth_analysis(df_feature_engineered)
+        render_deposit_growth(df_fe, results['deposit'])
 
 else:
     # Instructions when no file is uploaded
@@ -415,6 +618,9 @@ else:
     </div>
     """, unsafe_allow_html=True)
 
+if trace_enabled:
+    render_trace_panel(tracer)
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,104 @@
+"""
+Optional Apache Arrow backend for the load and aggregation steps.
+
+    python batch_report.py Banking.csv --backend arrow --threads 16
+
+- The CSV is read by Arrow's multi-threaded reader. Only the kept columns are
+  converted: the columns load_and_preprocess drops are never parsed
+  (projection pushdown).
+- The table becomes a pandas frame with one block per column. Numeric columns
+  without nulls therefore stay views of the Arrow buffers (zero copy), and so
+  do the NumPy arrays that sklearn later gets from them. Text columns become
+  Python strings once, as with pd.read_csv.
+- Group means run as Arrow hash aggregations, multi-threaded, over just the
+  key and value columns.
+
+Capping and feature engineering are already single NumPy passes. With this
+backend they take the same n_jobs threads (see cap_columns and
+feature_engineering). Frames match the pandas backend exactly; group means
+agree to rounding.
+
+pyarrow is optional: it is imported when the backend is first used.
+"""
+import csv
+import os
+
+import pandas as pd
+
+from banking_analysis import DROP_COLUMNS
+from instrumentation import span
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.csv  # noqa: F401
+    except ImportError as exc:
+        raise ImportError("The arrow backend needs pyarrow: pip install pyarrow") from exc
+    return pyarrow
+
+
+def default_threads():
+    return os.cpu_count() or 1
+
+
+def _header(source):
+    """Column names from the first line of a CSV path or file object (the position is restored)."""
+    if hasattr(source, 'readline'):
+        position = source.tell()
+        line = source.readline()
+        source.seek(position)
+    else:
+        with open(source, 'rb') as f:
+            line = f.readline()
+    if isinstance(line, bytes):
+        line = line.decode('utf-8-sig')
+    return next(csv.reader([line]))
+
+
+def read_csv(source, columns=None, use_threads=True):
+    """
+    Arrow table of `columns` (default: all but DROP_COLUMNS, in file order).
+    Empty fields are nulls in every column, as with pd.read_csv. Dates stay
+    text: they are parsed with the dashboard's formats in feature engineering.
+    """
+    pa = _pyarrow()
+    header = _header(source)
+    keep = [col for col in header if col not in DROP_COLUMNS] if columns is None else list(columns)
+    convert = pa.csv.ConvertOptions(
+        include_columns=keep,
+        strings_can_be_null=True,
+        column_types={col: pa.string() for col in ('Joined Bank', 'Client ID') if col in keep},
+    )
+    return pa.csv.read_csv(source, read_options=pa.csv.ReadOptions(use_threads=use_threads),
+                           convert_options=convert)
+
+
+def to_pandas(table):
+    """Pandas view of an Arrow table; null-free numeric columns share the Arrow buffers."""
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def load_and_preprocess(source, use_threads=True):
+    """banking_analysis.load_and_preprocess with the Arrow reader."""
+    with span("CSV read (arrow)"):
+        return to_pandas(read_csv(source, use_threads=use_threads))
+
+
+def group_means(df, by, values, use_threads=True):
+    """
+    Mean of `values` per observed combination of the `by` columns, via an Arrow
+    group-by. Same frame as df.groupby(by, observed=True)[values].mean().reset_index(),
+    including row order and categorical keys; the means can differ in the last
+    bit because the threads sum in a different order.
+    """
+    pa = _pyarrow()
+    by, values = list(by), list(values)
+    table = pa.Table.from_pandas(df[by + values], preserve_index=False)
+    result = table.group_by(by, use_threads=use_threads).aggregate([(col, 'mean') for col in values]).to_pandas()
+    result = result.rename(columns={f"{col}_mean": col for col in values})[by + values]
+    for col in by:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            result[col] = pd.Categorical(result[col], categories=df[col].cat.categories, ordered=df[col].cat.ordered)
+    return result.sort_values(by, ignore_index=True)
+
@@ -0,0 +1,241 @@
+"""
+Background execution for long-running computations (model training, clustering).
+
+Jobs run on one process-wide thread pool, so they outlive Streamlit reruns:
+a slider change re-executes the script but finds the job still running (or
+finished) under the same key instead of starting over. Compute functions
+report progress through a `progress(done, total, label)` callback, which is
+also where a cancellation request takes effect (between models; a single
+fit cannot be interrupted). Identical jobs are shared across sessions, so
+each session that shows a job subscribes to it: Cancel withdraws only that
+session, and the job stops once no active session is left watching it.
+
+A finished job lets go of its arguments (often the whole feature frame) and,
+when the manager has a cache, hands its result to it under ('job', key), so
+job results count against the same memory budget as the stage outputs and
+are spilled or dropped with them. A job whose result was dropped reports
+'evicted' and is run again on the next submit.
+"""
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+MAX_WORKERS = 2
+MAX_JOBS = 16  # finished jobs beyond this are forgotten, oldest first
+_EVICTED = object()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobEvicted(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, key, label, func, args, cache=None):
+        self.key = key
+        self.label = label
+        self.func, self.args = func, args
+        self.cache = cache
+        self.future = None
+        self.done_steps, self.total_steps, self.step = 0, None, 'queued'
+        self.started = self.finished = None
+        self.subscribers = set()
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    def progress(self, done, total, label=''):
+        """Callback handed to the compute function; raises JobCancelled once cancel() was called."""
+        if self.started is None:
+            self.started = time.perf_counter()
+        self.done_steps, self.total_steps, self.step = done, total, label
+        if self._cancel.is_set():
+            raise JobCancelled(self.label)
+
+    def cancel(self):
+        self._cancel.set()
+        self.future.cancel()  # succeeds only while still queued
+
+    def subscribe(self, who):
+        with self._lock:
+            self.subscribers.add(who)
+
+    def withdraw(self, who, active=None):
+        """
+        Stop watching on behalf of `who`; the job is cancelled once no subscriber
+        is left (those failing `active(who)`, e.g. closed sessions, do not count).
+        Returns whether it was cancelled.
+        """
+        with self._lock:
+            self.subscribers.discard(who)
+            if active is not None:
+                self.subscribers = {s for s in self.subscribers if active(s)}
+            last = not self.subscribers
+        if last:
+            self.cancel()
+        return last
+
+    @property
+    def status(self):
+        if not self.future.done():
+            return 'cancelling' if self._cancel.is_set() else ('running' if self.started else 'queued')
+        if self.future.cancelled():
+            return 'cancelled'
+        exc = self.future.exception()
+        if isinstance(exc, JobCancelled):
+            return 'cancelled'
+        if exc is not None:
+            return 'failed'
+        return 'evicted' if self.cache is not None and ('job', self.key) not in self.cache else 'done'
+
+    def fraction(self):
+        return self.done_steps / self.total_steps if self.total_steps else 0.0
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def run(self):
+        self.progress(0, None, 'starting')
+        try:
+            result = self.func(*self.args, progress=self.progress)
+            if self.cache is None:
+                return result
+            self.cache.store(('job', self.key), result, time.perf_counter() - self.started)
+        finally:
+            self.finished = time.perf_counter()
+            self.func = self.args = None
+
+    def result(self):
+        result = self.future.result()
+        if self.cache is None:
+            return result
+        result = self.cache.lookup(('job', self.key), _EVICTED)
+        if result is _EVICTED:
+            raise JobEvicted(self.label)
+        return result
+
+
+class JobManager:
+    def __init__(self, max_workers=MAX_WORKERS, cache=None):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.cache = cache
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, key, label, func, *args, restart=False):
+        """
+        Run func(*args, progress=job.progress) in the background, or return the job
+        already registered under `key` (unless it was cancelled/failed and restart=True,
+        or its result was evicted from the cache).
+        """
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None and not (restart and job.status in ('cancelled', 'failed')) \
+                    and job.status != 'evicted':
+                self.jobs.move_to_end(key)
+                return job
+            job = Job(key, label, func, args, self.cache)
+            # copy_context keeps the active tracer in the worker thread
+            job.future = self.pool.submit(contextvars.copy_context().run, job.run)
+            self.jobs[key] = job
+            self._evict()
+            return job
+
+    def forget(self, key):
+        """Drop the job under `key`; the next submit with that key starts it afresh."""
+        with self.lock:
+            self.jobs.pop(key, None)
+
+    def _evict(self):
+        finished = [k for k, j in self.jobs.items() if j.future.done()]
+        for key in finished[:max(0, len(self.jobs) - MAX_JOBS)]:
+            del self.jobs[key]
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def job_manager():
+    """
+    The process-wide JobManager (shared by every session, so identical work runs once);
+    results are kept in the process-wide CacheManager.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            from cache_manager import cache_manager
+            _manager = JobManager(cache=cache_manager())
+        return _manager
+
+
+def _session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def _session_active(session_id):
+    from streamlit import runtime
+    return not runtime.exists() or runtime.get_instance().is_active_session(session_id)
+
+
+def job_panel(job, render, poll_seconds=1.0):
+    """
+    Render a finished job with `render(result)`; otherwise show progress with a
+    Cancel button, polled in a fragment so the rest of the page stays usable.
+    Cancel applies to this session; the job only stops when no other session
+    is waiting for it.
+    """
+    session = _session_id()
+    withdrawn = st.session_state.setdefault('withdrawn_jobs', set())
+    status = job.status
+    if job.key in withdrawn and status not in ('cancelled', 'failed'):
+        others = len(job.subscribers)
+        st.warning(f"{job.label} was cancelled for this session"
+                   + (f"; it continues for {others} other session(s)." if others else "."))
+        if st.button("🔄 Restart", key=f"restart_{job.key}"):
+            withdrawn.discard(job.key)
+            st.rerun()
+        return
+    job.subscribe(session)
+    if status == 'done':
+        try:
+            result = job.result()
+        except JobEvicted:  # dropped from the cache just now: the rerun submits it again
+            st.rerun()
+        render(result)
+        return
+    if status == 'failed':
+        st.error(f"{job.label} failed: {job.future.exception()}")
+    if status in ('cancelled', 'failed'):
+        if status == 'cancelled':
+            st.warning(f"{job.label} was cancelled.")
+        if st.button("🔄 Restart", key=f"restart_{job.key}"):
+            # The job no longer holds its arguments: the rerun submits it again with fresh ones
+            job_manager().forget(job.key)
+            withdrawn.discard(job.key)
+            st.rerun()
+        return
+
+    @st.fragment(run_every=poll_seconds)
+    def _poll():
+        if job.future.done():
+            st.rerun()  # full rerun renders the result outside the fragment
+        steps = f"{job.done_steps}/{job.total_steps}" if job.total_steps else "…"
+        st.progress(job.fraction(), text=f"{job.label}: {job.status} ({steps}) {job.step} — {job.elapsed():.0f}s")
+        if job.status != 'cancelling' and st.button("⏹️ Cancel", key=f"cancel_{job.key}"):
+            job.withdraw(session, _session_active)
+            withdrawn.add(job.key)
+            st.rerun()
+        st.caption("Other tabs stay available while this runs.")
+
+    _poll()
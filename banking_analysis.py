@@ -1,38 +1,58 @@
-import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import warnings
-from datetime import datetime
+from instrumentation import span
 
 # Ignore warnings
 warnings.filterwarnings('ignore')
 
-# Sklearn imports
-from sklearn.cluster import KMeans
-from sklearn.mixture import GaussianMixture
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.model_selection import train_test_split
-from sklearn_extra.cluster import KMedoids
-from sklearn.linear_model import LogisticRegression, LinearRegression
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, GradientBoostingRegressor
-from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score, roc_curve, auc
+DROP_COLUMNS = {'Location ID', 'BRId', 'GenderId', 'IAId'}
 
 
 def load_and_preprocess(file_path: str):
     """
     Load the banking dataset and preprocess it.
     """
-    data = pd.read_csv(file_path)
+    with span("CSV read"):
+        data = pd.read_csv(file_path)
 
-    # Drop unwanted columns
-    cols = set(data.columns) - {'Location ID', 'BRId', 'GenderId', 'IAId'}
-    data1 = data[list(cols)]
+    # Drop unwanted columns (keeping the file's column order)
+    data1 = data[[col for col in data.columns if col not in DROP_COLUMNS]]
 
     return data1
 
 
+def optimize_dtypes(df: pd.DataFrame, max_category_ratio=0.5, exclude=('Joined Bank',)):
+    """
+    Shrink the frame without changing any downstream result:
+        - integer columns are downcast to the smallest signed type holding their range
+        - float columns are kept (float32 would change sums and means)
+        - text columns with at most `max_category_ratio` distinct values per row become
+          categoricals with categories in order of first appearance (the order seaborn
+          and value_counts already use for the strings)
+    Returns the optimized frame and a per-column before/after memory table.
+    """
+    out = df.copy(deep=False)
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_integer_dtype(s.dtype):
+            out[col] = pd.to_numeric(s, downcast='integer')
+        elif s.dtype == object and col not in exclude and pd.api.types.infer_dtype(s, skipna=True) == 'string':
+            uniques = pd.unique(s.dropna())
+            if len(uniques) <= max_category_ratio * len(s):
+                out[col] = pd.Categorical(s, categories=uniques)
+
+    before = df.memory_usage(deep=True, index=False) / 1024 ** 2
+    after = out.memory_usage(deep=True, index=False) / 1024 ** 2
+    report = pd.DataFrame({
+        'Before dtype': df.dtypes.astype(str),
+        'After dtype': out.dtypes.astype(str),
+        'Before MB': before,
+        'After MB': after,
+    })
+    report.loc['Total'] = ['', '', before.sum(), after.sum()]
+    return out, report
+
+
 def summarize_data(df: pd.DataFrame):
     """
     Return basic info and statistics of the dataset.
@@ -48,7 +68,9 @@ def summarize_data(df: pd.DataFrame):
 
 
 if __name__ == "__main__":
-    file_path = "Banking.csv"
+    import sys
+    # Pass a path, or generate one with `python synthetic_data.py 3000`
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "Banking.csv"
     df = load_and_preprocess(file_path)
     summary = summarize_data(df)
 
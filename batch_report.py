@@ -0,0 +1,283 @@
+"""
+Headless batch pipeline: produces the portfolio report without Streamlit.
+
+    python batch_report.py Banking.csv --output-dir reports/2024-06-30
+
+Runs load -> outlier capping -> feature engineering -> segmentation ->
+credit models -> deposit regression through the stage graph in
+analysis_pipeline (the three model stages run concurrently), and writes
+figures (PNG), tables (CSV), the insight text (insights.md) and a manifest
+(summary.json) to the output directory. --backend arrow reads the CSV and
+computes the group means with Arrow, and caps and engineers features on
+--threads threads (see arrow_backend); --processes N engineers features
+over N row partitions in a process pool (see partitioned_features);
+--model-state DIR warm-starts the GMM from the fit saved there (see mixture_model);
+--html / --pdf also export every section into one self-contained file (see html_report).
+"""
+import argparse
+import json
+import os
+import re
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from analysis_pipeline import EXPLORATION_VIEWS, build_pipeline
+from stage_scheduler import fingerprint
+from feature_store import FeatureStore, load_or_build
+from outlier_detection import boxplot_figure
+from customer_segmentation import SEGMENT_METHODS, segment_insights, cluster_figure
+from credit_risk_modelling import roc_figure, model_insights
+from deposit_growth_analysis import (actual_vs_predicted_figure, residuals_figure,
+                                     feature_fit_figure, prediction_insight, residual_insight, feature_insight)
+from instrumentation import Tracer, tracing, span
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+
+
+class ReportWriter:
+    """Collects figures, tables and insight text under one output directory."""
+
+    def __init__(self, output_dir, dpi=110):
+        self.output_dir = output_dir
+        self.dpi = dpi
+        self.sections = []
+        self.files = {'figures': [], 'tables': []}
+        os.makedirs(os.path.join(output_dir, 'figures'), exist_ok=True)
+        os.makedirs(os.path.join(output_dir, 'tables'), exist_ok=True)
+
+    def section(self, title):
+        self.sections.append((title, []))
+
+    def text(self, line):
+        self.sections[-1][1].append(line)
+
+    def items(self, pairs):
+        for label, text in pairs:
+            self.text(f"- **{label}:** {text}")
+
+    def figure(self, fig, name):
+        path = os.path.join('figures', f"{_slug(name)}.png")
+        with span(f"Render: {name}", category='render'):
+            fig.savefig(os.path.join(self.output_dir, path), dpi=self.dpi, bbox_inches='tight')
+        plt.close(fig)
+        self.files['figures'].append(path)
+        self.text(f"![{name}]({path})")
+
+    def table(self, df, name, index=True):
+        path = os.path.join('tables', f"{_slug(name)}.csv")
+        df.to_csv(os.path.join(self.output_dir, path), index=index)
+        self.files['tables'].append(path)
+
+    def write_insights(self, title):
+        lines = [f"# {title}", ""]
+        for heading, body in self.sections:
+            lines += [f"## {heading}", ""] + body + [""]
+        with open(os.path.join(self.output_dir, 'insights.md'), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+
+
+GEO_KEYS = ['Nationality', 'Loyalty Classification']
+
+
+def deposit_means(df, backend='pandas', threads=None):
+    """Average Bank Deposits per nationality and loyalty tier (the dashboard's geographical view)."""
+    if backend == 'arrow':
+        from arrow_backend import group_means
+        return group_means(df, GEO_KEYS, ['Bank Deposits'], use_threads=threads != 1)
+    return df.groupby(GEO_KEYS, observed=True)[['Bank Deposits']].mean().reset_index()
+
+
+def run_pipeline(input_path, output_dir, outlier_cols=None, max_workers=4, store=None, as_of=None,
+                 backend='pandas', threads=None, processes=1, model_state=None, html=False, pdf=False,
+                 image_format='png'):
+    """
+    Run every stage on `input_path` and write the report; returns the manifest dict.
+    With a FeatureStore and `as_of`, engineered features are read from (or written to)
+    the store partition for that date instead of being recomputed.
+    With a `model_state` directory the GMM warm-starts from (and updates) the saved fit.
+    html/pdf also write the self-contained report.html / report.pdf (see html_report).
+    """
+    report = ReportWriter(output_dir)
+    manifest = {'input': os.path.abspath(input_path), 'generated': datetime.now().isoformat(timespec='seconds'),
+                'backend': backend}
+    pipeline = build_pipeline(max_workers=max_workers, backend=backend, threads=threads, processes=processes)
+    sources = {'source': input_path, 'as_of': as_of, 'model_state': model_state}
+
+    # --- Load ---
+    with span("Load & preprocess"):
+        loaded = pipeline.run(sources, targets=['raw', 'summary', 'memory_report'])
+    stages = dict(pipeline.last_run)
+    df, summary = loaded['raw'], loaded['summary']
+    manifest['shape'] = list(summary['shape'])
+    report.section("Dataset Overview")
+    report.text(f"{summary['shape'][0]:,} rows and {summary['shape'][1]} columns; "
+                f"{sum(summary['nulls'].values()):,} missing values.")
+    report.table(summary['description'], "statistical_summary")
+    report.table(pd.DataFrame({'Null Count': summary['nulls'], 'Unique Count': summary['unique_values']}),
+                 "column_profile")
+    report.table(loaded['memory_report'], "memory_footprint")
+    manifest['memory_mb'] = loaded['memory_report'].loc['Total', ['Before MB', 'After MB']].tolist()
+
+    # --- Geographical view ---
+    if set(GEO_KEYS + ['Bank Deposits']).issubset(df.columns):
+        report.section("Geographical Analysis")
+        with span("Group means", rows=len(df)):
+            means = deposit_means(df, backend, threads)
+        top, low = means.loc[means['Bank Deposits'].idxmax()], means.loc[means['Bank Deposits'].idxmin()]
+        report.text(f"Highest average deposit: {top['Nationality']} - {top['Loyalty Classification']} "
+                    f"({top['Bank Deposits']:,.2f}); lowest: {low['Nationality']} - "
+                    f"{low['Loyalty Classification']} ({low['Bank Deposits']:,.2f}).")
+        report.table(means, "deposits_by_nationality_loyalty", index=False)
+
+    # --- Outlier capping (same default as the dashboard: first four numeric columns) ---
+    numeric_cols = df.select_dtypes(include="number").columns.tolist()
+    cols = outlier_cols or numeric_cols[:4]
+    sources['sample_rows'] = None  # the report always covers every row
+
+    # --- Engineered features from the store (the feature stage is skipped when they are sources) ---
+    sources['outlier_cols'] = tuple(cols)
+    if store is not None and as_of is not None:
+        def compute():
+            v = pipeline.run(sources, targets=['features', 'new_features', 'feature_insights'])
+            return v['features'], {'new_features': sorted(v['new_features']), 'insights': v['feature_insights']}
+
+        with span("Feature store"):
+            # Keyed by content: a corrected file at the same path (same --as-of) is rebuilt
+            params = {'source': fingerprint(df), 'outlier_cols': list(cols)}
+            df_fe, meta, from_store = load_or_build(store, as_of, compute, params)
+        sources.update({'features': df_fe, 'new_features': meta['new_features'],
+                        'feature_insights': meta['insights']})
+        manifest['feature_store'] = {'version': store.version, 'as_of': str(as_of), 'hit': from_store}
+
+    # --- Remaining stages (load is reused from the cache; the dashboard's exploration tabs are not reported) ---
+    with span("Analysis pipeline", rows=len(df)):
+        values = pipeline.run(sources, targets=[out for out in pipeline.producer if out not in EXPLORATION_VIEWS])
+    stages.update({name: info for name, info in pipeline.last_run.items() if name not in stages})
+    manifest['stages'] = stages
+    capped, bounds = values['capped'], values['outlier_bounds']
+    df_fe, new_features, insights = values['features'], values['new_features'], values['feature_insights']
+
+    report.section("Outlier Treatment")
+    for col in cols:
+        if col in capped.columns:
+            report.figure(boxplot_figure(df[col], capped[col], col, 8, 2), f"Boxplots {col}")
+    report.table(pd.DataFrame(bounds, index=['lower', 'upper']).T, "outlier_bounds")
+    manifest['outlier_columns'] = list(bounds)
+
+    # --- Feature engineering ---
+    report.section("Feature Engineering")
+    report.text("New features: " + ", ".join(sorted(new_features)))
+    for insight in insights:
+        report.text(f"-{insight}")
+    manifest['new_features'] = sorted(new_features)
+
+    # --- Segmentation ---
+    report.section("Customer Segmentation")
+    segments = values['segments']
+    if segments is not None:
+        for method, (_, name, cmap) in SEGMENT_METHODS.items():
+            report.text(f"\n### {name}\n")
+            report.figure(cluster_figure(segments['pca'], segments['labels'][method], name, cmap), f"Segments {method}")
+            report.items(segment_insights(segments['profiles'][method], segments['counts'][method],
+                                          segments['silhouette'][method]))
+            report.table(segments['profiles'][method].assign(Customers=segments['counts'][method]),
+                         f"segment_profile_{method}")
+        manifest['gmm'] = segments['gmm']
+    else:
+        report.text("Skipped: missing segmentation features.")
+
+    # --- Credit risk models ---
+    credit = values['credit']
+    report.section("Credit Risk Modeling")
+    report.figure(roc_figure(credit['roc'], credit['aucs']), "ROC Curve Comparison")
+    items, recommendation = model_insights(credit['aucs'], credit.get('pooled_aucs'))
+    report.items(items)
+    report.text(recommendation)
+    report.text("```\n" + credit['svm_report'] + "```")
+    report.table(pd.Series(credit['aucs'], name='AUC').to_frame(), "model_auc")
+    manifest['model_auc'] = credit['aucs']
+
+    # --- Deposit regression ---
+    deposit = values['deposit']
+    report.section("Deposit Growth Analysis")
+    fit = deposit['fit']
+    coef_table = pd.DataFrame({'coef': fit['coef'], 'std_err': fit['std_err']}, index=deposit['features'])
+    coef_table.loc['(intercept)'] = [fit['intercept'], fit['intercept_std_err']]
+    report.table(coef_table, "deposit_regression_coefficients")
+    report.text(f"R² = {deposit['r2']:.3f}, MSE = {deposit['mse']:,.2f}")
+    report.figure(actual_vs_predicted_figure(deposit), "Actual vs Predicted Deposits")
+    report.text(prediction_insight(deposit))
+    report.figure(residuals_figure(deposit), "Residual Distribution")
+    report.text(residual_insight(deposit))
+    for feature in deposit['features']:
+        report.figure(feature_fit_figure(df_fe, feature, deposit['full_stats']), f"{feature} vs Bank Deposits")
+        report.text(feature_insight(deposit, feature))
+    manifest['deposit_regression'] = {'r2': deposit['r2'], 'mse': deposit['mse'],
+                                      'coef': dict(zip(deposit['features'], fit['coef'])),
+                                      'intercept': fit['intercept']}
+
+    report.write_insights("Banking Portfolio Report")
+    manifest.update(report.files)
+    if html or pdf:
+        from html_report import export_html, export_pdf, report_sections
+        with span("HTML report"):
+            document = export_html(report_sections(values), image_format=image_format)
+        if html:
+            with open(os.path.join(output_dir, 'report.html'), 'w', encoding='utf-8') as f:
+                f.write(document)
+            manifest['html'] = 'report.html'
+        if pdf:
+            export_pdf(document, os.path.join(output_dir, 'report.pdf'))
+            manifest['pdf'] = 'report.pdf'
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, default=float)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the full analysis pipeline headlessly")
+    parser.add_argument("input", help="banking CSV file")
+    parser.add_argument("--output-dir", default="report")
+    parser.add_argument("--outlier-cols", nargs="+", default=None,
+                        help="columns to cap (default: first four numeric columns)")
+    parser.add_argument("--workers", type=int, default=4, help="threads for independent stages")
+    parser.add_argument("--trace", action="store_true", help="also write trace.json and trace.chrome.json")
+    parser.add_argument("--feature-store", default=None, help="feature store directory (needs --as-of)")
+    parser.add_argument("--as-of", default=None, help="snapshot date; tenure is measured at this date")
+    parser.add_argument("--backend", choices=["pandas", "arrow"], default="pandas",
+                        help="arrow: multi-threaded Arrow CSV reader and group-bys (needs pyarrow)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="threads for the arrow backend's per-row work (default: CPU count)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="engineer features over row partitions in this many processes")
+    parser.add_argument("--html", action="store_true",
+                        help="also write report.html with every figure embedded (built in parallel processes)")
+    parser.add_argument("--pdf", action="store_true", help="also write report.pdf (needs weasyprint)")
+    parser.add_argument("--image-format", choices=["png", "webp", "jpeg"], default="png",
+                        help="image encoding in the HTML/PDF report (webp/jpeg: lossy, smaller)")
+    parser.add_argument("--model-state", default=None,
+                        help="directory of saved GMM fits to warm-start from (default: cold start)")
+    args = parser.parse_args(argv)
+
+    store = FeatureStore(args.feature_store) if args.feature_store else None
+    tracer = Tracer() if args.trace else None
+    with tracing(tracer):
+        run_pipeline(args.input, args.output_dir, args.outlier_cols, args.workers, store, args.as_of,
+                     args.backend, args.threads, args.processes, args.model_state, args.html, args.pdf,
+                     args.image_format)
+    if tracer is not None:
+        with open(os.path.join(args.output_dir, 'trace.json'), 'w') as f:
+            f.write(tracer.to_json())
+        with open(os.path.join(args.output_dir, 'trace.chrome.json'), 'w') as f:
+            f.write(tracer.to_chrome_trace())
+    print(f"Report written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
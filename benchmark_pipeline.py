@@ -0,0 +1,290 @@
+"""
+Headless scaling benchmark for the analysis pipeline.
+
+Generates synthetic Banking.csv files (synthetic_data.py) at several sizes,
+runs each pipeline stage without a Streamlit server, and writes wall time,
+CPU time and memory figures to JSON so runs can be compared over time.
+
+    python benchmark_pipeline.py --sizes 10000 100000 1000000
+    python benchmark_pipeline.py --imports            # cold import times only
+    python benchmark_pipeline.py --compare benchmark_results/old.json benchmark_results/new.json
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from instrumentation import max_rss_mb
+from synthetic_data import write_banking_csv
+
+STAGES = ['load', 'outliers', 'features', 'clustering', 'credit_models', 'deposit_growth']
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# What app.py imports before a file is uploaded (first paint) and after it
+IMPORT_TARGETS = {
+    'app_shell': 'streamlit, pandas, instrumentation',
+    'app_analysis': ('analysis_pipeline, outlier_detection, univariate_analysis, bivariate_analysis, '
+                     'geographical_analysis, customer_segmentation, credit_risk_modelling, deposit_growth_analysis'),
+    'banking_analysis': 'banking_analysis',
+    'analysis_pipeline': 'analysis_pipeline',
+}
+HEAVY_MODULES = ('matplotlib.pyplot', 'seaborn', 'scipy', 'sklearn', 'sklearn_extra')
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {modules}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _quiet_streamlit():
+    # st.* calls are no-ops outside `streamlit run`; silence the bare-mode warnings
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith('streamlit'):
+            logging.getLogger(name).disabled = True
+
+
+def dataset_path(data_dir, rows, seed):
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"banking_{rows}_{seed}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {rows:,} rows -> {path}")
+        write_banking_csv(path, rows, seed)
+    return path
+
+
+def build_stages(path, args):
+    """
+    Return (name, setup, run) triples. `setup` prepares the input from the previous
+    stages outside the timed region; `run` is the measured call and returns rows processed.
+    """
+    from banking_analysis import load_and_preprocess
+    from outlier_detection import cap_outliers
+    from feature_engineering import feature_engineering
+    from customer_segmentation import clustering_dashboard
+    from credit_risk_modelling import run_model_comparison
+    from deposit_growth_analysis import run_deposit_growth_analysis
+    _quiet_streamlit()
+
+    state = {}
+
+    def cap_setup():
+        if 'raw' not in state:
+            state['raw'] = load_and_preprocess(path)
+
+    def cap_run():
+        df = state['raw'].copy()
+        cols = df.select_dtypes(include='number').columns
+        for col in cols:
+            df[col] = cap_outliers(df[col])
+        state['capped'] = df
+        return len(df)
+
+    def fe_setup():
+        cap_setup()
+        if 'capped' not in state:
+            cap_run()
+
+    def fe_run():
+        state['fe'] = feature_engineering(state['capped'])[0]
+        return len(state['fe'])
+
+    def capped_fe(max_rows):
+        if 'fe' not in state:
+            fe_setup()
+            fe_run()
+        df = state['fe']
+        if max_rows and len(df) > max_rows:
+            df = df.sample(n=max_rows, random_state=42)
+        return df.copy()
+
+    def load_run():
+        state['raw'] = load_and_preprocess(path)
+        return len(state['raw'])
+
+    def clustering_setup():
+        state['cluster_in'] = capped_fe(args.max_cluster_rows)
+
+    def clustering_run():
+        clustering_dashboard(state['cluster_in'])
+        return len(state['cluster_in'])
+
+    def credit_setup():
+        state['credit_in'] = capped_fe(args.max_model_rows)
+
+    def credit_run():
+        run_model_comparison(state['credit_in'])
+        return len(state['credit_in'])
+
+    def deposit_setup():
+        state['deposit_in'] = capped_fe(None)
+
+    def deposit_run():
+        run_deposit_growth_analysis(state['deposit_in'])
+        return len(state['deposit_in'])
+
+    return [
+        ('load', lambda: None, load_run),
+        ('outliers', cap_setup, cap_run),
+        ('features', fe_setup, fe_run),
+        ('clustering', clustering_setup, clustering_run),
+        ('credit_models', credit_setup, credit_run),
+        ('deposit_growth', deposit_setup, deposit_run),
+    ]
+
+
+def measure(setup, run, repeat):
+    """Time `run` `repeat` times untraced, then once more under tracemalloc for peak allocations."""
+    walls, cpus = [], []
+    rows = None
+    rss_before = max_rss_mb()
+    for _ in range(repeat):
+        setup()
+        gc.collect()
+        w0, c0 = time.perf_counter(), time.process_time()
+        rows = run()
+        walls.append(time.perf_counter() - w0)
+        cpus.append(time.process_time() - c0)
+        plt.close('all')
+    rss_after = max_rss_mb()
+
+    setup()
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    plt.close('all')
+
+    return {
+        'rows_processed': rows,
+        'wall_s': walls,
+        'wall_s_median': statistics.median(walls),
+        'cpu_s_median': statistics.median(cpus),
+        'peak_alloc_mb': peak / 1024 ** 2,
+        'max_rss_growth_mb': rss_after - rss_before,
+    }
+
+
+def measure_imports(repeat):
+    """Cold import time of each IMPORT_TARGETS entry, each in a fresh interpreter."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for target, modules in IMPORT_TARGETS.items():
+        times = []
+        for _ in range(repeat):
+            probe = _IMPORT_PROBE.format(modules=modules, heavy=HEAVY_MODULES)
+            out = subprocess.run([sys.executable, '-c', probe], cwd=here, capture_output=True, text=True, check=True)
+            data = json.loads(out.stdout.strip().splitlines()[-1])
+            times.append(data['seconds'])
+        print(f"[imports] {target:<18} {statistics.median(times):8.3f}s  heavy: {', '.join(data['heavy']) or '-'}")
+        results.append({'target': target, 'modules': modules, 'wall_s': times,
+                        'wall_s_median': statistics.median(times), 'heavy_loaded': data['heavy']})
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+
+def environment():
+    import numpy, pandas, sklearn
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'sklearn': sklearn.__version__,
+        'git_commit': _git_commit(),
+    }
+
+
+def run_benchmarks(args):
+    results = []
+    for rows in ([] if args.imports else args.sizes):
+        path = dataset_path(args.data_dir, rows, args.seed)
+        for name, setup, run in build_stages(path, args):
+            if name not in args.stages:
+                continue
+            print(f"[{rows:>10,}] {name:<15}", end=' ', flush=True)
+            res = measure(setup, run, args.repeat)
+            print(f"{res['wall_s_median']:8.3f}s  peak alloc {res['peak_alloc_mb']:9.1f} MB  "
+                  f"({res['rows_processed']:,} rows)")
+            results.append({'dataset_rows': rows, 'stage': name, **res})
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {k: v for k, v in vars(args).items() if k not in ('compare', 'output')},
+        'results': results,
+        'imports': measure_imports(args.repeat),
+    }
+
+
+def compare(old_path, new_path):
+    """Print per-stage wall-time ratios between two result files (new / old)."""
+    with open(old_path) as f:
+        old = {(r['dataset_rows'], r['stage']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = {(r['dataset_rows'], r['stage']): r for r in json.load(f)['results']}
+    print(f"{'rows':>10}  {'stage':<15} {'old s':>9} {'new s':>9} {'ratio':>7}")
+    for key in sorted(old.keys() & new.keys()):
+        o, n = old[key]['wall_s_median'], new[key]['wall_s_median']
+        print(f"{key[0]:>10,}  {key[1]:<15} {o:9.3f} {n:9.3f} {n / o:7.2f}")
+
+    with open(old_path) as f:
+        old_imports = {r['target']: r for r in json.load(f).get('imports', [])}
+    with open(new_path) as f:
+        new_imports = {r['target']: r for r in json.load(f).get('imports', [])}
+    for target in sorted(old_imports.keys() & new_imports.keys()):
+        o, n = old_imports[target]['wall_s_median'], new_imports[target]['wall_s_median']
+        print(f"{'imports':>10}  {target:<15} {o:9.3f} {n:9.3f} {n / o:7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default="benchmark_data")
+    parser.add_argument("--output", default=None, help="JSON file (default: benchmark_results/<timestamp>.json)")
+    parser.add_argument("--max-cluster-rows", type=int, default=5000,
+                        help="row cap for clustering (PAM swaps scan all n² distances per iteration)")
+    parser.add_argument("--max-model-rows", type=int, default=20000,
+                        help="row cap for the credit models (SVC scales super-linearly)")
+    parser.add_argument("--imports", action="store_true", help="only measure cold import times")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run_benchmarks(args)
+    output = args.output or os.path.join("benchmark_results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
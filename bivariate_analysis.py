@@ -1,8 +1,9 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
-import streamlit as st
 import numpy as np
+import pandas as pd
 from matplotlib.colors import LinearSegmentedColormap
+from instrumentation import show_blocks
 
 # Set style for beautiful plots
 plt.style.use('default')
@@ -12,45 +13,150 @@ sns.set_palette("husl")
 # Individual Plot Functions
 # -------------------------------
 
-def violin_plot(df):
-    """Enhanced violin plot with dynamic insights"""
-    if {'Loyalty Classification', 'Estimated Income'}.issubset(df.columns):
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Custom color palette
-        colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
-        
+def binned_kde(values, gridsize=512, cut=2):
+    """
+    Gaussian KDE evaluated on a fixed grid from linearly binned counts.
+    Cost is one pass over the values plus a grid-sized convolution, so it
+    does not grow with the number of rows the way a per-point KDE does.
+    Returns (support, density) with the same bandwidth (Scott) and cut as seaborn.
+    """
+    values = np.asarray(values, dtype=float)
+    n = values.size
+    std = values.std(ddof=1) if n > 1 else 0.0
+    if n < 2 or std == 0:
+        return np.array([values.mean()]), np.array([np.nan])
+
+    bw = std * n ** (-1 / 5)
+    lo, hi = values.min() - cut * bw, values.max() + cut * bw
+    support = np.linspace(lo, hi, gridsize)
+    delta = support[1] - support[0]
+
+    # Linear binning: split each observation between its two neighbouring grid points
+    pos = (values - lo) / delta
+    left = np.clip(np.floor(pos).astype(int), 0, gridsize - 2)
+    frac = pos - left
+    counts = np.bincount(left, weights=1 - frac, minlength=gridsize)
+    counts += np.bincount(left + 1, weights=frac, minlength=gridsize)
+
+    # Convolve the binned counts with a Gaussian kernel sampled on the grid
+    half = min(int(np.ceil(4 * bw / delta)), gridsize - 1)
+    offsets = np.arange(-half, half + 1) * delta
+    kernel = np.exp(-0.5 * (offsets / bw) ** 2) / (bw * np.sqrt(2 * np.pi))
+    # With few rows the kernel can be longer than the grid (mode='same' would then return
+    # the kernel's length): take the grid-aligned part of the full convolution instead
+    density = np.convolve(counts, kernel)[half:half + gridsize] / n
+    return support, density
+
+
+def tier_violin_stats(df, group_col='Loyalty Classification', value_col='Estimated Income', gridsize=512):
+    """
+    Precompute violin shapes per tier: binned-KDE density on a fixed grid plus exact quartiles.
+    Tier order follows seaborn (category order for categoricals, first appearance otherwise).
+    """
+    data = df[[group_col, value_col]].dropna()
+    groups = data.groupby(group_col, sort=False, observed=True)[value_col]
+    if isinstance(data[group_col].dtype, pd.CategoricalDtype):
+        order = [c for c in data[group_col].cat.categories if c in groups.groups]
+    else:
+        order = list(pd.unique(data[group_col]))
+
+    stats = []
+    for tier in order:
+        values = groups.get_group(tier).to_numpy(dtype=float)
+        support, density = binned_kde(values, gridsize=gridsize)
+        stats.append({
+            'tier': tier,
+            'n': values.size,
+            'support': support,
+            'density': density,
+            'quartiles': np.percentile(values, [25, 50, 75]),
+        })
+    return stats
+
+
+def draw_violins(ax, stats, colors, width=0.8, alpha=0.8):
+    """Draw violins with quartile lines from precomputed tier stats (seaborn 'area' scaling, inner='quart')."""
+    max_density = np.nanmax([s['density'].max() for s in stats])
+    hw = width / 2
+    for pos, (s, color) in enumerate(zip(stats, colors)):
+        if np.isnan(s['density']).all():
+            span = np.array([hw])
+        else:
+            span = s['density'] / max_density * hw
+        ax.fill_betweenx(s['support'], pos - span, pos + span,
+                         facecolor=color, edgecolor='#3F3F3F', linewidth=1.25, alpha=alpha)
+        for q, dashes in zip(s['quartiles'], [(1.25, .75), (2.5, 1), (1.25, .75)]):
+            qspan = np.interp(q, s['support'], span)
+            ax.plot([pos - qspan, pos + qspan], [q, q], color='#3F3F3F', linewidth=1.25, dashes=dashes)
+    ax.set_xticks(range(len(stats)))
+    ax.set_xticklabels([s['tier'] for s in stats])
+    ax.set_xlim(-0.5, len(stats) - 0.5)
+
+
+VIOLIN_COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
+
+
+def violin_figure(stats=None, df=None):
+    """
+    Income by loyalty tier: precomputed binned-KDE shapes from `stats`
+    (tier_violin_stats), or the original per-row sns.violinplot of `df`.
+    """
+    fig, ax = plt.subplots(figsize=(10, 6))
+
+    if stats is not None:
+        draw_violins(ax, stats, VIOLIN_COLORS)
+    else:
         sns.violinplot(
             x='Loyalty Classification', 
             y='Estimated Income', 
             data=df, 
             inner='quart',
-            palette=colors[:df['Loyalty Classification'].nunique()],
+            palette=VIOLIN_COLORS[:df['Loyalty Classification'].nunique()],
             ax=ax,
             alpha=0.8
         )
-        
-        ax.set_title("💰 Income Distribution by Loyalty Tier", fontsize=16, fontweight='bold', pad=20)
-        ax.set_xlabel("Loyalty Classification", fontsize=12, fontweight='bold')
-        ax.set_ylabel("Estimated Income ($)", fontsize=12, fontweight='bold')
-        ax.grid(True, alpha=0.3, linestyle='--')
-        ax.set_facecolor('#F8F9FA')
-        plt.xticks(rotation=45, fontsize=10, ha='right')
-        plt.yticks(fontsize=10)
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
-        for spine in ax.spines.values():
-            spine.set_edgecolor('#DDDDDD')
-            spine.set_linewidth(1)
-        plt.tight_layout()
-        st.pyplot(fig)
-        plt.close(fig)
-        
-        # Dynamic insight: median income per loyalty tier
-        medians = df.groupby('Loyalty Classification')['Estimated Income'].median()
-        highest_tier = medians.idxmax()
-        lowest_tier = medians.idxmin()
-        st.info(f"📊 **Insight:** Median income is highest for **{highest_tier}** and lowest for **{lowest_tier}**. "
-                f"The width of each violin shows variability; wider shapes indicate more income spread within that tier.")
+
+    ax.set_title("💰 Income Distribution by Loyalty Tier", fontsize=16, fontweight='bold', pad=20)
+    ax.set_xlabel("Loyalty Classification", fontsize=12, fontweight='bold')
+    ax.set_ylabel("Estimated Income ($)", fontsize=12, fontweight='bold')
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.set_facecolor('#F8F9FA')
+    plt.xticks(rotation=45, fontsize=10, ha='right')
+    plt.yticks(fontsize=10)
+    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
+    for spine in ax.spines.values():
+        spine.set_edgecolor('#DDDDDD')
+        spine.set_linewidth(1)
+    plt.tight_layout()
+    return fig
+
+
+def violin_blocks(df, mode='binned'):
+    """
+    (figure builder, args, insights) for the income violins, or [] without the columns.
+    mode='binned' draws precomputed binned-KDE shapes (flat cost as the data grows);
+    mode='seaborn' keeps the original per-row sns.violinplot.
+    """
+    if not {'Loyalty Classification', 'Estimated Income'}.issubset(df.columns):
+        return []
+    # Dynamic insight: median income per loyalty tier
+    if mode == 'binned':
+        stats = tier_violin_stats(df)
+        args = (stats,)
+        medians = pd.Series({s['tier']: s['quartiles'][1] for s in stats})
+    else:
+        args = (None, df[['Loyalty Classification', 'Estimated Income']])
+        medians = df.groupby('Loyalty Classification', observed=True)['Estimated Income'].median()
+    highest_tier = medians.idxmax()
+    lowest_tier = medians.idxmin()
+    return [(violin_figure, args,
+             [f"📊 **Insight:** Median income is highest for **{highest_tier}** and lowest for **{lowest_tier}**. "
+              f"The width of each violin shows variability; wider shapes indicate more income spread within that tier."])]
+
+
+def violin_plot(df, mode='binned'):
+    """Enhanced violin plot with dynamic insights (see violin_blocks for `mode`)."""
+    show_blocks(violin_blocks(df, mode))
 
 # # -------------------------------
 # def scatter_tenure_deposits(df):
@@ -131,44 +237,63 @@ def violin_plot(df):
 #                 f"indicating that higher risk scores generally correspond to {'higher' if corr>0 else 'lower'} DTI ratios.")
 
 # -------------------------------
+def correlation_figure(corr_matrix):
+    """Lower-triangle heatmap of a correlation matrix."""
+    fig, ax = plt.subplots(figsize=(12, 10))
+    colors = ['#FF6B6B', '#FFFFFF', '#4ECDC4']
+    cmap = LinearSegmentedColormap.from_list('custom', colors, N=100)
+    mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
+    sns.heatmap(
+        corr_matrix, mask=mask, annot=True, fmt=".3f", cmap=cmap,
+        center=0, square=True, ax=ax, cbar_kws={"shrink":0.8, "label":"Correlation Coefficient"},
+        annot_kws={"size":10, "weight":"bold"}
+    )
+    ax.set_title("🔗 Feature Correlation Matrix", fontsize=16, fontweight='bold', pad=20)
+    plt.xticks(rotation=45, ha='right', fontsize=10)
+    plt.yticks(rotation=0, fontsize=10)
+    cbar = ax.collections[0].colorbar
+    cbar.ax.tick_params(labelsize=10)
+    plt.tight_layout()
+    return fig
+
+
+def correlation_blocks(df):
+    """(figure builder, args, insights) for the correlation heatmap, or [] with fewer than two numeric columns."""
+    num_cols = df.select_dtypes(include='number').columns
+    if len(num_cols) <= 1:
+        return []
+    corr_matrix = df[num_cols].corr()
+
+    # Dynamic insight: top correlations
+    corr_pairs = corr_matrix.abs().unstack().sort_values(kind="quicksort", ascending=False)
+    corr_pairs = corr_pairs[corr_pairs < 1]  # remove diagonal
+    top = corr_pairs.head(3)
+    insights = []
+    for i, (pair, value) in enumerate(top.items(), 1):
+        f1, f2 = pair
+        direction = "positive" if corr_matrix.loc[f1,f2] > 0 else "negative"
+        insights.append(f"🔹 **Top {i} correlation:** {f1} ↔ {f2} = {corr_matrix.loc[f1,f2]:.2f} ({direction})")
+    return [(correlation_figure, (corr_matrix,), insights)]
+
+
 def correlation_heatmap(df):
     """Correlation heatmap with dynamic insights"""
-    num_cols = df.select_dtypes(include=['int64', 'float64']).columns
-    if len(num_cols) > 1:
-        corr_matrix = df[num_cols].corr()
-        fig, ax = plt.subplots(figsize=(12, 10))
-        colors = ['#FF6B6B', '#FFFFFF', '#4ECDC4']
-        cmap = LinearSegmentedColormap.from_list('custom', colors, N=100)
-        mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
-        sns.heatmap(
-            corr_matrix, mask=mask, annot=True, fmt=".3f", cmap=cmap,
-            center=0, square=True, ax=ax, cbar_kws={"shrink":0.8, "label":"Correlation Coefficient"},
-            annot_kws={"size":10, "weight":"bold"}
-        )
-        ax.set_title("🔗 Feature Correlation Matrix", fontsize=16, fontweight='bold', pad=20)
-        plt.xticks(rotation=45, ha='right', fontsize=10)
-        plt.yticks(rotation=0, fontsize=10)
-        cbar = ax.collections[0].colorbar
-        cbar.ax.tick_params(labelsize=10)
-        plt.tight_layout()
-        st.pyplot(fig)
-        plt.close(fig)
-        
-        # Dynamic insight: top correlations
-        corr_pairs = corr_matrix.abs().unstack().sort_values(kind="quicksort", ascending=False)
-        corr_pairs = corr_pairs[corr_pairs < 1]  # remove diagonal
-        top = corr_pairs.head(3)
-        for i, (pair, value) in enumerate(top.items(), 1):
-            f1, f2 = pair
-            direction = "positive" if corr_matrix.loc[f1,f2] > 0 else "negative"
-            st.info(f"🔹 **Top {i} correlation:** {f1} ↔ {f2} = {corr_matrix.loc[f1,f2]:.2f} ({direction})")
+    show_blocks(correlation_blocks(df))
 
 # -------------------------------
 # Dashboard Creator
 # -------------------------------
 
-def create_bivariate_dashboard(df):
-    """Bivariate Analysis Dashboard with dynamic insights"""
+def bivariate_blocks(df):
+    """Violin and correlation blocks of the bivariate tab; the analysis pipeline runs this as a stage."""
+    return {'violin': violin_blocks(df), 'correlation': correlation_blocks(df)}
+
+
+def create_bivariate_dashboard(df, blocks=None):
+    """Bivariate Analysis Dashboard with dynamic insights; `blocks` from bivariate_blocks (computed here when None)"""
+    import streamlit as st
+    if blocks is None:
+        blocks = bivariate_blocks(df)
     tab_violin,  tab_corr = st.tabs([
         "🎻 Income by Loyalty", 
         # "📈 Tenure vs Deposits", 
@@ -178,7 +303,7 @@ def create_bivariate_dashboard(df):
     
     with tab_violin:
         st.markdown("### 🎻 Income Distribution by Loyalty Tier")
-        violin_plot(df)
+        show_blocks(blocks['violin'])
     
     # with tab_scatter_td:
     #     st.markdown("### 📈 Customer Tenure vs Bank Deposits")
@@ -190,12 +315,13 @@ def create_bivariate_dashboard(df):
     
     with tab_corr:
         st.markdown("### 🔗 Feature Correlation Analysis")
-        correlation_heatmap(df)
+        show_blocks(blocks['correlation'])
 
 # -------------------------------
 # Optional CSS for better styling
 # -------------------------------
 def apply_custom_css():
+    import streamlit as st
     st.markdown("""
     <style>
     .stTabs [data-baseweb="tab-list"] { gap: 24px; }
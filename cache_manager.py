@@ -0,0 +1,397 @@
+"""
+Process-wide, memory-bounded cache shared by every dashboard session.
+
+    cache = cache_manager()
+    pipeline = build_pipeline(cache=cache)        # stage outputs, keyed by content
+    cache.store(('report', key), document, seconds)
+
+Entries are keyed by content: the StageGraph memo keys hash the stage name
+with the fingerprints of the uploaded file and parameters. Analysts who open
+the same dataset therefore share one raw frame, one capped frame and one set
+of engineered features. Before, each session held its own copies.
+
+Each entry records its size in bytes (frames: deep memory usage, arrays:
+nbytes, models and other objects: their array and container attributes) and
+the seconds it took to compute. When the resident total exceeds the budget,
+entries are evicted by one of two policies:
+- 'lru': least recently used first.
+- 'cost': GreedyDual-Size. An entry's priority is the clock value at its last
+  use plus seconds per MB. The lowest priority goes first, and the clock
+  moves up to it. Large entries that are quick to rebuild leave before small,
+  slow ones, and entries nobody touches age out.
+
+An evicted entry's frames and arrays are not dropped, including those inside
+dicts, lists and tuples, as in job results. They are spilled to .npy files
+under the spill directory (one per column, encoded as in the feature store)
+and served from there, memory-mapped copy-on-write. The OS pages them in on
+demand and can reclaim the pages under pressure. Other objects of a spilled
+entry, such as fitted models, stay in memory and still count against the
+budget. Entries with nothing to spill (report documents) are dropped. Spill
+files beyond `disk_budget_mb` are deleted, least recently used first, and the
+spill directory is removed at exit.
+
+Sizes are per entry: columns shared between two entries (a capped frame
+reuses untouched raw columns) are counted in both, so the totals are an upper
+bound.
+"""
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from feature_store import encode_column, decode_column
+
+DEFAULT_BUDGET_MB = 2048
+DEFAULT_DISK_BUDGET_MB = 8192
+DEFAULT_POLICY = 'lru'
+POLICIES = ('lru', 'cost')
+DEFAULT_SPILL_DIR = 'cache_spill'
+MB = 1024 ** 2
+
+
+# --- Sizes ---
+def size_of(value, seen=None):
+    """Approximate bytes held by `value`: frames, arrays, containers and object attributes, each counted once."""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True, deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, np.ndarray):
+        return 0 if isinstance(value.base, np.memmap) or isinstance(value, np.memmap) else value.nbytes
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(size_of(k, seen) + size_of(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(size_of(item, seen) for item in value)
+    if hasattr(value, '__dict__'):  # fitted models: coef_, cluster_centers_, ...
+        return size_of(vars(value), seen)
+    return 0
+
+
+# --- Spill files ---
+class _Spilled:
+    """Placeholder for a frame or array written to `path`."""
+
+    def __init__(self, path, kind):
+        self.path = path
+        self.kind = kind
+
+
+def _spill_frame(frame, path):
+    os.makedirs(path)
+    columns = []
+    for i, col in enumerate(frame.columns):
+        values, info = encode_column(frame[col])
+        np.save(os.path.join(path, f"c{i}.npy"), values, allow_pickle=False)
+        columns.append([col, info])
+    if isinstance(frame.index, pd.RangeIndex):
+        index = {'kind': 'range', 'start': frame.index.start, 'stop': frame.index.stop, 'step': frame.index.step}
+    else:
+        values, index = encode_column(frame.index.to_series())
+        np.save(os.path.join(path, "index.npy"), values, allow_pickle=False)
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump({'columns': columns, 'index': index, 'index_name': frame.index.name}, f)
+
+
+def _load_frame(path):
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    index = manifest['index']
+    if index['kind'] == 'range':
+        index = pd.RangeIndex(index['start'], index['stop'], index['step'], name=manifest['index_name'])
+    else:
+        index = pd.Index(decode_column(np.load(os.path.join(path, "index.npy"), mmap_mode='c'), index),
+                         name=manifest['index_name'])
+    # copy=False keeps the columns on the mapped files (one block each)
+    data = {col: decode_column(np.load(os.path.join(path, f"c{i}.npy"), mmap_mode='c'), info)
+            for i, (col, info) in enumerate(manifest['columns'])}
+    return pd.DataFrame(data, index=index, columns=[col for col, _ in manifest['columns']], copy=False)
+
+
+def _spillable(value):
+    if isinstance(value, pd.DataFrame):
+        # columns that round-trip through the feature store encoding (text and category labels as str)
+        return value.columns.is_unique and all(
+            isinstance(dtype, np.dtype) or isinstance(dtype, pd.CategoricalDtype) and dtype.categories.dtype == object
+            for dtype in value.dtypes)
+    return isinstance(value, np.ndarray) and value.dtype != object and not isinstance(value.base, np.memmap)
+
+
+class _Entry:
+    def __init__(self, value, nbytes, seconds):
+        self.value = value
+        self.nbytes = nbytes  # resident bytes
+        self.spilled_bytes = 0
+        self.seconds = seconds
+        self.priority = 0.0
+        self.hits = 0
+        self.path = None
+        self.spilling = False
+
+
+class CacheManager:
+    """
+    Content-keyed cache under a global memory budget (see the module docstring).
+    Thread-safe; `lookup(key)` / `store(key, value, seconds)` is also the
+    interface StageGraph uses when given a CacheManager as its cache.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB, policy=DEFAULT_POLICY, spill_dir=DEFAULT_SPILL_DIR,
+                 disk_budget_mb=DEFAULT_DISK_BUDGET_MB):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy!r}; expected one of {POLICIES}")
+        self.budget = budget_mb * MB
+        self.disk_budget = disk_budget_mb * MB
+        self.policy = policy
+        self.spill_dir = spill_dir
+        self.entries = OrderedDict()  # least recently used first
+        self.lock = threading.Lock()
+        self.clock = 0.0
+        self.resident = self.on_disk = 0
+        self.counts = {'hits': 0, 'misses': 0, 'spilled': 0, 'dropped': 0}
+        self.pending = 0  # resident bytes of entries being written out
+        self._trash = []  # spill directories to delete once the lock is released
+        self._spill_root = None
+
+    # --- Access ---
+    def lookup(self, key, default=None):
+        """The value stored under `key` (spilled frames come back memory-mapped), or `default`."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counts['misses'] += 1
+                return default
+            self.counts['hits'] += 1
+            entry.hits += 1
+            self._touch(key, entry)
+            value, spilled = entry.value, entry.path is not None
+        if not spilled:
+            return value
+        try:
+            return _restore(value)
+        except OSError:  # its files were deleted meanwhile (disk budget)
+            return default
+
+    def store(self, key, value, seconds=0.0):
+        """Keep `value` under `key`; `seconds` is what it cost to compute (used by the 'cost' policy)."""
+        entry = _Entry(value, size_of(value), seconds)
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = entry
+            self.resident += entry.nbytes
+            self._touch(key, entry)
+            victims = self._victims()
+        self._spill(victims)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                self._remove(key)
+        self._empty_trash()
+
+    # --- Eviction (under the lock; files are written and deleted outside it) ---
+    def _touch(self, key, entry):
+        self.entries.move_to_end(key)
+        entry.priority = self.clock + entry.seconds / max(entry.nbytes + entry.spilled_bytes, 1) * MB
+
+    def _victim(self):
+        """Next resident entry to evict under the policy, or None."""
+        resident = [(key, entry) for key, entry in self.entries.items()
+                    if entry.path is None and not entry.spilling and entry.nbytes > 0]
+        if not resident:
+            return None
+        if self.policy == 'lru':
+            return resident[0]
+        return min(resident, key=lambda item: item[1].priority)  # LRU among equal priorities
+
+    def _victims(self):
+        """
+        Entries to spill until the resident total, less the spills already under way,
+        fits the budget. Entries with nothing to spill are dropped right away.
+        """
+        victims = []
+        while self.resident - self.pending > self.budget:
+            victim = self._victim()
+            if victim is None:
+                break
+            key, entry = victim
+            if self.policy == 'cost':
+                self.clock = entry.priority
+            if _holds_spillable(entry.value):
+                entry.spilling = True
+                self.pending += entry.nbytes
+                victims.append((key, entry))
+            else:
+                self._remove(key)
+                self.counts['dropped'] += 1
+        if victims:
+            self._root()
+        return victims
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.resident -= entry.nbytes
+        self.on_disk -= entry.spilled_bytes
+        if entry.path is not None:
+            self._trash.append(entry.path)
+
+    def _empty_trash(self):
+        with self.lock:
+            paths, self._trash = self._trash, []
+        for path in paths:
+            shutil.rmtree(path, ignore_errors=True)
+
+    # --- Spilling ---
+    def _root(self):
+        if self._spill_root is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            _remove_orphans(self.spill_dir)
+            self._spill_root = tempfile.mkdtemp(prefix=f"{os.getpid()}_", dir=self.spill_dir)
+            atexit.register(shutil.rmtree, self._spill_root, True)
+        return self._spill_root
+
+    def _spill(self, victims):
+        """
+        Write the victims' frames and arrays to disk without holding the lock (lookups
+        keep getting the in-memory value meanwhile), then swap in the placeholders.
+        """
+        for key, entry in victims:
+            path = value = None
+            try:
+                path = tempfile.mkdtemp(dir=self._spill_root)
+                value, _ = _spill_value(entry.value, path, 'v')
+            except OSError:  # disk full or not writable: drop the entry instead
+                pass
+            with self.lock:
+                self.pending -= entry.nbytes
+                entry.spilling = False
+                if value is None or self.entries.get(key) is not entry:  # failed, or replaced meanwhile
+                    if path is not None:
+                        self._trash.append(path)
+                    if self.entries.get(key) is entry:
+                        self._remove(key)
+                        self.counts['dropped'] += 1
+                else:
+                    entry.value = value
+                    entry.path = path
+                    entry.spilled_bytes = entry.nbytes
+                    self.resident -= entry.nbytes
+                    entry.nbytes = size_of(entry.value)
+                    self.resident += entry.nbytes
+                    self.on_disk += entry.spilled_bytes
+                    self.counts['spilled'] += 1
+                    self._trim_disk()
+        self._empty_trash()
+
+    def _trim_disk(self):
+        """Delete spilled entries, least recently used first, while the spill files exceed their budget."""
+        while self.on_disk > self.disk_budget:
+            key = next((k for k, e in self.entries.items() if e.path is not None), None)
+            if key is None:
+                break
+            self._remove(key)
+            self.counts['dropped'] += 1
+
+    # --- Reporting ---
+    def usage(self):
+        """Totals: resident and spilled MB, budget, entry count, hit rate and eviction counts."""
+        with self.lock:
+            lookups = self.counts['hits'] + self.counts['misses']
+            return {'resident_mb': self.resident / MB, 'budget_mb': self.budget / MB, 'spilled_mb': self.on_disk / MB,
+                    'entries': len(self.entries), 'hit_rate': self.counts['hits'] / lookups if lookups else 0.0,
+                    'policy': self.policy, **self.counts}
+
+    def report(self):
+        """One row per entry, least recently used first: MB in memory and on disk, compute seconds, hits."""
+        with self.lock:
+            rows = [{'entry': str(key)[:12], 'resident_mb': e.nbytes / MB, 'spilled_mb': e.spilled_bytes / MB,
+                     'seconds': e.seconds, 'hits': e.hits, 'priority': e.priority}
+                    for key, e in self.entries.items()]
+        return pd.DataFrame(rows, columns=['entry', 'resident_mb', 'spilled_mb', 'seconds', 'hits', 'priority'])
+
+
+def _remove_orphans(spill_dir):
+    """Delete the spill directories of processes that are gone (killed before their exit handler ran)."""
+    for name in os.listdir(spill_dir):
+        pid = name.split('_', 1)[0]
+        if not pid.isdigit():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(spill_dir, name), ignore_errors=True)
+        except OSError:  # alive, owned by another user
+            pass
+
+
+def _holds_spillable(value):
+    if isinstance(value, dict):
+        return any(_holds_spillable(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_holds_spillable(v) for v in value)
+    return _spillable(value)
+
+
+def _spill_value(value, path, name):
+    """
+    `value` with its frames and arrays (also inside dicts, lists and tuples) written
+    under `path` and replaced by placeholders; returns (value, number written).
+    """
+    if _spillable(value):
+        target = os.path.join(path, name)
+        if isinstance(value, pd.DataFrame):
+            _spill_frame(value, target)
+            return _Spilled(target, 'frame'), 1
+        np.save(target + '.npy', value, allow_pickle=False)
+        return _Spilled(target + '.npy', 'array'), 1
+    if isinstance(value, dict):
+        items = {k: _spill_value(v, path, f"{name}_{i}") for i, (k, v) in enumerate(value.items())}
+        return {k: v for k, (v, _) in items.items()}, sum(n for _, n in items.values())
+    if isinstance(value, (list, tuple)):
+        items = [_spill_value(v, path, f"{name}_{i}") for i, v in enumerate(value)]
+        return type(value)(v for v, _ in items), sum(n for _, n in items)
+    return value, 0
+
+
+def _restore(value):
+    """A spilled value with its frames and arrays mapped back from disk."""
+    if isinstance(value, _Spilled):
+        return _load_frame(value.path) if value.kind == 'frame' else np.load(value.path, mmap_mode='c')
+    if isinstance(value, dict):
+        return {k: _restore(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_restore(v) for v in value)
+    return value
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def cache_manager():
+    """
+    The process-wide CacheManager shared by every session. The budget and policy
+    come from CACHE_BUDGET_MB and CACHE_POLICY when set.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = CacheManager(budget_mb=float(os.environ.get('CACHE_BUDGET_MB', DEFAULT_BUDGET_MB)),
+                                    policy=os.environ.get('CACHE_POLICY', DEFAULT_POLICY))
+        return _manager
@@ -1,106 +1,251 @@
 # tab8_model_comparison.py
 
 import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
-from sklearn.svm import SVC
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.metrics import roc_curve, auc, classification_report, roc_auc_score
-import streamlit as st
-
-def run_model_comparison(data1):
-    # --- Features & Target ---
-    X = data1[['Credit Card Balance', 
-               'Total Relationship Balance', 
-               'Estimated Income', 
-               'Customer Tenure', 
-               'Product Concentration']]
+from instrumentation import span, show_figure
+
+RISK_FEATURES = ['Credit Card Balance',
+                 'Total Relationship Balance',
+                 'Estimated Income',
+                 'Customer Tenure',
+                 'Product Concentration']
+
+# Legend labels on the ROC plot
+SHORT_NAMES = {"SVM": "SVM", "Random Forest": "RF", "Gradient Boosting": "GB"}
+
+
+def risk_target(data1):
+    """High-risk flag: Risk Weighting above the portfolio median."""
+    return (data1['Risk Weighting'] > data1['Risk Weighting'].median()).astype(int)
+
+
+def build_models(prescaled=False):
+    """The compared models; with prescaled=True the SVM expects already standardised input."""
+    # sklearn loads on first use, not at dashboard start-up
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.pipeline import Pipeline
+    from sklearn.svm import SVC
+    from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+    svm = SVC(kernel='rbf', probability=True, random_state=42)
+    return {
+        "SVM": svm if prescaled else Pipeline([
+            ('scaler', StandardScaler()),
+            ('svm', svm)
+        ]),
+        "Random Forest": RandomForestClassifier(random_state=42),
+        "Gradient Boosting": GradientBoostingClassifier(random_state=42),
+    }
+
+
+def compare_models(data1, progress=None):
+    """
+    Fit SVM, Random Forest and Gradient Boosting on an 80/20 split.
+    Returns dict with fitted 'models', test-set 'probs', 'roc' curves, 'aucs' and the SVM 'svm_report'.
+    `progress(done, total, label)` is called before each model and at the end.
+    """
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import roc_curve, auc, classification_report
 
-    y = (data1['Risk Weighting'] > data1['Risk Weighting'].median()).astype(int)
+    # --- Features & Target ---
+    X = data1[RISK_FEATURES]
+    y = risk_target(data1)
 
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42
     )
 
-    # --- SVM ---
-    svm_clf = Pipeline([
-        ('scaler', StandardScaler()),
-        ('svm', SVC(kernel='rbf', probability=True, random_state=42))
-    ])
-    svm_clf.fit(X_train, y_train)
-    y_pred_svm = svm_clf.predict_proba(X_test)[:,1]
-
-    st.subheader("SVM Classification Report")
-    st.text(classification_report(y_test, svm_clf.predict(X_test)))
-    st.write("SVM AUC:", roc_auc_score(y_test, y_pred_svm))
-
-    # --- Random Forest ---
-    rf = RandomForestClassifier(random_state=42)
-    rf.fit(X_train, y_train)
-    y_pred_rf = rf.predict_proba(X_test)[:,1]
-    st.write("Random Forest AUC:", roc_auc_score(y_test, y_pred_rf))
-
-    # --- Gradient Boosting ---
-    gb = GradientBoostingClassifier(random_state=42)
-    gb.fit(X_train, y_train)
-    y_pred_gb = gb.predict_proba(X_test)[:,1]
-    st.write("Gradient Boosting AUC:", roc_auc_score(y_test, y_pred_gb))
+    models = build_models()
+    probs, roc, aucs = {}, {}, {}
+    for i, name in enumerate(models):
+        model = models[name]
+        if progress is not None:
+            progress(i, len(models), f"fitting {name}")
+        with span(f"Fit: {name}", rows=len(X_train), category='model'):
+            model.fit(X_train, y_train)
+        probs[name] = model.predict_proba(X_test)[:,1]
+        fpr, tpr, _ = roc_curve(y_test, probs[name])
+        roc[name] = (fpr, tpr)
+        aucs[name] = auc(fpr, tpr)
+    if progress is not None:
+        progress(len(models), len(models), 'done')
+
+    return {
+        'models': models,
+        'y_test': y_test,
+        'probs': probs,
+        'roc': roc,
+        'aucs': aucs,
+        'svm_report': classification_report(y_test, models["SVM"].predict(X_test)),
+    }
+
 
-    # --- ROC Curves ---
-    fpr_svm, tpr_svm, _ = roc_curve(y_test, y_pred_svm)
-    fpr_rf, tpr_rf, _   = roc_curve(y_test, y_pred_rf)
-    fpr_gb, tpr_gb, _   = roc_curve(y_test, y_pred_gb)
-
-    roc_auc_svm = auc(fpr_svm, tpr_svm)
-    roc_auc_rf  = auc(fpr_rf, tpr_rf)
-    roc_auc_gb  = auc(fpr_gb, tpr_gb)
-
-    plt.figure(figsize=(6,4))
-    plt.plot(fpr_svm, tpr_svm, label=f"SVM (AUC={roc_auc_svm:.3f})")
-    plt.plot(fpr_rf, tpr_rf, label=f"RF (AUC={roc_auc_rf:.3f})")
-    plt.plot(fpr_gb, tpr_gb, label=f"GB (AUC={roc_auc_gb:.3f})")
-    plt.plot([0,1], [0,1], 'k--')
-
-    plt.title("ROC Curve Comparison")
-    plt.xlabel("False Positive Rate")
-    plt.ylabel("True Positive Rate")
-    plt.legend(loc="lower right")
-    plt.grid(alpha=0.3)
-
-    st.pyplot(plt)
-
-
-    # Collect model AUCs
-    model_aucs = {
-        "SVM": roc_auc_svm,
-        "Random Forest": roc_auc_rf,
-        "Gradient Boosting": roc_auc_gb
+def _fit_fold(name, fold, X_train, y_train, X_test):
+    """One (model, fold) task: fit on the fold's training rows, score its held-out rows."""
+    model = build_models(prescaled=True)[name]
+    model.fit(X_train, y_train)
+    return name, fold, model.predict_proba(X_test)[:, 1], model.predict(X_test)
+
+
+def compare_models_cv(data1, n_splits=5, n_jobs=-1, progress=None):
+    """
+    Stratified k-fold comparison of the same three models.
+    Fold indices and the standardised fold matrices are computed once and
+    shared by every model (trees are unaffected by the scaling), then all
+    (model, fold) fits run in parallel worker processes.
+    Returns the compare_models keys, with 'aucs' the mean fold AUC and 'roc'
+    pooled out-of-fold curves, plus 'auc_std', 'pooled_aucs' and 'fold_aucs'.
+    """
+    import numpy as np
+    import pandas as pd
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedKFold
+    from sklearn.metrics import roc_curve, roc_auc_score, classification_report
+
+    X = data1[RISK_FEATURES].to_numpy(dtype=float)
+    y = risk_target(data1).to_numpy()
+
+    # --- Shared preprocessing: folds and train-fold standardisation, once ---
+    folds = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42).split(X, y))
+    matrices = []
+    for train_idx, test_idx in folds:
+        mean, std = X[train_idx].mean(axis=0), X[train_idx].std(axis=0)
+        std[std == 0] = 1.0
+        matrices.append(((X[train_idx] - mean) / std, (X[test_idx] - mean) / std))
+
+    # Slowest models first so the long fits do not end up last on a worker
+    names = ["SVM", "Gradient Boosting", "Random Forest"]
+    tasks = [delayed(_fit_fold)(name, k, matrices[k][0], y[folds[k][0]], matrices[k][1])
+             for name in names for k in range(n_splits)]
+    oof_probs = {name: np.empty(len(y)) for name in names}
+    oof_labels = {name: np.empty(len(y), dtype=y.dtype) for name in names}
+    fold_aucs = pd.DataFrame(index=pd.RangeIndex(n_splits, name='fold'), columns=names, dtype=float)
+    if progress is not None:
+        progress(0, len(tasks), f"fitting {len(tasks)} model/fold pairs")
+    with span(f"Fit: {n_splits}-fold comparison", rows=len(X), category='model'):
+        results = Parallel(n_jobs=n_jobs, return_as='generator_unordered')(tasks)
+        for done, (name, k, probs, labels) in enumerate(results, start=1):
+            test_idx = folds[k][1]
+            oof_probs[name][test_idx], oof_labels[name][test_idx] = probs, labels
+            fold_aucs.loc[k, name] = roc_auc_score(y[test_idx], probs)
+            if progress is not None:
+                progress(done, len(tasks), f"fitted {name} fold {k + 1}")
+
+    roc = {}
+    for name in names:
+        fpr, tpr, _ = roc_curve(y, oof_probs[name])
+        roc[name] = (fpr, tpr)
+    return {
+        'folds': n_splits,
+        'y_test': pd.Series(y, index=data1.index),
+        'probs': oof_probs,
+        'roc': roc,
+        'aucs': fold_aucs.mean().to_dict(),
+        'auc_std': fold_aucs.std().to_dict(),
+        'pooled_aucs': {name: roc_auc_score(y, oof_probs[name]) for name in names},
+        'fold_aucs': fold_aucs,
+        'svm_report': classification_report(y, oof_labels["SVM"]),
     }
 
+
+def cv_summary(results):
+    """Mean, spread and pooled out-of-fold AUC per model from compare_models_cv."""
+    import pandas as pd
+    return pd.DataFrame({
+        'Mean AUC': results['aucs'],
+        'Std': results['auc_std'],
+        'Min': results['fold_aucs'].min(),
+        'Max': results['fold_aucs'].max(),
+        'Pooled OOF AUC': results['pooled_aucs'],
+    }).sort_values('Mean AUC', ascending=False)
+
+
+def roc_figure(roc, aucs, title="ROC Curve Comparison"):
+    fig, ax = plt.subplots(figsize=(6,4))
+    for name, (fpr, tpr) in roc.items():
+        ax.plot(fpr, tpr, label=f"{SHORT_NAMES.get(name, name)} (AUC={aucs[name]:.3f})")
+    ax.plot([0,1], [0,1], 'k--')
+
+    ax.set_title(title)
+    ax.set_xlabel("False Positive Rate")
+    ax.set_ylabel("True Positive Rate")
+    ax.legend(loc="lower right")
+    ax.grid(alpha=0.3)
+    return fig
+
+
+def model_insights(model_aucs, pooled_aucs=None):
+    """
+    Insight (label, text) pairs and a recommendation from the model AUCs.
+    With cross-validation pass the pooled out-of-fold AUCs too: a model only counts
+    as better than random when both its mean fold AUC and its pooled AUC exceed 0.5.
+    """
     # Find best and worst models dynamically
     best_model = max(model_aucs, key=model_aucs.get)
     worst_model = min(model_aucs, key=model_aucs.get)
 
+    items = [
+        ("Best Performing Model", f"{best_model} with AUC {model_aucs[best_model]:.3f}"),
+        ("Lowest Performing Model", f"{worst_model} with AUC {model_aucs[worst_model]:.3f}"),
+        ("Performance Gap", f"{model_aucs[best_model] - model_aucs[worst_model]:.3f} between best and worst models"),
+    ]
+    at_chance = [name for name in model_aucs
+                 if model_aucs[name] <= 0.5 or (pooled_aucs is not None and pooled_aucs[name] <= 0.5)]
+    if at_chance:
+        items.append(("Versus Random", f"{', '.join(at_chance)} did not score above 0.5 AUC → "
+                                       f"no better than random ranking on this data"))
+    else:
+        items.append(("Versus Random", "All models scored above 0.5 AUC → indicating better than random performance"))
+
+    # Optional: add recommendation
+    if best_model == "Random Forest":
+        recommendation = "🌲 Random Forest is the most reliable here, great for non-linear patterns and interpretability."
+    elif best_model == "Gradient Boosting":
+        recommendation = "🚀 Gradient Boosting outperforms others — consider fine-tuning with learning rate & depth."
+    else:
+        recommendation = "⚡ SVM leads — works well with scaled data, might benefit from hyperparameter tuning."
+    return items, recommendation
+
+
+def run_model_comparison(data1, cv_folds=None):
+    results = compare_models_cv(data1, cv_folds) if cv_folds else compare_models(data1)
+    render_model_comparison(results)
+    return results
+
+
+def render_model_comparison(results):
+    import streamlit as st
+    aucs = results['aucs']
+    cross_validated = 'fold_aucs' in results
+
+    if cross_validated:
+        st.subheader(f"SVM Classification Report (out-of-fold, {results['folds']} folds)")
+    else:
+        st.subheader("SVM Classification Report")
+    st.text(results['svm_report'])
+    if cross_validated:
+        st.write(f"{results['folds']}-fold cross-validated AUC:")
+        st.dataframe(cv_summary(results).round(4), use_container_width=True)
+    else:
+        st.write("SVM AUC:", aucs["SVM"])
+        st.write("Random Forest AUC:", aucs["Random Forest"])
+        st.write("Gradient Boosting AUC:", aucs["Gradient Boosting"])
+
+    # --- ROC Curves ---
+    title = "Pooled Out-of-Fold ROC Curves" if cross_validated else "ROC Curve Comparison"
+    fig = roc_figure(results['roc'], results.get('pooled_aucs', aucs), title)
+    show_figure(fig)
+    plt.close(fig)
+
+    items, recommendation = model_insights(aucs, results.get('pooled_aucs'))
+    rows = "".join(f"<li><b>{label}:</b> {text}</li>" for label, text in items)
     st.markdown(
         f"""
         <div class="insight-card">
             <p><b> Model Comparison Insights:</b></p>
             <ul>
-                <li><b>Best Performing Model:</b> {best_model} with AUC {model_aucs[best_model]:.3f}</li>
-                <li> <b>Lowest Performing Model:</b> {worst_model} with AUC {model_aucs[worst_model]:.3f}</li>
-                <li> <b>Performance Gap:</b> {model_aucs[best_model] - model_aucs[worst_model]:.3f} between best and worst models</li>
-                <li> All models scored above 0.5 AUC → indicating better than random performance</li>
+                {rows}
             </ul>
         </div>
         """,
         unsafe_allow_html=True
     )
-
-    # Optional: add recommendation
-    if best_model == "Random Forest":
-        st.success("🌲 Random Forest is the most reliable here, great for non-linear patterns and interpretability.")
-    elif best_model == "Gradient Boosting":
-        st.success("🚀 Gradient Boosting outperforms others — consider fine-tuning with learning rate & depth.")
-    else:
-        st.success("⚡ SVM leads — works well with scaled data, might benefit from hyperparameter tuning.")
+    st.success(recommendation)
@@ -1,132 +1,165 @@
 import matplotlib.pyplot as plt
-import streamlit as st
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.cluster import KMeans
-from sklearn.mixture import GaussianMixture
-from sklearn_extra.cluster import KMedoids
 import pandas as pd
+from instrumentation import span, show_figure
+from distance_engine import DEFAULT_MEMORY_MB
+
+# Required columns
+SEGMENT_FEATURES = ['Customer Tenure', 'Product Concentration',
+                    'Total Relationship Balance', 'Estimated Income']
+
+# method -> (label column, display name, colormap)
+SEGMENT_METHODS = {
+    'KMeans': ('KMeans_Segment', 'KMeans', 'viridis'),
+    'GMM': ('GMM_Segment', 'Gaussian Mixture Model (GMM)', 'plasma'),
+    'PAM': ('PAM_Segment', 'Partition Around Medoids (PAM)', 'inferno'),
+}
+SILHOUETTE_SAMPLE = 2000  # points scored per method, each against every customer
+
+
+def segment_customers(df, progress=None, memory_mb=DEFAULT_MEMORY_MB, model_state=None):
+    """
+    Fit KMeans, GMM and PAM on the standardised segmentation features and
+    project to 2D with PCA. Adds the *_Segment label columns to df.
+    Returns dict with 'labels', 'pca', 'profiles', 'counts' and 'silhouette' per method,
+    and 'gmm' (how the mixture was fitted).
+    PAM and the silhouettes use blocked distances within `memory_mb` (no n x n matrix).
+    The GMM keeps the best of parallel restarts; with a `model_state` directory it
+    warm-starts from the previous fit when the data is close.
+    `progress(done, total, label)` is called before each clusterer and at the end.
+    """
+    # sklearn loads on first use, not at dashboard start-up
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.decomposition import PCA
+    from sklearn.cluster import KMeans
+    from mixture_model import MixtureState, ParallelGaussianMixture
+    from distance_engine import BlockedKMedoids, silhouette
+
+    rfm_features = df[SEGMENT_FEATURES]
+
+    # Standardize features
+    scaler = StandardScaler()
+    rfm_scaled = scaler.fit_transform(rfm_features)
+
+    clusterers = {
+        'KMeans': KMeans(n_clusters=4, random_state=42),
+        'GMM': ParallelGaussianMixture(n_components=4, random_state=42, columns=SEGMENT_FEATURES, scaler=scaler,
+                                       state=None if model_state is None else MixtureState(model_state)),
+        'PAM': BlockedKMedoids(n_clusters=4, memory_mb=memory_mb),
+    }
+    labels = {}
+    for i, (method, model) in enumerate(clusterers.items()):
+        if progress is not None:
+            progress(i, len(clusterers), f"fitting {method}")
+        with span(f"Cluster: {method}", rows=len(rfm_scaled), category='model'):
+            labels[method] = model.fit_predict(rfm_scaled)
+        df[SEGMENT_METHODS[method][0]] = labels[method]
+
+    # PCA for 2D visualization
+    pca = PCA(n_components=2)
+    with span("PCA projection", rows=len(rfm_scaled), category='model'):
+        pca_data = pca.fit_transform(rfm_scaled)
+
+    profiles, counts, silhouettes = {}, {}, {}
+    engine = clusterers['PAM'].engine_
+    for method, (label_col, _, _) in SEGMENT_METHODS.items():
+        profiles[method] = df.groupby(label_col)[SEGMENT_FEATURES].mean()
+        counts[method] = df[label_col].value_counts().sort_index()
+        with span(f"Silhouette: {method}", rows=len(rfm_scaled), category='model'):
+            silhouettes[method] = silhouette(engine, labels[method], sample_size=SILHOUETTE_SAMPLE)
+
+    gmm = clusterers['GMM']
+    fit_info = {'start': gmm.start_, 'stochastic': gmm.stochastic_, 'iterations': int(gmm.n_iter_),
+                'lower_bound': float(gmm.lower_bound_)}
+
+    if progress is not None:
+        progress(len(clusterers), len(clusterers), 'done')
+    return {'labels': labels, 'pca': pca_data, 'profiles': profiles, 'counts': counts, 'silhouette': silhouettes,
+            'gmm': fit_info}
+
+
+def segment_insights(profile, counts, silhouette=None):
+    """Insight (label, text) pairs for one clustering method."""
+    # Top segments
+    top_income = profile['Estimated Income'].idxmax()
+    top_balance = profile['Total Relationship Balance'].idxmax()
+    separation = [] if silhouette is None else [("Separation", f"silhouette {silhouette:.2f} (1 = well separated)")]
+    return separation + [
+        ("Number of Segments", f"{counts.shape[0]}"),
+        ("Largest Segment", f"Cluster {counts.idxmax()} with {counts.max()} customers"),
+        ("Smallest Segment", f"Cluster {counts.idxmin()} with {counts.min()} customers"),
+        ("Wealthiest Segment", f"Cluster {top_income} (highest avg income)"),
+        ("Strongest Relationship", f"Cluster {top_balance} (highest avg relationship balance)"),
+    ]
+
+
+def cluster_figure(pca_data, labels, title, cmap):
+    """PCA scatter coloured by cluster label."""
+    fig, ax = plt.subplots(figsize=(5,3))
+    scatter = ax.scatter(pca_data[:,0], pca_data[:,1], c=labels, cmap=cmap, alpha=0.7)
+    ax.set_title(title, fontsize=10, fontweight='bold')
+    ax.set_xlabel("PCA Component 1", fontsize=8)
+    ax.set_ylabel("PCA Component 2", fontsize=8)
+    ax.grid(True, alpha=0.3)
+    cbar = fig.colorbar(scatter, ax=ax, fraction=0.046, pad=0.04)
+    cbar.set_label("Cluster", fontsize=8)
+    cbar.ax.tick_params(labelsize=7)
+    return fig
+
 
 def clustering_dashboard(df):
     """
     Customer Segmentation Dashboard with dynamic insights
     df: feature-engineered dataframe with columns:
-        'Customer Tenure', 'Product Concentration', 
+        'Customer Tenure', 'Product Concentration',
         'Total Relationship Balance', 'Estimated Income'
     Returns:
         df with cluster labels
     """
+    import streamlit as st
 
-    # Required columns
-    required_cols = ['Customer Tenure', 'Product Concentration', 
-                     'Total Relationship Balance', 'Estimated Income']
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    missing_cols = [col for col in SEGMENT_FEATURES if col not in df.columns]
     if missing_cols:
         st.error(f"Missing columns for clustering: {missing_cols}")
         return df
 
-    rfm_features = df[required_cols]
-
-    # Standardize features
-    scaler = StandardScaler()
-    rfm_scaled = scaler.fit_transform(rfm_features)
-
-    # KMeans Clustering
-    kmeans = KMeans(n_clusters=4, random_state=42)
-    kmeans_labels = kmeans.fit_predict(rfm_scaled)
-    df['KMeans_Segment'] = kmeans_labels
-
-    # Gaussian Mixture Model
-    gmm = GaussianMixture(n_components=4, random_state=42)
-    gmm_labels = gmm.fit_predict(rfm_scaled)
-    df['GMM_Segment'] = gmm_labels
-
-    # K-Medoids (PAM)
-    kmedoids = KMedoids(n_clusters=4, random_state=42, method='pam')
-    kmedoids_labels = kmedoids.fit_predict(rfm_scaled)
-    df['PAM_Segment'] = kmedoids_labels
+    segments = segment_customers(df)
+    render_segments(segments)
+    return df
 
-    # PCA for 2D visualization
-    pca = PCA(n_components=2)
-    pca_data = pca.fit_transform(rfm_scaled)
-
-    # Sub-tabs for each clustering technique
-    tab_kmeans, tab_gmm, tab_pam = st.tabs(["KMeans", "Gaussian Mixture Model (GMM)", "Partition Around Medoids (PAM)"])
-
-    # --- Helper: Generate Insights ---
-    def clustering_insights(df, label_col, method_name):
-        st.markdown(f"### 🔍 Insights: {method_name}")
-        cluster_summary = df.groupby(label_col)[required_cols].mean()
-        counts = df[label_col].value_counts().sort_index()
-
-        # Top segments
-        top_income = cluster_summary['Estimated Income'].idxmax()
-        top_balance = cluster_summary['Total Relationship Balance'].idxmax()
-
-        st.markdown(
-            f"""
-            <div class="insight-card">
-                <ul>
-                    <li><b>Number of Segments:</b> {counts.shape[0]}</li>
-                    <li><b>Largest Segment:</b> Cluster {counts.idxmax()} with {counts.max()} customers</li>
-                    <li><b>Smallest Segment:</b> Cluster {counts.idxmin()} with {counts.min()} customers</li>
-                    <li><b>Wealthiest Segment:</b> Cluster {top_income} (highest avg income)</li>
-                    <li><b>Strongest Relationship:</b> Cluster {top_balance} (highest avg relationship balance)</li>
-                </ul>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-
-        # Optional: show summary dataframe
-        st.dataframe(cluster_summary.style.highlight_max(color="lightgreen", axis=0))
-
-    # --- KMeans Plot + Insights ---
-    with tab_kmeans:
-        fig, ax = plt.subplots(figsize=(5,3))
-        scatter = ax.scatter(pca_data[:,0], pca_data[:,1], c=kmeans_labels, cmap='viridis', alpha=0.7)
-        ax.set_title("KMeans Clustering", fontsize=10, fontweight='bold')
-        ax.set_xlabel("PCA Component 1", fontsize=8)
-        ax.set_ylabel("PCA Component 2", fontsize=8)
-        ax.grid(True, alpha=0.3)
-        cbar = fig.colorbar(scatter, ax=ax, fraction=0.046, pad=0.04)
-        cbar.set_label("Cluster", fontsize=8)
-        cbar.ax.tick_params(labelsize=7)
-        st.pyplot(fig)
-        plt.close()
-
-        clustering_insights(df, 'KMeans_Segment', "KMeans")
-
-    # --- GMM Plot + Insights ---
-    with tab_gmm:
-        fig, ax = plt.subplots(figsize=(5,3))
-        scatter = ax.scatter(pca_data[:,0], pca_data[:,1], c=gmm_labels, cmap='plasma', alpha=0.7)
-        ax.set_title("Gaussian Mixture Model (GMM)", fontsize=10, fontweight='bold')
-        ax.set_xlabel("PCA Component 1", fontsize=8)
-        ax.set_ylabel("PCA Component 2", fontsize=8)
-        ax.grid(True, alpha=0.3)
-        cbar = fig.colorbar(scatter, ax=ax, fraction=0.046, pad=0.04)
-        cbar.set_label("Cluster", fontsize=8)
-        cbar.ax.tick_params(labelsize=7)
-        st.pyplot(fig)
-        plt.close()
-
-        clustering_insights(df, 'GMM_Segment', "Gaussian Mixture Model (GMM)")
-
-    # --- PAM Plot + Insights ---
-    with tab_pam:
-        fig, ax = plt.subplots(figsize=(5,3))
-        scatter = ax.scatter(pca_data[:,0], pca_data[:,1], c=kmedoids_labels, cmap='inferno', alpha=0.7)
-        ax.set_title("Partition Around Medoids (PAM)", fontsize=10, fontweight='bold')
-        ax.set_xlabel("PCA Component 1", fontsize=8)
-        ax.set_ylabel("PCA Component 2", fontsize=8)
-        ax.grid(True, alpha=0.3)
-        cbar = fig.colorbar(scatter, ax=ax, fraction=0.046, pad=0.04)
-        cbar.set_label("Cluster", fontsize=8)
-        cbar.ax.tick_params(labelsize=7)
-        st.pyplot(fig)
-        plt.close()
-
-        clustering_insights(df, 'PAM_Segment', "Partition Around Medoids (PAM)")
 
-    return df
+def render_segments(segments):
+    """Sub-tabs with the PCA scatter and insights for each clustering technique."""
+    import streamlit as st
+    tabs = st.tabs(["KMeans", "Gaussian Mixture Model (GMM)", "Partition Around Medoids (PAM)"])
+
+    for tab, (method, (_, name, cmap)) in zip(tabs, SEGMENT_METHODS.items()):
+        with tab:
+            title = "KMeans Clustering" if method == 'KMeans' else name
+            fig = cluster_figure(segments['pca'], segments['labels'][method], title, cmap)
+            show_figure(fig)
+            plt.close(fig)
+            if method == 'GMM' and 'gmm' in segments:
+                info = segments['gmm']
+                st.caption(f"{info['start'].capitalize()} start{', stochastic EM' if info['stochastic'] else ''}: "
+                           f"converged in {info['iterations']} full EM iterations.")
+
+            st.markdown(f"### 🔍 Insights: {name}")
+            profile = segments['profiles'][method]
+            items = "".join(
+                f"<li><b>{label}:</b> {text}</li>"
+                for label, text in segment_insights(profile, segments['counts'][method],
+                                                    segments.get('silhouette', {}).get(method))
+            )
+            st.markdown(
+                f"""
+                <div class="insight-card">
+                    <ul>
+                        {items}
+                    </ul>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+
+            # Optional: show summary dataframe
+            st.dataframe(profile.style.highlight_max(color="lightgreen", axis=0))
@@ -1,19 +1,48 @@
 # tab9_deposit_growth.py
 
 import matplotlib.pyplot as plt
-import seaborn as sns
-import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, r2_score
+from regression_engine import RegressionStats
+from instrumentation import span, show_figure
+
+DEPOSIT_FEATURES = ['Estimated Income', 'Age', 'Customer Tenure']
+
+
+def plot_feature_fit(ax, data1, feature, stats, max_points=5000, seed=42):
+    """
+    Feature vs deposits with the OLS line and its 95% band computed analytically
+    from `stats` (no bootstrap), over a random sample of at most `max_points` rows.
+    """
+    x = data1[feature].to_numpy(dtype=float)
+    y = data1['Bank Deposits'].to_numpy(dtype=float)
+    if len(x) > max_points:
+        idx = np.random.default_rng(seed).choice(len(x), max_points, replace=False)
+        ax.scatter(x[idx], y[idx], alpha=0.6, s=15)
+        ax.set_title(f"{feature} vs Bank Deposits (sample of {max_points:,} / {len(x):,})")
+    else:
+        ax.scatter(x, y, alpha=0.6, s=15)
+        ax.set_title(f"{feature} vs Bank Deposits")
+
+    fit = stats.solve([feature])
+    grid = np.linspace(np.nanmin(x), np.nanmax(x), 100)
+    y_hat, lower, upper = stats.confidence_band(fit, grid)
+    ax.plot(grid, y_hat, color="red")
+    ax.fill_between(grid, lower, upper, color="red", alpha=0.15)
+    ax.set_xlabel(feature)
+    ax.set_ylabel("Bank Deposits")
 
-def run_deposit_growth_analysis(data1):
-    st.subheader("🏦 Deposit Growth Analysis (Regression)")
+
+def fit_deposit_regression(data1):
+    """
+    Fit the deposit regression on a 70/30 split from sufficient statistics.
+    Returns dict with the 'fit', train/test/full 'stats', test predictions and R²/MSE.
+    """
+    # sklearn loads on first use, not at dashboard start-up
+    from sklearn.model_selection import train_test_split
 
     # Features & Target
-    X = data1[['Estimated Income', 'Age', 'Customer Tenure']]
+    X = data1[DEPOSIT_FEATURES]
     y = data1['Bank Deposits']
 
     # Train-test split
@@ -21,26 +50,34 @@ def run_deposit_growth_analysis(data1):
         X, y, test_size=0.3, random_state=42
     )
 
-    # Train regression model
-    reg = LinearRegression()
-    reg.fit(X_train, y_train)
+    # Train regression model from sufficient statistics
+    with span("Fit: OLS (sufficient statistics)", rows=len(X), category='model'):
+        train_stats = RegressionStats.from_frame(X_train.assign(**{'Bank Deposits': y_train}), DEPOSIT_FEATURES, 'Bank Deposits')
+        test_stats = RegressionStats.from_frame(X_test.assign(**{'Bank Deposits': y_test}), DEPOSIT_FEATURES, 'Bank Deposits')
+        fit = train_stats.solve()
 
     # Predictions
-    y_pred = reg.predict(X_test)
-
-    # Metrics
-    r2 = r2_score(y_test, y_pred)
-    mse = mean_squared_error(y_test, y_pred)
-
-    st.write("**Regression Coefficients:**", dict(zip(X.columns, reg.coef_)))
-    st.write("**Intercept:**", reg.intercept_)
-    st.write("**R² Score:**", round(r2, 3))
-    st.write("**MSE:**", round(mse, 2))
-
-    # --- Plots ---
-    st.markdown("### 📊 Plots with Insights")
-
-    # 1. Actual vs Predicted
+    y_pred = train_stats.predict(X_test, fit)
+
+    # Metrics (closed form on the test statistics)
+    test_scores = test_stats.score(fit)
+
+    return {
+        'features': DEPOSIT_FEATURES,
+        'fit': fit,
+        'train_stats': train_stats,
+        'test_stats': test_stats,
+        'full_stats': train_stats.copy().merge(test_stats),
+        'y_test': y_test,
+        'y_pred': y_pred,
+        'residuals': y_test - y_pred,
+        'r2': test_scores['r2'],
+        'mse': test_scores['mse'],
+    }
+
+
+def actual_vs_predicted_figure(results):
+    y_test, y_pred = results['y_test'], results['y_pred']
     fig1, ax1 = plt.subplots(figsize=(15,4))
     ax1.scatter(y_test, y_pred, alpha=0.6, color="teal")
     ax1.plot([y_test.min(), y_test.max()],
@@ -49,21 +86,34 @@ def run_deposit_growth_analysis(data1):
     ax1.set_xlabel("Actual Deposits")
     ax1.set_ylabel("Predicted Deposits")
     ax1.set_title("Actual vs Predicted Deposits")
-    st.pyplot(fig1)
+    return fig1
 
-    error_mean = np.mean(np.abs(y_test - y_pred))
-    st.markdown(f"**Insight:** The model explains deposit variation with an R² of {round(r2,3)}. "
-                f"On average, predictions deviate from actual values by about {round(error_mean,2)} units. "
-                f"Points close to the diagonal indicate good predictions, while large deviations highlight weaker fit.")
 
-    # 2. Residuals plot
-    residuals = y_test - y_pred
+def residuals_figure(results):
+    import seaborn as sns
     fig2, ax2 = plt.subplots(figsize=(15,4))
-    sns.histplot(residuals, kde=True, ax=ax2, color="orange")
+    sns.histplot(results['residuals'], kde=True, ax=ax2, color="orange")
     ax2.set_title("Residual Distribution")
     ax2.set_xlabel("Residuals")
-    st.pyplot(fig2)
+    return fig2
+
 
+def feature_fit_figure(data1, feature, stats):
+    fig, ax = plt.subplots(figsize=(15,4))
+    plot_feature_fit(ax, data1, feature, stats)
+    return fig
+
+
+def prediction_insight(results):
+    r2 = results['r2']
+    error_mean = np.mean(np.abs(results['y_test'] - results['y_pred']))
+    return (f"**Insight:** The model explains deposit variation with an R² of {round(r2,3)}. "
+            f"On average, predictions deviate from actual values by about {round(error_mean,2)} units. "
+            f"Points close to the diagonal indicate good predictions, while large deviations highlight weaker fit.")
+
+
+def residual_insight(results):
+    residuals = results['residuals']
     skewness = residuals.skew()
     if abs(skewness) < 0.5:
         skew_text = "fairly symmetric, suggesting errors are balanced."
@@ -72,31 +122,64 @@ def run_deposit_growth_analysis(data1):
     else:
         skew_text = "negatively skewed, meaning the model overestimates deposits for some customers."
 
-    st.markdown(f"**Insight:** The residuals center around {round(residuals.mean(),2)}. "
-                f"The distribution is {skew_text}")
+    return (f"**Insight:** The residuals center around {round(residuals.mean(),2)}. "
+            f"The distribution is {skew_text}")
 
-    # 3. Feature vs Deposits Scatter with correlations
-    st.markdown("#### Feature Relationships")
-    for feature in X.columns:
-        fig, ax = plt.subplots(figsize=(15,4))
-        sns.scatterplot(x=data1[feature], y=data1['Bank Deposits'], ax=ax, alpha=0.6)
-        sns.regplot(x=data1[feature], y=data1['Bank Deposits'], ax=ax, scatter=False, color="red")
-        ax.set_title(f"{feature} vs Bank Deposits")
-        st.pyplot(fig)
 
-        corr = data1[feature].corr(data1['Bank Deposits'])
-        slope = reg.coef_[list(X.columns).index(feature)]
+def feature_insight(results, feature):
+    corr = results['full_stats'].corr(feature)
+    slope = results['fit']['coef'][results['features'].index(feature)]
+
+    if abs(corr) > 0.6:
+        strength = "strong"
+    elif abs(corr) > 0.3:
+        strength = "moderate"
+    else:
+        strength = "weak"
+
+    direction = "positive" if slope > 0 else "negative"
 
-        if abs(corr) > 0.6:
-            strength = "strong"
-        elif abs(corr) > 0.3:
-            strength = "moderate"
-        else:
-            strength = "weak"
+    return (f"**Insight:** {feature} has a {strength} {direction} relationship with deposits "
+            f"(correlation = {round(corr,2)}). This means that as {feature} "
+            f"{'increases' if slope>0 else 'decreases'}, deposits tend to "
+            f"{'rise' if slope>0 else 'fall'} on average.")
 
-        direction = "positive" if slope > 0 else "negative"
 
-        st.markdown(f"**Insight:** {feature} has a {strength} {direction} relationship with deposits "
-                    f"(correlation = {round(corr,2)}). This means that as {feature} "
-                    f"{'increases' if slope>0 else 'decreases'}, deposits tend to "
-                    f"{'rise' if slope>0 else 'fall'} on average.")
+def run_deposit_growth_analysis(data1):
+    results = fit_deposit_regression(data1)
+    render_deposit_growth(data1, results)
+    return results
+
+
+def render_deposit_growth(data1, results):
+    import streamlit as st
+    st.subheader("🏦 Deposit Growth Analysis (Regression)")
+    fit, features = results['fit'], results['features']
+    st.write("**Regression Coefficients:**", dict(zip(features, fit['coef'])))
+    st.write("**Coefficient Std. Errors:**", dict(zip(features, fit['std_err'])))
+    st.write("**Intercept:**", fit['intercept'])
+    st.write("**R² Score:**", round(results['r2'], 3))
+    st.write("**MSE:**", round(results['mse'], 2))
+
+    # --- Plots ---
+    st.markdown("### 📊 Plots with Insights")
+
+    # 1. Actual vs Predicted
+    fig1 = actual_vs_predicted_figure(results)
+    show_figure(fig1)
+    plt.close(fig1)
+    st.markdown(prediction_insight(results))
+
+    # 2. Residuals plot
+    fig2 = residuals_figure(results)
+    show_figure(fig2)
+    plt.close(fig2)
+    st.markdown(residual_insight(results))
+
+    # 3. Feature vs Deposits Scatter with correlations
+    st.markdown("#### Feature Relationships")
+    for feature in features:
+        fig = feature_fit_figure(data1, feature, results['full_stats'])
+        show_figure(fig)
+        plt.close(fig)
+        st.markdown(feature_insight(results, feature))
@@ -0,0 +1,210 @@
+"""
+Blocked Euclidean distances for clustering large portfolios.
+
+Nothing here holds an n x n matrix. Distances between the (scaled)
+segmentation features are computed on demand in float32 tiles of
+`tile_rows` x `tile_cols` points and reduced straight away. Only O(n)
+vectors survive a tile: row sums, per-cluster sums, the nearest and
+second-nearest medoid. Tiles run on a thread pool (NumPy releases the
+GIL). Each tile is sized so that the tiles in flight together stay under
+`memory_mb`.
+
+    engine = DistanceEngine(X_scaled, memory_mb=256)
+    model = BlockedKMedoids(n_clusters=4).fit(X_scaled)
+    score = silhouette(engine, model.labels_)
+
+BlockedKMedoids follows sklearn_extra's KMedoids(method='pam') with its
+default 'heuristic' init: the same swap rule and the same tie-breaking.
+Labels agree except where float32 rounding decides a near-tie; a swap has to
+improve the total by more than SWAP_TOLERANCE of it.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+DEFAULT_MEMORY_MB = 256
+TILE_ROWS = 256
+TILE_COLS = 4096
+SWAP_TOLERANCE = 1e-6  # relative to the total distance
+BYTES_PER_ELEMENT = 24  # float64 product, float32 distance tile and one float32 temporary
+
+
+class DistanceEngine:
+    """Euclidean distances between the rows of X, served tile by tile."""
+
+    def __init__(self, X, memory_mb=DEFAULT_MEMORY_MB, n_jobs=None, tile_rows=TILE_ROWS, tile_cols=TILE_COLS):
+        X = np.asarray(X, dtype=float)
+        self.n = len(X)
+        # |a - b|^2 = [a, |a|^2, 1] . [-2b, 1, |b|^2]: one small matrix product per tile
+        squared = (X ** 2).sum(axis=1)[:, None]
+        ones = np.ones((self.n, 1))
+        self.left = np.hstack([X, squared, ones])
+        self.right = np.ascontiguousarray(np.hstack([-2 * X, ones, squared]).T)
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+
+        # Fit the tiles in flight (one per thread) under the memory cap, shrinking rows first
+        budget = memory_mb * 1024 ** 2 // BYTES_PER_ELEMENT
+        self.tile_cols = max(1, min(tile_cols, self.n, budget))
+        self.tile_rows = max(1, min(tile_rows, budget // (self.n_jobs * self.tile_cols)))
+        self.n_jobs = max(1, min(self.n_jobs, budget // (self.tile_rows * self.tile_cols)))
+
+    def distances(self, rows, cols):
+        """
+        float32 distance tile between the points `rows` and `cols` (index arrays or slices).
+        The product is taken in float64, as sklearn's euclidean_distances, then rounded.
+        """
+        squared = self.left[rows] @ self.right[:, cols]
+        np.maximum(squared, 0.0, out=squared)
+        return np.sqrt(squared, out=squared).astype(np.float32)
+
+    def map_rows(self, func, rows=None):
+        """
+        Apply func(row_index_block) to consecutive blocks of `rows` (default: all points)
+        on the thread pool; returns the results in block order.
+        """
+        rows = np.arange(self.n) if rows is None else np.asarray(rows)
+        blocks = [rows[start:start + self.tile_rows] for start in range(0, len(rows), self.tile_rows)]
+        if self.n_jobs == 1 or len(blocks) == 1:
+            return [func(block) for block in blocks]
+        with ThreadPoolExecutor(self.n_jobs) as pool:
+            return list(pool.map(func, blocks))
+
+    def column_tiles(self):
+        return [slice(start, min(start + self.tile_cols, self.n)) for start in range(0, self.n, self.tile_cols)]
+
+    # --- Streaming reductions ---
+    def row_sums(self):
+        """Sum of distances from each point to all points (float64)."""
+        def block_sums(block):
+            total = np.zeros(len(block))
+            for cols in self.column_tiles():
+                total += self.distances(block, cols).sum(axis=1, dtype=np.float64)
+            return total
+        return np.concatenate(self.map_rows(block_sums))
+
+    def nearest(self, centres):
+        """(labels, nearest distance, second-nearest distance) of every point to the points `centres`."""
+        centres = np.asarray(centres)
+        to_centres = np.concatenate(self.map_rows(lambda block: self.distances(block, centres)))
+        to_centres[centres, np.arange(len(centres))] = 0.0  # exactly, despite rounding
+        labels = np.argmin(to_centres, axis=1)
+        ordered = np.sort(to_centres, axis=1)
+        second = ordered[:, 1] if len(centres) > 1 else np.full(self.n, np.inf, dtype=np.float32)
+        return labels, ordered[:, 0], second
+
+    def cluster_sums(self, labels, n_clusters, rows=None):
+        """(len(rows), n_clusters) float64 sums of distances from each of `rows` to the members of each cluster."""
+        one_hot = np.zeros((self.n, n_clusters), dtype=np.float32)
+        one_hot[np.arange(self.n), labels] = 1.0
+
+        def block_sums(block):
+            total = np.zeros((len(block), n_clusters))
+            for cols in self.column_tiles():
+                total += self.distances(block, cols) @ one_hot[cols]
+            return total
+        return np.concatenate(self.map_rows(block_sums, rows))
+
+    def swap_costs(self, medoids, labels, near, second):
+        """
+        PAM swap cost T[h, i]: the exact change in total distance from replacing
+        medoid i by point h, for every point h (rows of medoids are +inf).
+        Summed over all points j:
+            j in cluster i:  min(d(h, j), second_j) - near_j
+            otherwise:       min(d(h, j) - near_j, 0)
+        """
+        k = len(medoids)
+        near, second = near.astype(np.float32), second.astype(np.float32)
+        members = np.zeros((self.n, k), dtype=np.float32)
+        members[np.arange(self.n), labels] = 1.0
+
+        # With m = min(d, near): the first case is min(d, second) - m more than the second,
+        # and the second case sums to sum(m) - sum(near)
+        def block_costs(block):
+            base, own = np.zeros(len(block)), np.zeros((len(block), k))
+            for cols in self.column_tiles():
+                d = self.distances(block, cols)
+                m = np.minimum(d, near[cols])
+                base += m.sum(axis=1)
+                np.minimum(d, second[cols], out=d)
+                d -= m
+                own += d @ members[cols]
+            return (base - near.sum(dtype=np.float64))[:, None] + own
+        costs = np.concatenate(self.map_rows(block_costs))
+        costs[medoids] = np.inf
+        return costs
+
+
+def pam(engine, n_clusters, max_iter=300):
+    """
+    PAM with the 'heuristic' init (the n_clusters points of smallest total distance),
+    then one best swap per iteration while it lowers the total distance.
+    Returns (medoid indices, labels, inertia, iterations).
+    """
+    medoids = np.argpartition(engine.row_sums(), n_clusters - 1)[:n_clusters]
+    iterations = 0
+    for iterations in range(max_iter):
+        labels, near, second = engine.nearest(medoids)
+        costs = engine.swap_costs(medoids, labels, near, second)
+        h, i = np.unravel_index(np.argmin(costs), costs.shape)  # first best (h, then i), as sklearn_extra
+        # A swap must beat float32 rounding of the total, or equal-cost swaps could cycle
+        if not costs[h, i] < -SWAP_TOLERANCE * near.sum(dtype=np.float64):
+            break
+        medoids[i] = h
+    labels, near, _ = engine.nearest(medoids)
+    return medoids, labels, float(near.sum(dtype=np.float64)), iterations
+
+
+def silhouette(engine, labels, sample_size=None, random_state=0):
+    """
+    Mean silhouette coefficient. With `sample_size`, averaged over that many random
+    points, each still measured against every point (silhouette_score(sample_size=)
+    would only use the distances within the sample).
+    """
+    labels = np.asarray(labels)
+    n_clusters = int(labels.max()) + 1
+    rows = np.arange(engine.n)
+    if sample_size is not None and sample_size < engine.n:
+        rows = np.sort(np.random.default_rng(random_state).choice(engine.n, sample_size, replace=False))
+    sizes = np.bincount(labels, minlength=n_clusters)
+    sums = engine.cluster_sums(labels, n_clusters, rows)
+    own = labels[rows]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = sums[np.arange(len(rows)), own] / (sizes[own] - 1)
+        means = np.where(sizes > 0, sums / np.maximum(sizes, 1), np.inf)  # empty clusters are never nearest
+        means[np.arange(len(rows)), own] = np.inf
+        b = means.min(axis=1)
+        s = np.where(sizes[own] > 1, (b - a) / np.maximum(a, b), 0.0)
+    return float(np.nan_to_num(s).mean())
+
+
+class BlockedKMedoids:
+    """
+    KMedoids(method='pam', init='heuristic') on a DistanceEngine, so memory stays
+    O(n) plus the tile budget. Follows the sklearn fit/predict protocol.
+    """
+
+    def __init__(self, n_clusters=4, max_iter=300, memory_mb=DEFAULT_MEMORY_MB, n_jobs=None):
+        self.n_clusters = n_clusters
+        self.max_iter = max_iter
+        self.memory_mb = memory_mb
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y=None):
+        X = np.asarray(X, dtype=float)
+        if self.n_clusters > len(X):
+            raise ValueError(f"The number of medoids ({self.n_clusters}) must be less than the number "
+                             f"of samples {len(X)}.")
+        self.engine_ = DistanceEngine(X, self.memory_mb, self.n_jobs)
+        self.medoid_indices_, self.labels_, self.inertia_, self.n_iter_ = pam(self.engine_, self.n_clusters,
+                                                                             self.max_iter)
+        self.cluster_centers_ = X[self.medoid_indices_]
+        return self
+
+    def fit_predict(self, X, y=None):
+        return self.fit(X).labels_
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        centres = self.cluster_centers_.astype(np.float32)
+        return np.argmin(((X[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2), axis=1)
@@ -1,10 +1,38 @@
 import pandas as pd
 import numpy as np
+from bisect import bisect_left
 from datetime import datetime
-import streamlit as st
+from instrumentation import span
+
+# --- Feature spec ---
+# Each entry derives one column from input columns (or earlier entries), in order.
+# 'fill_missing' adds absent inputs as constant columns; otherwise an entry whose
+# inputs are missing is skipped ('any_inputs': use whichever inputs are present).
+BALANCE_COMPONENTS = ['Checking Accounts', 'Saving Accounts', 'Foreign Currency Account']
+PRODUCT_COLS = ['Checking Accounts', 'Saving Accounts', 'Foreign Currency Account',
+                'Credit Card Balance', 'Bank Loans', 'Bank Deposits']
+FEATURE_SPEC = [
+    {'name': 'Customer Tenure', 'op': 'tenure', 'inputs': ['Joined Bank']},
+    {'name': 'Total Relationship Balance', 'op': 'sum', 'inputs': BALANCE_COMPONENTS, 'fill_missing': 0},
+    {'name': 'Debt-to-Income Ratio', 'op': 'ratio', 'inputs': ['Bank Loans', 'Credit Card Balance', 'Estimated Income'],
+     'finite': True},
+    {'name': 'Deposit-to-Loan Ratio', 'op': 'ratio', 'inputs': ['Bank Deposits', 'Bank Loans']},
+    # float weight so a downcast (int8) Properties Owned column cannot overflow
+    {'name': 'Wealth Indicator', 'op': 'linear',
+     'inputs': ['Total Relationship Balance', 'Superannuation Savings', 'Properties Owned'],
+     'weights': [1.0, 1.0, 500000.0]},
+    {'name': 'Product Concentration', 'op': 'count_positive', 'inputs': PRODUCT_COLS, 'any_inputs': True},
+    {'name': 'Age_x_Balance', 'op': 'product', 'inputs': ['Age', 'Total Relationship Balance']},
+    {'name': 'Age Group', 'op': 'bin', 'inputs': ['Age'], 'bins': [0, 25, 40, 60, 75, np.inf],
+     'labels': ['Gen Z', 'Millenial', 'Gen X', 'Baby Boomer', 'Silent Generation']},
+    {'name': 'Income Group', 'op': 'bin', 'inputs': ['Estimated Income'], 'bins': [0, 200000, 300000, 400000, np.inf],
+     'labels': ['Low Net Worth', 'Medium Net Worth', 'High Net Worth', 'Premium Customers']},
+]
+DATE_FORMATS = ("%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d")
+
 
 def parse_date(x):
-    for fmt in ("%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d"):
+    for fmt in DATE_FORMATS:
         try:
             return pd.to_datetime(x, format=fmt)
         except:
@@ -12,100 +40,387 @@ def parse_date(x):
     return pd.NaT
 
 
-def feature_engineering(df):
+def parse_dates(series):
+    """Vectorised parse_date: each distinct value is parsed once, trying the formats in order."""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.to_numpy(dtype='datetime64[ns]')
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(np.asarray(uniques, dtype=object))
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(uniques[missing], format=fmt, errors='coerce')
+    # code -1 (null input) picks the trailing NaT
+    return np.append(parsed.to_numpy(), np.datetime64('NaT', 'ns'))[codes]
+
+
+def _number(value):
+    return np.nan if value is None or pd.isna(value) else float(value)
+
+
+class FeatureTransformer:
+    """
+    FEATURE_SPEC compiled against a set of input columns.
+
+    fit() resolves which features apply to the columns present; transform()
+    then reads every numeric input once into a float block and evaluates the
+    plan with NumPy, and transform_record() evaluates it for one dict without
+    building a DataFrame (for scoring single customers). Output matches
+    feature_engineering(). Follows the sklearn fit/transform/get_params
+    protocol without importing sklearn.
+    """
+
+    def __init__(self, as_of=None):
+        self.as_of = as_of
+
+    def get_params(self, deep=True):
+        return {'as_of': self.as_of}
+
+    def set_params(self, **params):
+        for name, value in params.items():
+            setattr(self, name, value)
+        return self
+
+    # --- Fitting: resolve the plan ---
+    def fit(self, X, y=None):
+        columns = list(X.columns)
+        available = set(columns)
+        plan, added, numeric = [], [], []
+        for spec in FEATURE_SPEC:
+            inputs = spec['inputs']
+            if 'fill_missing' in spec:
+                missing = [col for col in inputs if col not in available]
+                added += missing
+                available.update(missing)
+            elif spec.get('any_inputs'):
+                inputs = [col for col in inputs if col in available]
+            elif not available.issuperset(inputs):
+                continue
+            plan.append({**spec, 'inputs': inputs})
+            added.append(spec['name'])
+            available.add(spec['name'])
+            if spec['op'] != 'tenure':
+                numeric += [col for col in inputs if col in columns and col not in numeric]
+
+        self.feature_names_in_ = columns
+        self.plan_ = plan
+        self.new_features_ = added
+        self.numeric_inputs_ = numeric
+        self.integer_inputs_ = {col for col in numeric
+                                if pd.api.types.is_integer_dtype(X[col].dtype) or pd.api.types.is_bool_dtype(X[col].dtype)}
+        self.date_input_ = next((spec['inputs'][0] for spec in plan if spec['op'] == 'tenure'), None)
+        return self
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(self.feature_names_in_ + self.new_features_, dtype=object)
+
+    def _today(self):
+        return pd.Timestamp(self.as_of if self.as_of is not None else datetime.today().date())
+
+    # --- Batch ---
+    def transform(self, X, copy=True, n_jobs=1):
+        """
+        X with the derived columns added (base columns shared with X when copy=False).
+        With n_jobs > 1 the rows are split into n_jobs chunks evaluated on threads;
+        NumPy releases the GIL for the arithmetic, so the chunks run on separate cores.
+        """
+        out = X.copy(deep=copy)
+        block, joined = self._inputs(X)
+        if joined is not None:
+            out[self.date_input_] = joined
+
+        if n_jobs > 1 and len(X) >= 2 * n_jobs:
+            from concurrent.futures import ThreadPoolExecutor
+            edges = np.linspace(0, len(X), n_jobs + 1).astype(int)
+            chunks = [(block[lo:hi], None if joined is None else joined[lo:hi]) for lo, hi in zip(edges[:-1], edges[1:])]
+            with ThreadPoolExecutor(n_jobs) as pool:
+                parts = list(pool.map(lambda chunk: self._evaluate(*chunk), chunks))
+            values = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        else:
+            values = self._evaluate(block, joined)
+
+        return self._assign(out, values)
+
+    def _inputs(self, X, block=None):
+        """
+        (float block of the numeric inputs, parsed join dates or None) for the rows of X.
+        `block` is an optional preallocated (rows, len(numeric_inputs_)) array to fill.
+        """
+        block = np.empty((len(X), len(self.numeric_inputs_))) if block is None else block
+        for i, col in enumerate(self.numeric_inputs_):
+            block[:, i] = X[col].to_numpy(dtype=float, na_value=np.nan)
+        joined = None
+        if self.date_input_ is not None:
+            with span("Date parsing: Joined Bank", rows=len(X)):
+                joined = parse_dates(X[self.date_input_])
+        return block, joined
+
+    def _assign(self, out, values):
+        """Put evaluated columns on `out` (bin codes become ordered categoricals)."""
+        for spec in self.plan_:
+            if spec['op'] == 'bin':
+                values[spec['name']] = pd.Categorical.from_codes(values[spec['name']], categories=spec['labels'],
+                                                                 ordered=True)
+        for name in self.new_features_:
+            out[name] = values[name]
+        return out
+
+    def _evaluate(self, block, joined):
+        """Plan over a block of rows -> {column: array} (bins as category codes)."""
+        rows = len(block)
+        position = {col: i for i, col in enumerate(self.numeric_inputs_)}
+        values = {}
+
+        def column(name):
+            return values[name] if name in values else block[:, position[name]]
+
+        def is_integer(name):
+            return values[name].dtype.kind == 'i' if name in values else name in self.integer_inputs_
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for spec in self.plan_:
+                op, inputs, name = spec['op'], spec['inputs'], spec['name']
+                if op == 'tenure':
+                    days = (self._today().to_datetime64() - joined) // np.timedelta64(1, 'D')
+                    values[name] = np.round(np.where(np.isnat(joined), np.nan, days) / 365, 1)
+                elif op == 'sum':
+                    for col in inputs:
+                        if col not in position:
+                            values[col] = np.zeros(rows, dtype=np.int64) + spec['fill_missing']
+                    total = np.zeros(rows)
+                    for col in inputs:
+                        total += np.nan_to_num(column(col), nan=0.0)
+                    if all(is_integer(col) for col in inputs):
+                        total = total.astype(np.int64)
+                    values[name] = total
+                elif op == 'ratio':
+                    numerator = column(inputs[0])
+                    for col in inputs[1:-1]:
+                        numerator = numerator + column(col)
+                    denominator = column(inputs[-1])
+                    result = numerator / np.where(denominator == 0, np.nan, denominator)
+                    values[name] = np.where(np.isinf(result), np.nan, result) if spec.get('finite') else result
+                elif op == 'linear':
+                    total = column(inputs[0]) * spec['weights'][0]
+                    for col, weight in zip(inputs[1:], spec['weights'][1:]):
+                        total = total + column(col) * weight
+                    values[name] = total
+                elif op == 'product':
+                    product = column(inputs[0]) * column(inputs[1])
+                    if all(is_integer(col) for col in inputs):
+                        product = product.astype(np.int64)
+                    values[name] = product
+                elif op == 'count_positive':
+                    count = np.zeros(rows, dtype=np.int64)
+                    for col in inputs:
+                        count += column(col) > 0
+                    values[name] = count
+                elif op == 'bin':
+                    x = column(inputs[0])
+                    codes = np.searchsorted(spec['bins'], x, side='left') - 1  # right-closed bins
+                    codes[np.isnan(x) | (codes < 0) | (codes >= len(spec['labels']))] = -1
+                    values[name] = codes.astype(np.int8)
+        return values
+
+    def fit_transform(self, X, y=None, copy=True):
+        return self.fit(X).transform(X, copy=copy)
+
+    # --- Single record ---
+    def transform_record(self, record):
+        """Derived features for one customer dict (returns a new dict; no DataFrame involved)."""
+        out = dict(record)
+        values = {}
+
+        def number(name):
+            return values[name] if name in values else _number(out.get(name))
+
+        for spec in self.plan_:
+            op, inputs, name = spec['op'], spec['inputs'], spec['name']
+            if op == 'tenure':
+                joined = parse_date(out.get(inputs[0])) if not isinstance(out.get(inputs[0]), pd.Timestamp) else out[inputs[0]]
+                out[inputs[0]] = joined
+                values[name] = np.nan if pd.isna(joined) else float(np.round((self._today() - joined).days / 365, 1))
+            elif op == 'sum':
+                for col in inputs:
+                    if col not in out:
+                        values[col] = spec['fill_missing']
+                total = 0.0
+                for col in inputs:
+                    value = number(col)
+                    total += 0.0 if np.isnan(value) else value
+                values[name] = total
+            elif op == 'ratio':
+                numerator = sum(number(col) for col in inputs[:-1])
+                denominator = number(inputs[-1])
+                result = np.nan if denominator == 0 or np.isnan(denominator) else numerator / denominator
+                values[name] = np.nan if spec.get('finite') and np.isinf(result) else result
+            elif op == 'linear':
+                total = 0.0
+                for col, weight in zip(inputs, spec['weights']):
+                    total = total + number(col) * weight
+                values[name] = total
+            elif op == 'product':
+                values[name] = number(inputs[0]) * number(inputs[1])
+            elif op == 'count_positive':
+                values[name] = sum(number(col) > 0 for col in inputs)
+            elif op == 'bin':
+                x = number(inputs[0])
+                code = bisect_left(spec['bins'], x) - 1
+                values[name] = spec['labels'][code] if not np.isnan(x) and 0 <= code < len(spec['labels']) else np.nan
+
+        for name in self.new_features_:
+            out[name] = values[name]
+        return out
+
+
+def feature_engineering(df, copy=True, as_of=None, n_jobs=1):
     """
     Apply feature engineering and return:
         - df_copy: dataframe with new features
         - new_features: list of columns newly added
         - insights: list of dynamic insights generated from the data
+    With copy=False the base columns are shared with `df` (shallow copy) and only
+    the derived columns are allocated; `df` itself is never modified.
+    Customer Tenure is measured at `as_of` (default: today); n_jobs > 1 evaluates
+    row chunks on that many threads.
+    """
+    transformer = FeatureTransformer(as_of=as_of).fit(df)
+    df_copy = transformer.transform(df, copy=copy, n_jobs=n_jobs)
+    new_features = list(transformer.new_features_)
+    return df_copy, new_features, feature_insights(df_copy, new_features)
+
+
+# --- Insight aggregates ---
+# The insights are built from per-partition partial aggregates that merge exactly:
+# sums are kept as exact fractions, counts as integers, so any row partitioning
+# (see partitioned_features) gives bit-identical insights to one partition.
+MEAN_INSIGHTS = ['Customer Tenure', 'Deposit-to-Loan Ratio', 'Product Concentration']
+MODE_INSIGHTS = ['Age Group', 'Income Group']
+INSIGHT_FEATURES = MEAN_INSIGHTS + MODE_INSIGHTS + ['Debt-to-Income Ratio', 'Wealth Indicator']
+_SPLIT = 2 ** 26
+_EXACT_ROWS = 2 ** 25  # rows per bincount so the float accumulators stay exact
+
+
+def exact_sum(values):
+    """Exact sum of finite float64 values as a Fraction (independent of order, so partial sums merge exactly)."""
+    from fractions import Fraction
+    total = Fraction(0)
+    for start in range(0, len(values), _EXACT_ROWS):
+        mantissa, exponent = np.frexp(values[start:start + _EXACT_ROWS])
+        mantissa = (mantissa * 2.0 ** 53).astype(np.int64)  # exact: 53-bit integer mantissas
+        exponents, inverse = np.unique(exponent, return_inverse=True)
+        # Halves below 2**27 summed over < 2**26 rows stay below 2**53: exact in float64
+        high = np.bincount(inverse, weights=mantissa >> 26)
+        low = np.bincount(inverse, weights=mantissa & (_SPLIT - 1))
+        for e, h, l in zip(exponents.tolist(), high.tolist(), low.tolist()):
+            total += Fraction(int(h) * _SPLIT + int(l)) * Fraction(2) ** (e - 53)
+    return total
+
+
+def mean_partial(values):
+    """Mergeable state for a NaN-skipping mean."""
+    values = np.asarray(values, dtype=float)
+    finite = values[np.isfinite(values)]
+    return {'sum': exact_sum(finite), 'count': int(np.count_nonzero(~np.isnan(values))),
+            'posinf': int(np.count_nonzero(values == np.inf)), 'neginf': int(np.count_nonzero(values == -np.inf))}
+
+
+def merge_mean(a, b):
+    return {key: a[key] + b[key] for key in a}
+
+
+def finish_mean(partial):
+    if partial['posinf'] and partial['neginf']:
+        return np.nan
+    if partial['posinf'] or partial['neginf']:
+        return np.inf if partial['posinf'] else -np.inf
+    return float(partial['sum'] / partial['count']) if partial['count'] else np.nan
+
+
+def insight_partials(values, new_features):
+    """
+    Partial aggregates behind feature_insights for one block of rows.
+    `values` maps feature name -> array (bins as category codes, -1 for missing).
     """
-    df_copy = df.copy()
-    original_cols = set(df_copy.columns)
-
-    # Customer Tenure
-    if 'Joined Bank' in df_copy.columns:
-        df_copy['Joined Bank'] = df_copy['Joined Bank'].apply(parse_date)
-        today = pd.to_datetime(datetime.today().date())
-        df_copy['Customer Tenure'] = ((today - df_copy['Joined Bank']).dt.days / 365).round(1)
-
-    # Total Relationship Balance
-    components = ['Checking Accounts', 'Saving Accounts', 'Foreign Currency Account']
-    for col in components:
-        if col not in df_copy.columns:
-            df_copy[col] = 0
-    df_copy['Total Relationship Balance'] = df_copy[components].sum(axis=1)
-
-    # Debt-to-Income Ratio
-    if {'Bank Loans','Credit Card Balance','Estimated Income'}.issubset(df_copy.columns):
-        df_copy['Debt-to-Income Ratio'] = (df_copy['Bank Loans'] + df_copy['Credit Card Balance']) / df_copy['Estimated Income']
-        df_copy['Debt-to-Income Ratio'] = df_copy['Debt-to-Income Ratio'].replace([np.inf, -np.inf], np.nan)
-
-    # Deposit-to-Loan Ratio
-    if {'Bank Deposits', 'Bank Loans'}.issubset(df_copy.columns):
-        df_copy['Deposit-to-Loan Ratio'] = df_copy['Bank Deposits']/ df_copy['Bank Loans'].replace(0,np.nan)
-
-    # Wealth Indicator
-    if {'Superannuation Savings','Properties Owned'}.issubset(df_copy.columns):
-        assumed_property_value = 500000
-        df_copy['Wealth Indicator'] = (
-            df_copy['Total Relationship Balance'] +
-            df_copy['Superannuation Savings'] +
-            df_copy['Properties Owned'] * assumed_property_value
-        )
-
-    # Product Concentration
-    product_cols = ['Checking Accounts', 'Saving Accounts', 'Foreign Currency Account', 
-                    'Credit Card Balance', 'Bank Loans', 'Bank Deposits']
-    present_products = [col for col in product_cols if col in df_copy.columns]
-    df_copy['Product Concentration'] = (df_copy[present_products] > 0).sum(axis=1)
-
-    # Age x Total Relationship Balance
-    if {'Age', 'Total Relationship Balance'}.issubset(df_copy.columns):
-        df_copy['Age_x_Balance'] = df_copy['Age'] * df_copy['Total Relationship Balance']
-
-    # Age Groups
-    if 'Age' in df_copy.columns:
-        bins = [0,25,40,60,75,np.inf]
-        labels = ['Gen Z', 'Millenial', 'Gen X', 'Baby Boomer', 'Silent Generation']
-        df_copy['Age Group'] = pd.cut(df_copy['Age'], bins=bins, labels=labels, right=True)
-
-    # Income Groups
-    if 'Estimated Income' in df_copy.columns:
-        bins = [0, 200000, 300000, 400000 , np.inf]
-        labels = ['Low Net Worth', 'Medium Net Worth', 'High Net Worth', 'Premium Customers']
-        df_copy['Income Group'] = pd.cut(df_copy['Estimated Income'], bins=bins, labels=labels, right=True)
-
-    # Determine which features were newly added
-    new_features = list(set(df_copy.columns) - original_cols)
-
-    # Generate dynamic insights
+    partials = {}
+    for name in MEAN_INSIGHTS:
+        if name in new_features:
+            partials[name] = mean_partial(values[name])
+    if 'Debt-to-Income Ratio' in new_features:
+        partials['Debt-to-Income Ratio'] = (int(np.count_nonzero(values['Debt-to-Income Ratio'] > 0.5)),
+                                            len(values['Debt-to-Income Ratio']))
+    if 'Wealth Indicator' in new_features:
+        wealth = np.asarray(values['Wealth Indicator'], dtype=float)
+        partials['Wealth Indicator'] = np.nanmax(wealth) if (~np.isnan(wealth)).any() else np.nan
+    for spec in FEATURE_SPEC:
+        if spec['name'] in MODE_INSIGHTS and spec['name'] in new_features:
+            codes = np.asarray(values[spec['name']])
+            partials[spec['name']] = np.bincount(codes[codes >= 0], minlength=len(spec['labels']))
+    return partials
+
+
+def merge_insight_partials(a, b):
+    merged = {}
+    for name in a:
+        if name in MEAN_INSIGHTS:
+            merged[name] = merge_mean(a[name], b[name])
+        elif name == 'Debt-to-Income Ratio':
+            merged[name] = (a[name][0] + b[name][0], a[name][1] + b[name][1])
+        elif name == 'Wealth Indicator':
+            merged[name] = np.fmax(a[name], b[name])
+        else:
+            merged[name] = a[name] + b[name]
+    return merged
+
+
+def _labels(name):
+    return next(spec['labels'] for spec in FEATURE_SPEC if spec['name'] == name)
+
+
+def format_insights(partials):
+    """Dynamic insight strings from merged partial aggregates."""
     insights = []
-    if 'Customer Tenure' in new_features:
-        avg_tenure = df_copy['Customer Tenure'].mean()
+    if 'Customer Tenure' in partials:
+        avg_tenure = finish_mean(partials['Customer Tenure'])
         insights.append(f" The average **Customer Tenure** is **{avg_tenure:.1f} years**.")
-    
-    if 'Debt-to-Income Ratio' in new_features:
-        risky = (df_copy['Debt-to-Income Ratio'] > 0.5).mean() * 100
+
+    if 'Debt-to-Income Ratio' in partials:
+        above, rows = partials['Debt-to-Income Ratio']
+        risky = above / rows * 100 if rows else np.nan
         insights.append(f" About **{risky:.1f}%** of customers have a **Debt-to-Income Ratio above 0.5**, indicating higher financial risk.")
-    
-    if 'Deposit-to-Loan Ratio' in new_features:
-        avg_ratio = df_copy['Deposit-to-Loan Ratio'].mean()
+
+    if 'Deposit-to-Loan Ratio' in partials:
+        avg_ratio = finish_mean(partials['Deposit-to-Loan Ratio'])
         insights.append(f" The average **Deposit-to-Loan Ratio** is **{avg_ratio:.2f}**, showing overall liquidity strength.")
-    
-    if 'Wealth Indicator' in new_features:
-        top_wealth = df_copy['Wealth Indicator'].max()
+
+    if 'Wealth Indicator' in partials:
+        top_wealth = partials['Wealth Indicator']
         insights.append(f" The wealthiest customer has a **Wealth Indicator** of **{top_wealth:,.0f}**.")
-    
-    if 'Product Concentration' in new_features:
-        avg_products = df_copy['Product Concentration'].mean()
+
+    if 'Product Concentration' in partials:
+        avg_products = finish_mean(partials['Product Concentration'])
         insights.append(f" On average, customers hold **{avg_products:.1f} products** with the bank.")
-    
-    if 'Age Group' in new_features:
-        dominant_age = df_copy['Age Group'].mode()[0]
+
+    # Mode: the most frequent label, ties going to the earlier category (as Series.mode()[0])
+    if 'Age Group' in partials and partials['Age Group'].sum():
+        dominant_age = _labels('Age Group')[int(np.argmax(partials['Age Group']))]
         insights.append(f" The most common **Age Group** is **{dominant_age}**.")
-    
-    if 'Income Group' in new_features:
-        dominant_income = df_copy['Income Group'].mode()[0]
+
+    if 'Income Group' in partials and partials['Income Group'].sum():
+        dominant_income = _labels('Income Group')[int(np.argmax(partials['Income Group']))]
         insights.append(f" The majority of customers fall under the **{dominant_income}** segment.")
-    
-    return df_copy, new_features, insights
\ No newline at end of file
+
+    return insights
+
+
+def feature_insights(df_copy, new_features):
+    """Dynamic insight strings for the newly added features."""
+    values = {}
+    for name in new_features:
+        if name not in INSIGHT_FEATURES:
+            continue
+        column = df_copy[name]
+        values[name] = column.cat.codes.to_numpy() if isinstance(column.dtype, pd.CategoricalDtype) else column.to_numpy()
+    return format_insights(insight_partials(values, new_features))
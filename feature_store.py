@@ -0,0 +1,273 @@
+"""
+File-backed store for engineered customer features.
+
+Layout (one directory per feature-definition version, as-of date and build
+parameters, e.g. the source fingerprint and capped columns):
+
+    feature_store/
+        v=<version>/as_of=2024-06-30/params=<hash>/
+            manifest.json          columns, dtypes, row count, parameters
+            <column>.npy           one array per column, in input row order (categoricals: integer codes)
+            _index_keys.npy        customer IDs sorted, with
+            _index_rows.npy        the row each sorted ID lives in (for point lookups)
+
+The version is a hash of the feature_engineering module source. Changing a
+feature definition therefore starts a new version, and old partitions are
+never read by mistake. Two portfolios (or two capping choices) on the same
+date get their own partitions. Reads without `params` use the partition of
+that date written last. Columns are memory-mapped on read: a point lookup
+binary-searches the sorted ID index and reads only those rows. A column
+scan touches only the requested files and keeps the input row order, so
+models trained on stored features see the same rows in the same order.
+
+    python feature_store.py build Banking.csv --as-of 2024-06-30
+    python feature_store.py lookup --as-of 2024-06-30 IND81288 IND12345
+    python scoring_service.py serve risk_scorer.npz --feature-store feature_store
+    python feature_store.py list
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import feature_engineering as _fe_module
+
+KEY = 'Client ID'
+DEFAULT_ROOT = 'feature_store'
+
+
+def feature_version():
+    """Short hash of the feature definitions (the feature_engineering module: spec, transformer, date parsing)."""
+    source = inspect.getsource(_fe_module)
+    return hashlib.sha1(source.encode()).hexdigest()[:12]
+
+
+def params_key(params):
+    """Short hash of the build parameters, used as the partition directory name."""
+    text = json.dumps(params or {}, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def _file_name(col):
+    return col.replace(os.sep, '_') + '.npy'
+
+
+def encode_column(series):
+    """Column -> (array, dtype description) for np.save without pickling."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), {'kind': 'category', 'categories': [str(c) for c in series.cat.categories],
+                                             'ordered': bool(series.cat.ordered)}
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.to_numpy(dtype='datetime64[ns]').view('int64'), {'kind': 'datetime'}
+    if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        return series.to_numpy(), {'kind': 'numeric'}
+    # text: factorized codes plus the distinct values; nulls get code -1
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    return codes, {'kind': 'text', 'categories': [str(u) for u in uniques]}
+
+
+def decode_column(values, info):
+    if info['kind'] == 'category':
+        return pd.Categorical.from_codes(values, categories=info['categories'], ordered=info['ordered'])
+    if info['kind'] == 'text':
+        categories = np.asarray(info['categories'] + [None], dtype=object)
+        return categories[np.asarray(values)]  # code -1 picks the trailing None
+    if info['kind'] == 'datetime':
+        return np.asarray(values).view('datetime64[ns]')
+    return np.asarray(values)
+
+
+class FeatureStore:
+    def __init__(self, root=DEFAULT_ROOT, version=None):
+        self.root = root
+        self.version = version or feature_version()
+
+    def _date_dir(self, as_of):
+        return os.path.join(self.root, f"v={self.version}", f"as_of={pd.Timestamp(as_of).date()}")
+
+    def _dir(self, as_of, params=None):
+        """Partition directory for these parameters; with params=None the one of that date written last."""
+        base = self._date_dir(as_of)
+        if params is not None:
+            return os.path.join(base, f"params={params_key(params)}")
+        stored = self._params_dirs(base)
+        if not stored:
+            return os.path.join(base, f"params={params_key({})}")
+        return max(stored, key=lambda path: os.path.getmtime(os.path.join(path, 'manifest.json')))
+
+    @staticmethod
+    def _params_dirs(base):
+        if not os.path.isdir(base):
+            return []
+        return [os.path.join(base, name) for name in os.listdir(base)
+                if name.startswith('params=') and not name.endswith('.tmp')]
+
+    # --- Writing ---
+    def write(self, df_fe, as_of, params=None, meta=None):
+        """Write one partition (replacing any existing one for this version, date and parameters)."""
+        path = self._dir(as_of, params or {})
+        tmp = path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        keys = df_fe[KEY].to_numpy(dtype=str)
+        order = np.argsort(keys, kind='stable')
+        np.save(os.path.join(tmp, '_index_keys.npy'), keys[order], allow_pickle=False)
+        np.save(os.path.join(tmp, '_index_rows.npy'), order, allow_pickle=False)
+
+        columns = {}
+        for col in df_fe.columns:
+            values, info = encode_column(df_fe[col]) if col != KEY else (keys, {'kind': 'key'})
+            np.save(os.path.join(tmp, _file_name(col)), values, allow_pickle=False)
+            columns[col] = info
+        manifest = {
+            'version': self.version,
+            'as_of': str(pd.Timestamp(as_of).date()),
+            'rows': len(df_fe),
+            'columns': columns,
+            'params': params or {},
+            'meta': meta or {},
+            'written': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        # Readers only ever see a complete partition
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        return path
+
+    # --- Reading ---
+    def partitions(self):
+        """As-of dates stored for the current version, oldest first."""
+        base = os.path.join(self.root, f"v={self.version}")
+        if not os.path.isdir(base):
+            return []
+        return sorted(name.split('=', 1)[1] for name in os.listdir(base)
+                      if name.startswith('as_of=') and self._params_dirs(os.path.join(base, name)))
+
+    def manifest(self, as_of=None, params=None):
+        as_of = as_of or self._latest()
+        return self._manifest(self._dir(as_of, params))
+
+    def manifests(self, as_of):
+        """Manifests of every parameter set stored for one date."""
+        return [self._manifest(path) for path in sorted(self._params_dirs(self._date_dir(as_of)))]
+
+    @staticmethod
+    def _manifest(path):
+        path = os.path.join(path, 'manifest.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _latest(self):
+        dates = self.partitions()
+        if not dates:
+            raise FileNotFoundError(f"No partitions for feature version {self.version} under {self.root}")
+        return dates[-1]
+
+    @staticmethod
+    def _column(path, col):
+        return np.load(os.path.join(path, _file_name(col)), mmap_mode='r')
+
+    def _partition(self, as_of, params):
+        path = self._dir(as_of or self._latest(), params)
+        manifest = self._manifest(path)
+        if manifest is None:
+            raise FileNotFoundError(f"No partition for as_of={as_of} and params={params} under {self.root}")
+        return path, manifest
+
+    def scan(self, as_of=None, columns=None, params=None):
+        """Read a column subset (all columns by default) for every customer of one partition."""
+        path, manifest = self._partition(as_of, params)
+        columns = list(manifest['columns']) if columns is None else [KEY] + [c for c in columns if c != KEY]
+        return self._frame(path, manifest, columns, slice(None))
+
+    def lookup(self, customer_ids, as_of=None, columns=None, params=None):
+        """Rows for the given customer IDs (unknown IDs are skipped), via binary search on the sorted keys."""
+        path, manifest = self._partition(as_of, params)
+        keys = self._column(path, '_index_keys')
+        ids = np.asarray(list(customer_ids), dtype=str)
+        pos = np.searchsorted(keys, ids)
+        found = pos < len(keys)
+        found[found] = keys[pos[found]] == ids[found]
+        rows = self._column(path, '_index_rows')[pos[found]]
+        columns = list(manifest['columns']) if columns is None else [KEY] + [c for c in columns if c != KEY]
+        return self._frame(path, manifest, columns, rows)
+
+    def _frame(self, path, manifest, columns, rows):
+        data = {}
+        for col in columns:
+            info = manifest['columns'][col]
+            values = self._column(path, col)[rows]
+            data[col] = values.astype(str) if info['kind'] == 'key' else decode_column(values, info)
+        return pd.DataFrame(data, columns=columns)
+
+
+def load_or_build(store, as_of, compute, params=None):
+    """
+    Features for `as_of` from the store when a partition with the same parameters
+    exists; otherwise run `compute()` -> (df_fe, meta) and write the result to
+    that partition (partitions with other parameters are left alone).
+    `params` should identify the input by content (e.g. its fingerprint), not by
+    path, or a replaced file would be served the old features.
+    `meta` (JSON-serialisable, e.g. the feature insights) is kept in the manifest.
+    Returns (df_fe, meta, from_store).
+    """
+    params = params or {}
+    manifest = store.manifest(as_of, params)
+    if manifest is not None and manifest['params'] == params:
+        return store.scan(as_of, params=params), manifest.get('meta', {}), True
+    df_fe, meta = compute()
+    store.write(df_fe, as_of, params, meta)
+    return df_fe, meta, False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the engineered-feature store")
+    parser.add_argument("--root", default=DEFAULT_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="engineer features for a CSV and store them")
+    build.add_argument("input")
+    build.add_argument("--as-of", required=True)
+    build.add_argument("--outlier-cols", nargs="+", default=None,
+                       help="columns to cap first (default: first four numeric columns, as in the dashboard)")
+    lookup = sub.add_parser("lookup", help="print stored features for customer IDs")
+    lookup.add_argument("ids", nargs="+")
+    lookup.add_argument("--as-of", default=None)
+    lookup.add_argument("--columns", nargs="+", default=None)
+    sub.add_parser("list", help="list stored partitions for the current feature version")
+    args = parser.parse_args(argv)
+
+    store = FeatureStore(args.root)
+    if args.command == "build":
+        from banking_analysis import load_and_preprocess, optimize_dtypes
+        from outlier_detection import cap_columns
+        from feature_engineering import feature_engineering
+        from stage_scheduler import fingerprint
+
+        df, _ = optimize_dtypes(load_and_preprocess(args.input))
+        cols = args.outlier_cols or df.select_dtypes(include="number").columns[:4].tolist()
+        capped, _ = cap_columns(df, cols, copy=False)
+        df_fe, _, _ = feature_engineering(capped, copy=False, as_of=args.as_of)
+        path = store.write(df_fe, args.as_of, {'source': fingerprint(df), 'outlier_cols': cols})
+        print(f"Wrote {len(df_fe):,} rows x {df_fe.shape[1]} columns to {path}")
+    elif args.command == "lookup":
+        print(store.lookup(args.ids, args.as_of, args.columns).T.to_string())
+    else:
+        print(f"Feature version {store.version}:")
+        for as_of in store.partitions():
+            for m in store.manifests(as_of):
+                print(f"  {as_of}: {m['rows']:,} rows, {len(m['columns'])} columns, params={m['params']}")
+
+
+if __name__ == "__main__":
+    main()
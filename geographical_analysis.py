@@ -1,59 +1,89 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
-import streamlit as st
+from instrumentation import show_figure
 
-def avg_deposits_by_geo(df):
-    """Bar plot + dynamic insights: Average Bank Deposits by Nationality and Loyalty Classification"""
-    if {'Nationality', 'Bank Deposits', 'Loyalty Classification'}.issubset(df.columns):
+GEO_COLUMNS = {'Nationality', 'Bank Deposits', 'Loyalty Classification'}
+
+
+def geo_deposits_figure(df):
+    """Bar plot of average Bank Deposits by Nationality, one bar per Loyalty Classification."""
+    fig, ax = plt.subplots(figsize=(6,3))  # compact for Streamlit
+    sns.barplot(
+        x='Nationality',
+        y='Bank Deposits',
+        hue='Loyalty Classification',
+        data=df,
+        estimator='mean',
+        ci=None,
+        palette='Set1',
+        ax=ax
+    )
+    ax.set_title("Average Deposits by Nationality & Loyalty Tier", fontsize=10, fontweight='bold')
+    ax.set_xlabel("Nationality", fontsize=8)
+    ax.set_ylabel("Average Bank Deposits", fontsize=8)
+    plt.xticks(rotation=45, ha='right', fontsize=7)
+    plt.yticks(fontsize=7)
+    ax.grid(True, alpha=0.3, axis='y')
+    ax.legend(title='Loyalty Tier', loc='upper right', fontsize=7, title_fontsize=8)
+
+    plt.tight_layout()
+    return fig
+
+
+def geo_insights(df):
+    """(label, text) insight pairs on average deposits per nationality and loyalty tier."""
+    avg_df = df.groupby(['Nationality', 'Loyalty Classification'], observed=True)['Bank Deposits'].mean().reset_index()
+    # Categorical keys group in category order; keep the alphabetical order used for plain strings
+    avg_df = avg_df.sort_values(['Nationality', 'Loyalty Classification'], key=lambda s: s.astype(str), ignore_index=True)
+    top_combo = avg_df.loc[avg_df['Bank Deposits'].idxmax()]
+    low_combo = avg_df.loc[avg_df['Bank Deposits'].idxmin()]
+
+    # Overall average deposits
+    overall_avg = df['Bank Deposits'].mean()
+
+    # Gap between loyalty tiers by nationality
+    gap_df = avg_df.groupby("Nationality", observed=True)['Bank Deposits'].agg(lambda x: x.max() - x.min()).reset_index()
+    max_gap = gap_df.loc[gap_df['Bank Deposits'].idxmax()]
+    min_gap = gap_df.loc[gap_df['Bank Deposits'].idxmin()]
+
+    return [
+        ("Highest Avg Deposit", f"{top_combo['Nationality']} - {top_combo['Loyalty Classification']} with {top_combo['Bank Deposits']:.2f}"),
+        ("Lowest Avg Deposit", f"{low_combo['Nationality']} - {low_combo['Loyalty Classification']} with {low_combo['Bank Deposits']:.2f}"),
+        ("Overall Avg Deposit", f"{overall_avg:.2f}"),
+        ("Widest Gap", f"{max_gap['Nationality']} shows the largest difference between loyalty tiers ({max_gap['Bank Deposits']:.2f})"),
+        ("Most Consistent", f"{min_gap['Nationality']} has the smallest gap between loyalty tiers ({min_gap['Bank Deposits']:.2f})"),
+    ]
+
+
+def geo_summary(df):
+    """geo_insights, or None without GEO_COLUMNS; the analysis pipeline runs this as a stage."""
+    return geo_insights(df) if GEO_COLUMNS.issubset(df.columns) else None
+
+
+def avg_deposits_by_geo(df, insights=None):
+    """
+    Bar plot + dynamic insights: Average Bank Deposits by Nationality and Loyalty Classification.
+    `insights` from geo_summary (computed here when None).
+    """
+    import streamlit as st
+    if GEO_COLUMNS.issubset(df.columns):
         st.subheader("Geographical Analysis: Average Deposits by Nationality & Loyalty Tier")
         
         # --- Plot ---
-        fig, ax = plt.subplots(figsize=(6,3))  # compact for Streamlit
-        sns.barplot(
-            x='Nationality',
-            y='Bank Deposits',
-            hue='Loyalty Classification',
-            data=df,
-            estimator='mean',
-            ci=None,
-            palette='Set1',
-            ax=ax
-        )
-        ax.set_title("Average Deposits by Nationality & Loyalty Tier", fontsize=10, fontweight='bold')
-        ax.set_xlabel("Nationality", fontsize=8)
-        ax.set_ylabel("Average Bank Deposits", fontsize=8)
-        plt.xticks(rotation=45, ha='right', fontsize=7)
-        plt.yticks(fontsize=7)
-        ax.grid(True, alpha=0.3, axis='y')
-        ax.legend(title='Loyalty Tier', loc='upper right', fontsize=7, title_fontsize=8)
-
-        plt.tight_layout()
-        st.pyplot(fig)
+        fig = geo_deposits_figure(df)
+        show_figure(fig)
         plt.close()
 
         # --- Dynamic Insights ---
-        avg_df = df.groupby(['Nationality', 'Loyalty Classification'])['Bank Deposits'].mean().reset_index()
-        top_combo = avg_df.loc[avg_df['Bank Deposits'].idxmax()]
-        low_combo = avg_df.loc[avg_df['Bank Deposits'].idxmin()]
-
-        # Overall average deposits
-        overall_avg = df['Bank Deposits'].mean()
-
-        # Gap between loyalty tiers by nationality
-        gap_df = avg_df.groupby("Nationality")['Bank Deposits'].agg(lambda x: x.max() - x.min()).reset_index()
-        max_gap = gap_df.loc[gap_df['Bank Deposits'].idxmax()]
-        min_gap = gap_df.loc[gap_df['Bank Deposits'].idxmin()]
-
+        if insights is None:
+            insights = geo_insights(df)
+        items = "".join(f"<li> <b>{label}:</b> {text}</li>" for label, text in insights)
         st.markdown(
             f"""
             <div class="insight-card">
                 <p><b> Insights:</b></p>
                 <ul>
-                    <li> <b>Highest Avg Deposit:</b> {top_combo['Nationality']} - {top_combo['Loyalty Classification']} with {top_combo['Bank Deposits']:.2f}</li>
-                    <li> <b>Lowest Avg Deposit:</b> {low_combo['Nationality']} - {low_combo['Loyalty Classification']} with {low_combo['Bank Deposits']:.2f}</li>
-                    <li> <b>Overall Avg Deposit:</b> {overall_avg:.2f}</li>
-                    <li> <b>Widest Gap:</b> {max_gap['Nationality']} shows the largest difference between loyalty tiers ({max_gap['Bank Deposits']:.2f})</li>
-                    <li> <b>Most Consistent:</b> {min_gap['Nationality']} has the smallest gap between loyalty tiers ({min_gap['Bank Deposits']:.2f})</li>
+                    {items}
                 </ul>
             </div>
             """,
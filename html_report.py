@@ -0,0 +1,239 @@
+"""
+Static export of every dashboard tab into one self-contained HTML file (or PDF).
+
+    python batch_report.py Banking.csv --html --pdf
+    html = export_html(report_sections(values))   # values: the analysis pipeline outputs
+
+A report is a list of (title, blocks) sections, one per dashboard tab. Blocks are
+    ('heading', text)  ('text', text)  ('items', [(label, text)])
+    ('table', frame)   ('code', text)  ('figure', builder, args)
+Figure blocks carry a module-level figure builder of the analysis modules and
+only the inputs that figure needs: a column, value counts, a correlation
+matrix, PCA coordinates, ROC curves. The whole portfolio is never sent.
+Every figure of the report is built in one pool of worker processes, in
+parallel, on the Agg backend. The workers start from a forkserver that has
+already imported the plotting modules, and each sends back the encoded image
+bytes. Images are embedded as base64 PNG (deflate, lossless), or as WebP or
+JPEG for smaller files.
+
+Text is HTML-escaped; the only markup kept from the dashboard strings is
+**bold** and <br>. PDF export needs weasyprint, which is imported when first
+used.
+"""
+import base64
+import html
+import io
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from instrumentation import span
+from outlier_detection import boxplot_figure
+from univariate_analysis import UNIVARIATE_SECTIONS
+from bivariate_analysis import violin_blocks, correlation_blocks
+from geographical_analysis import GEO_COLUMNS, geo_deposits_figure, geo_insights
+from customer_segmentation import SEGMENT_METHODS, segment_insights, cluster_figure
+from credit_risk_modelling import roc_figure, model_insights
+from deposit_growth_analysis import (actual_vs_predicted_figure, residuals_figure, feature_fit_figure,
+                                     prediction_insight, residual_insight, feature_insight)
+
+DPI = 100
+IMAGE_FORMATS = {'png': 'image/png', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+LOSSY_QUALITY = 80
+
+STYLE = """
+body { font-family: -apple-system, 'Segoe UI', Roboto, sans-serif; max-width: 1100px; margin: 2rem auto;
+       padding: 0 1rem; color: #2c3e50; }
+h1 { border-bottom: 3px solid #667eea; padding-bottom: .4rem; }
+h2 { background: linear-gradient(90deg, #667eea, #764ba2); color: white; padding: .5rem 1rem; border-radius: 8px;
+     margin-top: 2.5rem; page-break-before: always; }
+img { max-width: 100%; display: block; margin: 1rem auto; }
+.insight-card { background: #f8f9fa; border-left: 4px solid #667eea; padding: .6rem 1rem; margin: .6rem 0;
+                border-radius: 4px; }
+table { border-collapse: collapse; font-size: .85rem; margin: .8rem 0; }
+th, td { border: 1px solid #ddd; padding: .25rem .6rem; text-align: right; }
+th { background: #f0f2f6; }
+pre { background: #f8f9fa; padding: .8rem; overflow-x: auto; }
+"""
+
+
+# --- Figures in worker processes ---
+def _init_worker():
+    plt.switch_backend('Agg')
+
+
+def encode_figure(build, args, image_format='png', dpi=DPI):
+    """Image bytes of the figure `build(*args)`."""
+    fig = build(*args)
+    buffer = io.BytesIO()
+    options = {} if image_format == 'png' else {'pil_kwargs': {'quality': LOSSY_QUALITY}}
+    fig.savefig(buffer, format=image_format, dpi=dpi, bbox_inches='tight', **options)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def render_figures(figures, processes=None, image_format='png', dpi=DPI):
+    """Encode (builder, args) figures on `processes` worker processes (default: CPU count); bytes in order."""
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format {image_format!r}; expected one of {sorted(IMAGE_FORMATS)}")
+    processes = min(processes or os.cpu_count() or 1, len(figures))
+    with span(f"Report figures x{len(figures)} on {processes} processes"):
+        if processes <= 1:
+            return [encode_figure(build, args, image_format, dpi) for build, args in figures]
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        with ProcessPoolExecutor(processes, mp_context=context, initializer=_init_worker) as pool:
+            futures = [pool.submit(encode_figure, build, args, image_format, dpi) for build, args in figures]
+            return [future.result() for future in futures]
+
+
+# --- Report content ---
+def _figure_blocks(blocks):
+    """Dashboard (builder, args, insights) blocks as report blocks."""
+    out = []
+    for build, args, insights in blocks:
+        out.append(('figure', build, args))
+        out += [('text', insight) for insight in insights]
+    return out
+
+
+def report_sections(values):
+    """
+    Report sections from the analysis pipeline outputs (raw, summary, memory_report,
+    capped, outlier_bounds, features, new_features, feature_insights, deposit) plus
+    'segments' and 'credit'. Missing or None results get a note instead.
+    """
+    raw, capped, df_fe = values['raw'], values['capped'], values['features']
+    sections = []
+
+    summary = values.get('summary')
+    blocks = []
+    if summary is not None:
+        blocks.append(('text', f"{summary['shape'][0]:,} rows and {summary['shape'][1]} columns; "
+                               f"{sum(summary['nulls'].values()):,} missing values."))
+        blocks.append(('table', summary['description']))
+    if values.get('memory_report') is not None:
+        blocks.append(('table', values['memory_report']))
+    sections.append(("📊 Dataset Overview", blocks))
+
+    bounds = values.get('outlier_bounds') or {}
+    blocks = [('figure', boxplot_figure, (raw[col], capped[col], col, 8, 2)) for col in bounds]
+    if bounds:
+        blocks.append(('table', pd.DataFrame(bounds, index=['lower', 'upper']).T))
+    sections.append(("🎯 Outlier Detection", blocks or [('text', "No columns were capped.")]))
+
+    blocks = [('text', "**New features:** " + ", ".join(sorted(values.get('new_features') or [])))]
+    blocks += [('text', insight) for insight in values.get('feature_insights') or []]
+    sections.append(("⚙️ Feature Engineering", blocks))
+
+    blocks = []
+    for title, make_blocks in UNIVARIATE_SECTIONS:
+        blocks += [('heading', title)] + _figure_blocks(make_blocks(capped))
+    sections.append(("📈 Univariate Analysis", blocks))
+
+    sections.append(("🔍 Bivariate Analysis", _figure_blocks(violin_blocks(capped) + correlation_blocks(capped))))
+
+    if GEO_COLUMNS.issubset(capped.columns):
+        blocks = [('figure', geo_deposits_figure, (capped[list(GEO_COLUMNS)],)), ('items', geo_insights(capped))]
+    else:
+        blocks = [('text', "Skipped: missing geographical columns.")]
+    sections.append(("🌍 Geographical Insights", blocks))
+
+    segments = values.get('segments')
+    blocks = []
+    if segments is not None:
+        for method, (_, name, cmap) in SEGMENT_METHODS.items():
+            blocks.append(('heading', name))
+            blocks.append(('figure', cluster_figure, (segments['pca'], segments['labels'][method], name, cmap)))
+            blocks.append(('items', segment_insights(segments['profiles'][method], segments['counts'][method],
+                                                     segments.get('silhouette', {}).get(method))))
+            blocks.append(('table', segments['profiles'][method].assign(Customers=segments['counts'][method])))
+    sections.append(("👥 Customer Segmentation", blocks or [('text', "Segmentation results are not available.")]))
+
+    credit = values.get('credit')
+    blocks = []
+    if credit is not None:
+        items, recommendation = model_insights(credit['aucs'], credit.get('pooled_aucs'))
+        title = "Pooled Out-of-Fold ROC Curves" if 'fold_aucs' in credit else "ROC Curve Comparison"
+        blocks = [('code', credit['svm_report']),
+                  ('figure', roc_figure, (credit['roc'], credit.get('pooled_aucs', credit['aucs']), title)),
+                  ('items', items), ('text', recommendation)]
+    sections.append(("💳 Credit Risk Modeling", blocks or [('text', "Credit model results are not available.")]))
+
+    deposit = values.get('deposit')
+    blocks = []
+    if deposit is not None:
+        fit = deposit['fit']
+        coef_table = pd.DataFrame({'coef': fit['coef'], 'std_err': fit['std_err']}, index=deposit['features'])
+        coef_table.loc['(intercept)'] = [fit['intercept'], fit['intercept_std_err']]
+        blocks = [('table', coef_table), ('text', f"R² = {deposit['r2']:.3f}, MSE = {deposit['mse']:,.2f}"),
+                  ('figure', actual_vs_predicted_figure, ({'y_test': deposit['y_test'], 'y_pred': deposit['y_pred']},)),
+                  ('text', prediction_insight(deposit)),
+                  ('figure', residuals_figure, ({'residuals': deposit['residuals']},)),
+                  ('text', residual_insight(deposit))]
+        for feature in deposit['features']:
+            blocks.append(('figure', feature_fit_figure,
+                           (df_fe[[feature, 'Bank Deposits']], feature, deposit['full_stats'])))
+            blocks.append(('text', feature_insight(deposit, feature)))
+    sections.append(("💰 Deposit Growth Analysis", blocks or [('text', "Deposit regression is not available.")]))
+    return sections
+
+
+# --- HTML ---
+def _inline(text):
+    """Escaped text with the dashboard's **bold** and <br> kept."""
+    text = html.escape(str(text))
+    text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', text)
+    return text.replace('&lt;br&gt;', '<br>').replace('\n', '<br>')
+
+
+def _block_html(block, images, image_format):
+    kind = block[0]
+    if kind == 'heading':
+        return f"<h3>{_inline(block[1])}</h3>"
+    if kind == 'text':
+        return f'<div class="insight-card">{_inline(block[1])}</div>'
+    if kind == 'items':
+        rows = "".join(f"<li><b>{_inline(label)}:</b> {_inline(text)}</li>" for label, text in block[1])
+        return f'<div class="insight-card"><ul>{rows}</ul></div>'
+    if kind == 'table':
+        return block[1].round(3).to_html(border=0)
+    if kind == 'code':
+        return f"<pre>{html.escape(block[1])}</pre>"
+    if kind == 'figure':
+        data = base64.b64encode(next(images)).decode('ascii')
+        return f'<img src="data:{IMAGE_FORMATS[image_format]};base64,{data}">'
+    raise ValueError(f"Unknown report block {kind!r}")
+
+
+def export_html(sections, title="Banking Portfolio Report", processes=None, image_format='png', dpi=DPI):
+    """The report as one HTML document (str) with every figure embedded."""
+    figures = [(block[1], block[2]) for _, blocks in sections for block in blocks if block[0] == 'figure']
+    images = iter(render_figures(figures, processes, image_format, dpi))
+    body = []
+    for heading, blocks in sections:
+        body.append(f"<h2>{_inline(heading)}</h2>")
+        body += [_block_html(block, images, image_format) for block in blocks]
+    generated = datetime.now().isoformat(timespec='seconds')
+    return "\n".join([
+        "<!DOCTYPE html>", '<html lang="en"><head><meta charset="utf-8">',
+        f"<title>{html.escape(title)}</title><style>{STYLE}</style></head><body>",
+        f"<h1>{html.escape(title)}</h1><p>Generated {generated}</p>",
+        *body,
+        "</body></html>",
+    ])
+
+
+def export_pdf(html_text, path):
+    """Write the HTML report as a PDF (needs weasyprint)."""
+    try:
+        from weasyprint import HTML
+    except ImportError as exc:
+        raise ImportError("PDF export needs weasyprint: pip install weasyprint") from exc
+    with span("Report PDF"):
+        HTML(string=html_text).write_pdf(path)
@@ -0,0 +1,287 @@
+"""
+Incremental refresh for daily customer deltas.
+
+A PortfolioState is built once from a base snapshot and then updated with
+deltas keyed by 'Client ID' (new customers are added, known ones replaced):
+
+    python incremental.py --state portfolio.pkl --base Banking.csv
+    python incremental.py --state portfolio.pkl --delta delta_2024-07-01.csv
+
+Only the delta rows go through feature_engineering. The summary statistics,
+null and distinct counts, outlier bounds, group means and deposit regression
+are kept as mergeable aggregates. Removing a customer's old row and adding
+the new one costs O(delta). The exception is the per-column sorted arrays
+behind quantiles: they take one vectorised insert/delete per refresh, a
+memmove rather than a re-sort.
+
+Clusterings and classifiers cannot be updated that way; the state counts
+rows changed since each was last fitted and reports them as stale.
+"""
+import argparse
+import pickle
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from banking_analysis import load_and_preprocess
+from feature_engineering import feature_engineering
+from deposit_growth_analysis import DEPOSIT_FEATURES
+from regression_engine import RegressionStats
+
+KEY = 'Client ID'
+GROUP_MEANS = {('Nationality', 'Loyalty Classification'): ['Bank Deposits']}
+REFIT_MODELS = ['segmentation', 'credit']
+STALE_FRACTION = 0.05
+
+
+class NumericStats:
+    """Count, mean, M2 (mergeable both ways) plus a sorted copy for min/max/quantiles."""
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=float)
+        self.nulls = int(np.isnan(values).sum())
+        self.sorted = np.sort(values[~np.isnan(values)])
+        self.n = len(self.sorted)
+        self.mean = self.sorted.mean() if self.n else 0.0
+        self.m2 = ((self.sorted - self.mean) ** 2).sum()
+
+    def _moments(self, values):
+        return len(values), (values.mean() if len(values) else 0.0), ((values - values.mean()) ** 2).sum()
+
+    def update(self, removed, added):
+        removed, added = np.asarray(removed, dtype=float), np.asarray(added, dtype=float)
+        self.nulls += int(np.isnan(added).sum()) - int(np.isnan(removed).sum())
+        removed, added = np.sort(removed[~np.isnan(removed)]), np.sort(added[~np.isnan(added)])
+
+        # Moments: take the old rows out, then fold the new ones in (Chan et al.)
+        k, mean_k, m2_k = self._moments(removed)
+        if k:
+            n = self.n - k
+            mean = (self.n * self.mean - k * mean_k) / n if n else 0.0
+            self.m2 = self.m2 - m2_k - (mean_k - mean) ** 2 * (n * k / self.n) if n else 0.0
+            self.n, self.mean = n, mean
+        k, mean_k, m2_k = self._moments(added)
+        if k:
+            n = self.n + k
+            delta = mean_k - self.mean
+            self.m2 = self.m2 + m2_k + delta ** 2 * (self.n * k / n)
+            self.mean += delta * k / n
+            self.n = n
+
+        # Sorted values: one batched delete and one batched insert
+        if len(removed):
+            first = np.searchsorted(removed, removed, 'left')
+            idx = np.searchsorted(self.sorted, removed, 'left') + (np.arange(len(removed)) - first)
+            self.sorted = np.delete(self.sorted, idx)
+        if len(added):
+            self.sorted = np.insert(self.sorted, np.searchsorted(self.sorted, added), added)
+
+    def quantile(self, q):
+        """Linear interpolation, as Series.quantile."""
+        pos = q * (self.n - 1)
+        lo = int(np.floor(pos))
+        hi = min(lo + 1, self.n - 1)
+        return self.sorted[lo] + (self.sorted[hi] - self.sorted[lo]) * (pos - lo)
+
+    def describe(self):
+        return {
+            'count': float(self.n),
+            'mean': self.mean,
+            'std': np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan,
+            'min': self.sorted[0],
+            '25%': self.quantile(0.25),
+            '50%': self.quantile(0.5),
+            '75%': self.quantile(0.75),
+            'max': self.sorted[-1],
+        }
+
+    def nunique(self):
+        return int(1 + (np.diff(self.sorted) != 0).sum()) if self.n else 0
+
+
+class TextStats:
+    """Null count and value counts (distinct count and mode follow from them)."""
+
+    def __init__(self, values):
+        values = pd.Series(values)
+        self.nulls = int(values.isna().sum())
+        self.counts = Counter(values.dropna().tolist())
+
+    def update(self, removed, added):
+        removed, added = pd.Series(removed), pd.Series(added)
+        self.nulls += int(added.isna().sum()) - int(removed.isna().sum())
+        self.counts.subtract(removed.dropna().tolist())
+        self.counts.update(added.dropna().tolist())
+        for value in set(removed.dropna()):
+            if self.counts[value] <= 0:
+                del self.counts[value]
+
+    def nunique(self):
+        return len(self.counts)
+
+
+def _column_stats(series):
+    if pd.api.types.is_numeric_dtype(series.dtype) and not isinstance(series.dtype, pd.CategoricalDtype):
+        return NumericStats(series)
+    return TextStats(series)
+
+
+class PortfolioState:
+    """Engineered customer rows plus mergeable aggregates over them."""
+
+    def __init__(self, base, as_of=None):
+        self.as_of = pd.Timestamp(as_of or datetime.today().date())
+        self.base_columns = [col for col in base.columns]
+        self._features = self._engineer(base)
+        self._appended = []  # new customers, concatenated only when the full frame is read
+        self.customers = len(self._features)
+        self.stats = {col: _column_stats(self._features[col]) for col in self._features.columns}
+        self.groups = {}
+        for keys, values in GROUP_MEANS.items():
+            grouped = self._features.groupby(list(keys), observed=True)[values]
+            self.groups[keys] = (grouped.sum(), grouped.count())
+        self.regression = RegressionStats.from_frame(self._features, DEPOSIT_FEATURES, 'Bank Deposits')
+        self.changed_since_fit = {name: 0 for name in REFIT_MODELS}
+        self.refreshes = []
+
+    @classmethod
+    def from_csv(cls, path, as_of=None):
+        return cls(load_and_preprocess(path), as_of)
+
+    @property
+    def features(self):
+        """All engineered customer rows, indexed by Client ID (O(portfolio) after appends)."""
+        if self._appended:
+            self._features = pd.concat([self._features, *self._appended])
+            self._appended = []
+        return self._features
+
+    def _engineer(self, rows):
+        # Tenure is pinned to the state's as-of date so old and new rows stay comparable
+        df_fe, _, _ = feature_engineering(rows, as_of=self.as_of)
+        return df_fe.set_index(KEY, drop=False)
+
+    # --- Refresh ---
+    def apply_delta(self, delta):
+        """Insert new and replace changed customers from `delta` (same columns as the base)."""
+        start = time.perf_counter()
+        delta = delta.drop_duplicates(KEY, keep='last')
+        new_rows = self._engineer(delta[self.base_columns])
+        if any(new_rows.index.isin(rows.index).any() for rows in self._appended):
+            self.features  # a customer appended earlier changed again: consolidate first
+        # The portfolio index keeps its hash table between refreshes; isin would rebuild one per call
+        positions = self._features.index.get_indexer(new_rows.index)
+        known = positions >= 0
+        old_rows = self._features.iloc[positions[known]]
+
+        for col, stats in self.stats.items():
+            stats.update(old_rows[col], new_rows[col])
+        for keys, (sums, counts) in self.groups.items():
+            values = list(sums.columns)
+            for rows, sign in ((old_rows, -1), (new_rows, 1)):
+                grouped = rows.groupby(list(keys), observed=True)[values]
+                sums = sums.add(sign * grouped.sum(), fill_value=0)
+                counts = counts.add(sign * grouped.count(), fill_value=0)
+            self.groups[keys] = (sums, counts)
+        self.regression.remove(old_rows).update(new_rows)
+
+        # Changed rows are overwritten in place; only genuinely new customers are appended
+        if known.any():
+            self._features.loc[new_rows.index[known], :] = new_rows[known].astype(self._features.dtypes.to_dict())
+        if (~known).any():
+            self._appended.append(new_rows[~known])
+            self.customers += int((~known).sum())
+
+        for name in self.changed_since_fit:
+            self.changed_since_fit[name] += len(new_rows)
+        record = {'rows': len(new_rows), 'inserted': int((~known).sum()), 'updated': int(known.sum()),
+                  'seconds': time.perf_counter() - start}
+        self.refreshes.append(record)
+        return record
+
+    def mark_fitted(self, name):
+        self.changed_since_fit[name] = 0
+
+    # --- Views (same shapes as the batch functions) ---
+    def summary(self):
+        """
+        Same keys as banking_analysis.summarize_data, over the base columns
+        (distinct 'Joined Bank' values are counted after date parsing).
+        """
+        numeric = [col for col in self.base_columns if isinstance(self.stats[col], NumericStats)]
+        return {
+            'shape': (self.customers, len(self.base_columns)),
+            'columns': list(self.base_columns),
+            'nulls': {col: self.stats[col].nulls for col in self.base_columns},
+            'unique_values': {col: self.stats[col].nunique() for col in self.base_columns},
+            'description': pd.DataFrame({col: self.stats[col].describe() for col in numeric}).T,
+        }
+
+    def outlier_bounds(self, cols):
+        """IQR fences per column, as outlier_detection.iqr_bounds."""
+        bounds = {}
+        for col in cols:
+            q1, q3 = self.stats[col].quantile(0.25), self.stats[col].quantile(0.75)
+            bounds[col] = (q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+        return bounds
+
+    def group_means(self, keys=('Nationality', 'Loyalty Classification')):
+        sums, counts = self.groups[tuple(keys)]
+        return (sums / counts.where(counts > 0)).dropna(how='all')
+
+    def deposit_fit(self):
+        """OLS of deposits on DEPOSIT_FEATURES over the whole portfolio (always current)."""
+        return self.regression.solve()
+
+    def staleness(self, tolerance=STALE_FRACTION):
+        rows = self.customers
+        return pd.DataFrame([
+            {'model': name, 'changed_rows': changed, 'changed_fraction': changed / rows,
+             'stale': changed / rows > tolerance}
+            for name, changed in self.changed_since_fit.items()
+        ]).set_index('model')
+
+    # --- Persistence ---
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or refresh an incremental portfolio state")
+    parser.add_argument("--state", required=True, help="pickle file holding the state")
+    parser.add_argument("--base", help="full snapshot CSV (builds a new state)")
+    parser.add_argument("--delta", nargs="+", default=[], help="delta CSVs keyed by Client ID, applied in order")
+    parser.add_argument("--as-of", default=None, help="tenure reference date for a new state")
+    parser.add_argument("--outlier-cols", nargs="+", default=['Age', 'Estimated Income', 'Bank Deposits'])
+    args = parser.parse_args(argv)
+
+    if args.base:
+        start = time.perf_counter()
+        state = PortfolioState.from_csv(args.base, args.as_of)
+        print(f"Built state from {args.base}: {len(state.features):,} customers in {time.perf_counter() - start:.2f}s")
+    else:
+        state = PortfolioState.load(args.state)
+    for path in args.delta:
+        record = state.apply_delta(load_and_preprocess(path))
+        print(f"Applied {path}: {record['inserted']:,} new, {record['updated']:,} changed in {record['seconds']:.3f}s")
+
+    print("\nOutlier bounds:")
+    for col, (lower, upper) in state.outlier_bounds(args.outlier_cols).items():
+        print(f"  {col}: {lower:,.2f} .. {upper:,.2f}")
+    print(f"\nDeposit regression R² (full portfolio): {state.deposit_fit()['r2']:.4f}")
+    print("\nModel staleness:")
+    print(state.staleness().to_string())
+    state.save(args.state)
+
+
+if __name__ == "__main__":
+    main()
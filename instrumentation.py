@@ -0,0 +1,200 @@
+"""
+Lightweight per-stage instrumentation.
+
+Code marks work with `span(...)`; spans are only recorded while a Tracer is
+active (see `tracing`). With no active tracer `span` returns a shared no-op
+context manager, so the instrumentation can stay in place permanently.
+Streamlit is imported only by the dashboard helpers at the bottom, so headless
+code (batch report, scoring service) can use spans without it.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_active_tracer = contextvars.ContextVar('active_tracer', default=None)
+_depth = contextvars.ContextVar('span_depth', default=0)
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def max_rss_mb():
+    """Peak resident set size of this process so far, in MB (NaN where `resource` is unavailable)."""
+    if resource is None:
+        return float('nan')
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'category', 'rows', 'start', 'cpu', 'rss', 'token')
+
+    def __init__(self, tracer, name, category, rows):
+        self.tracer, self.name, self.category, self.rows = tracer, name, category, rows
+
+    def __enter__(self):
+        self.token = _depth.set(_depth.get() + 1)
+        self.rss = max_rss_mb()
+        self.cpu = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        cpu = time.thread_time() - self.cpu
+        rss = max_rss_mb() - self.rss
+        _depth.reset(self.token)
+        self.tracer.records.append({
+            'name': self.name,
+            'category': self.category,
+            'depth': _depth.get(),
+            'start_s': self.start - self.tracer.origin,
+            'wall_s': end - self.start,
+            'cpu_s': cpu,
+            'peak_rss_delta_mb': rss,
+            'rows': self.rows,
+            'thread': threading.get_ident(),
+        })
+        return False
+
+
+class Tracer:
+    """
+    Collects timing records for one run. Each record has wall time, CPU time of the
+    recording thread, growth of the process peak RSS and (optionally) rows processed.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.records = []
+
+    def span(self, name, rows=None, category='stage'):
+        return _Span(self, name, category, rows)
+
+    def to_frame(self):
+        cols = ['name', 'category', 'depth', 'start_s', 'wall_s', 'cpu_s', 'peak_rss_delta_mb', 'rows', 'thread']
+        return pd.DataFrame(self.records, columns=cols).sort_values('start_s', kind='stable')
+
+    def to_json(self):
+        return json.dumps(self.records, indent=2, default=str)
+
+    def to_chrome_trace(self):
+        """Serialise as Chrome trace-event JSON (open in chrome://tracing or Perfetto)."""
+        pid = os.getpid()
+        events = [{
+            'name': r['name'],
+            'cat': r['category'],
+            'ph': 'X',
+            'ts': r['start_s'] * 1e6,
+            'dur': r['wall_s'] * 1e6,
+            'pid': pid,
+            'tid': r['thread'],
+            'args': {k: r[k] for k in ('cpu_s', 'peak_rss_delta_mb', 'rows') if r[k] is not None},
+        } for r in self.records]
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+
+@contextlib.contextmanager
+def tracing(tracer):
+    """Make `tracer` the active tracer for the enclosed block (and this context only)."""
+    token = _active_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _active_tracer.reset(token)
+
+
+def activate(tracer):
+    """Set the active tracer for the rest of the current context (None turns tracing off)."""
+    return _active_tracer.set(tracer)
+
+
+def active_tracer():
+    return _active_tracer.get()
+
+
+def _column_buffers(frame):
+    for i in range(frame.shape[1]):
+        values = frame.iloc[:, i].array
+        if isinstance(values, pd.Categorical):
+            values = values.codes
+        yield np.asarray(values)
+
+
+def owned_mb(frame, shared_with=()):
+    """
+    MB of column data in `frame` that is not shared with any frame in `shared_with`,
+    i.e. what a stage actually added on top of its inputs (object columns count pointers only).
+    """
+    base = [buf for other in shared_with for buf in _column_buffers(other)]
+    owned = sum(buf.nbytes for buf in _column_buffers(frame)
+                if not any(np.may_share_memory(buf, b) for b in base))
+    return owned / 1024 ** 2
+
+
+def span(name, rows=None, category='stage'):
+    """Time the enclosed block on the active tracer; a no-op when tracing is off."""
+    tracer = _active_tracer.get()
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, rows, category)
+
+
+def show_figure(fig, name=None, **kwargs):
+    """st.pyplot with the render recorded as a span, named after the first axes title by default."""
+    import streamlit as st
+    tracer = _active_tracer.get()
+    if tracer is None:
+        st.pyplot(fig, **kwargs)
+        return
+    if name is None:
+        titles = [ax.get_title() for ax in fig.axes if ax.get_title()]
+        name = titles[0] if titles else 'figure'
+    with tracer.span(f"Render: {name}", category='render'):
+        st.pyplot(fig, **kwargs)
+
+
+def show_blocks(blocks):
+    """
+    Draw (figure builder, args, insights) blocks, each figure followed by its insights
+    in st.info boxes. The HTML export (html_report) builds the same blocks in worker processes.
+    """
+    import matplotlib.pyplot as plt
+    import streamlit as st
+    for build, args, insights in blocks:
+        fig = build(*args)
+        show_figure(fig)
+        plt.close(fig)
+        for insight in insights:
+            st.info(insight)
+
+
+def render_trace_panel(tracer):
+    """Collapsible sidebar panel with the recorded spans and JSON / Chrome-trace downloads."""
+    import streamlit as st
+    with st.sidebar.expander("⏱️ Performance Trace", expanded=False):
+        if tracer is None or not tracer.records:
+            st.caption("No spans recorded yet.")
+            return
+        trace = tracer.to_frame()
+        table = trace.assign(name=[' ' * d + n for d, n in zip(trace['depth'], trace['name'])])
+        st.dataframe(
+            table[['name', 'wall_s', 'cpu_s', 'peak_rss_delta_mb', 'rows']].round(4),
+            use_container_width=True, hide_index=True
+        )
+        top = trace[trace['depth'] == 0]['wall_s'].sum()
+        st.caption(f"{len(trace)} spans, {top:.2f}s in top-level stages")
+        st.download_button("Download JSON", tracer.to_json(), file_name="trace.json", mime="application/json")
+        st.download_button("Download Chrome trace", tracer.to_chrome_trace(),
+                           file_name="trace.chrome.json", mime="application/json")
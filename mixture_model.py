@@ -0,0 +1,258 @@
+"""
+Gaussian mixtures for customer segmentation: parallel restarts, warm starts
+and stochastic EM.
+
+    gmm = ParallelGaussianMixture(n_components=4, state=MixtureState(),
+                                  columns=SEGMENT_FEATURES, scaler=scaler)
+    labels = gmm.fit_predict(X_scaled)
+
+- Cold start: `n_init` EM runs from seeds random_state, random_state + 1, ...
+  are fitted in parallel processes (joblib), and the run with the best
+  log-likelihood bound is kept. The first seed gives the same run as
+  GaussianMixture(random_state=42) alone, so the kept model is never worse.
+- Warm start: the fitted parameters are saved in original feature units, with
+  the column means and standard deviations of the data as its fingerprint.
+  If the next fit's data has the same columns and k, and a close fingerprint
+  (means within `warm_tolerance` standard deviations, deviations within
+  `warm_tolerance` relative), EM starts from the saved parameters. Starting
+  there, it converges in a few iterations. A warm run that does not converge
+  falls back to the cold start.
+- Stochastic EM: above `minibatch_rows` rows, EM runs on shuffled mini-batches
+  with a decaying step on the sufficient statistics, starting from the warm
+  parameters or from the parallel restarts on a subsample. A couple of
+  full-data EM iterations then polish the result.
+
+State files are .npz archives of plain arrays (no pickles), one per column
+set and k, replaced atomically. They live in MODEL_STATE_DIR when set, else in
+the user's cache directory (~/.cache/banking-analytics/model_state), never in
+the directory the dashboard was started from.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import warnings
+
+import numpy as np
+
+N_INIT = 4
+WARM_TOLERANCE = 0.05
+MINIBATCH_ROWS = 500_000  # larger inputs use stochastic EM
+BATCH_SIZE = 10_000
+INIT_SAMPLE = 50_000  # rows the restarts see before stochastic EM
+MAX_EPOCHS = 5
+POLISH_ITER = 2
+REG_COVAR = 1e-6  # sklearn's default, added to the covariance diagonals
+
+
+def default_state_dir():
+    """Absolute warm-start directory: MODEL_STATE_DIR when set, else one under the user's cache directory."""
+    root = os.environ.get('MODEL_STATE_DIR') or os.path.join('~', '.cache', 'banking-analytics', 'model_state')
+    return os.path.abspath(os.path.expanduser(root))
+
+
+# --- Persisted parameters ---
+def _rescale(params, offset, factor):
+    """Parameters of the mixture of x * factor + offset (per column) given those of x."""
+    return {
+        'weights': params['weights'],
+        'means': params['means'] * factor + offset,
+        'covariances': params['covariances'] * np.outer(factor, factor),
+    }
+
+
+def fingerprint_close(previous, mean, scale, tolerance=WARM_TOLERANCE):
+    """Whether data with column `mean` and `scale` is within `tolerance` of the saved fingerprint."""
+    old_mean, old_scale = previous['data_mean'], previous['data_scale']
+    if old_mean.shape != np.shape(mean):
+        return False
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return bool(np.all(np.abs(mean - old_mean) <= tolerance * old_scale)
+                    and np.all(np.abs(scale / old_scale - 1) <= tolerance))
+
+
+class MixtureState:
+    """Fitted mixture parameters between sessions, one file per (columns, n_components) under `root`."""
+
+    def __init__(self, root=None):
+        self.root = default_state_dir() if root is None else root
+
+    def path(self, columns, n_components):
+        key = hashlib.sha1(json.dumps([list(columns), n_components]).encode()).hexdigest()[:12]
+        return os.path.join(self.root, f"gmm_{key}.npz")
+
+    def load(self, columns, n_components):
+        """Saved parameters (original units) with 'data_mean', 'data_scale' and 'rows', or None."""
+        try:
+            with np.load(self.path(columns, n_components), allow_pickle=False) as saved:
+                return {name: saved[name] for name in saved.files}
+        except (OSError, ValueError):
+            return None
+
+    def save(self, columns, params, data_mean, data_scale, rows):
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(columns, len(params['weights']))
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, data_mean=data_mean, data_scale=data_scale, rows=rows, **params)
+        os.replace(tmp, path)  # concurrent sessions never see a half-written file
+
+
+# --- EM ---
+def _fit_one(X, n_components, seed, max_iter, tol, init=None):
+    """One sklearn GaussianMixture run from `seed`, or from the parameters `init`."""
+    from sklearn.mixture import GaussianMixture
+    if init is None:
+        model = GaussianMixture(n_components=n_components, random_state=seed, max_iter=max_iter, tol=tol)
+    else:
+        model = GaussianMixture(n_components=n_components, random_state=seed, max_iter=max_iter, tol=tol,
+                                weights_init=init['weights'], means_init=init['means'],
+                                precisions_init=np.linalg.inv(init['covariances']))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # unconverged runs are reported through converged_
+        return model.fit(X)
+
+
+def best_of_restarts(X, n_components, seeds, max_iter=100, tol=1e-3, n_jobs=-1):
+    """The GaussianMixture with the highest lower bound over one run per seed, fitted in parallel processes."""
+    from joblib import Parallel, delayed
+    models = Parallel(n_jobs=n_jobs)(delayed(_fit_one)(X, n_components, seed, max_iter, tol) for seed in seeds)
+    return max(models, key=lambda model: model.lower_bound_)  # first seed wins ties
+
+
+def _params(model):
+    return {'weights': model.weights_, 'means': model.means_, 'covariances': model.covariances_}
+
+
+def _log_resp(X, params):
+    """Log responsibilities and the mean log-likelihood of the rows of X (full covariances)."""
+    from scipy.linalg import solve_triangular
+    from scipy.special import logsumexp
+    d = X.shape[1]
+    weighted = np.empty((len(X), len(params['weights'])))
+    for k, (mean, cov) in enumerate(zip(params['means'], params['covariances'])):
+        chol = np.linalg.cholesky(cov)
+        y = solve_triangular(chol, (X - mean).T, lower=True)
+        weighted[:, k] = (-0.5 * (d * np.log(2 * np.pi) + (y ** 2).sum(axis=0))
+                          - np.log(np.diag(chol)).sum() + np.log(params['weights'][k]))
+    norm = logsumexp(weighted, axis=1)
+    return weighted - norm[:, None], float(norm.mean())
+
+
+def stochastic_em(X, init, batch_size=BATCH_SIZE, max_epochs=MAX_EPOCHS, tol=1e-3, random_state=0):
+    """
+    Online EM (Cappé & Moulines): per mini-batch, the normalised sufficient
+    statistics move towards the batch's by a step (t + 2) ** -0.6 and the
+    parameters are re-derived from them. Stops when the mean batch
+    log-likelihood of an epoch improves by less than `tol`.
+    Returns (parameters, batches processed).
+    """
+    rng = np.random.default_rng(random_state)
+    d = X.shape[1]
+    weights, means = init['weights'], init['means']
+    stats = [weights, weights[:, None] * means,
+             weights[:, None, None] * (init['covariances'] + np.einsum('ki,kj->kij', means, means))]
+    params, t, previous = init, 0, -np.inf
+    for _ in range(max_epochs):
+        order = rng.permutation(len(X))
+        epoch_ll = []
+        for start in range(0, len(X), batch_size):
+            batch = X[order[start:start + batch_size]]
+            log_resp, ll = _log_resp(batch, params)
+            resp = np.exp(log_resp)
+            batch_stats = [resp.mean(axis=0), resp.T @ batch / len(batch),
+                           np.einsum('nk,ni,nj->kij', resp, batch, batch) / len(batch)]
+            step = (t + 2) ** -0.6
+            stats = [(1 - step) * s + step * b for s, b in zip(stats, batch_stats)]
+            weights = stats[0] / stats[0].sum()
+            means = stats[1] / stats[0][:, None]
+            covariances = stats[2] / stats[0][:, None, None] - np.einsum('ki,kj->kij', means, means)
+            covariances += REG_COVAR * np.eye(d)
+            params = {'weights': weights, 'means': means, 'covariances': covariances}
+            epoch_ll.append(ll)
+            t += 1
+        current = float(np.mean(epoch_ll))
+        if current - previous < tol:
+            break
+        previous = current
+    return params, t
+
+
+class ParallelGaussianMixture:
+    """
+    GaussianMixture(covariance_type='full') with parallel restarts, warm starts
+    from `state` and stochastic EM for large inputs. Follows the sklearn
+    fit/predict protocol; the fitted sklearn model is `model_`.
+
+    `scaler` (a fitted StandardScaler) maps the input back to original units
+    for the saved parameters and the fingerprint; without one the input is
+    taken as is. After fit: `start_` ('warm' or 'cold'), `stochastic_`,
+    `n_iter_` (full-data EM iterations), `n_batches_` and `lower_bound_`.
+    """
+
+    def __init__(self, n_components=4, n_init=N_INIT, n_jobs=-1, random_state=42, max_iter=100, tol=1e-3,
+                 state=None, columns=None, scaler=None, warm_tolerance=WARM_TOLERANCE,
+                 minibatch_rows=MINIBATCH_ROWS, batch_size=BATCH_SIZE):
+        self.n_components = n_components
+        self.n_init = n_init
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.max_iter = max_iter
+        self.tol = tol
+        self.state = state
+        self.columns = columns
+        self.scaler = scaler
+        self.warm_tolerance = warm_tolerance
+        self.minibatch_rows = minibatch_rows
+        self.batch_size = batch_size
+
+    def _units(self, X):
+        """(offset, factor) from the input to original units, and the fingerprint (column mean, std)."""
+        if self.scaler is not None:
+            return self.scaler.mean_, self.scaler.scale_, self.scaler.mean_, self.scaler.scale_
+        d = X.shape[1]
+        return np.zeros(d), np.ones(d), X.mean(axis=0), X.std(axis=0)
+
+    def _restarts(self, X):
+        seeds = range(self.random_state, self.random_state + self.n_init)
+        return best_of_restarts(X, self.n_components, seeds, self.max_iter, self.tol, self.n_jobs)
+
+    def fit(self, X, y=None):
+        X = np.asarray(X, dtype=float)
+        offset, factor, data_mean, data_scale = self._units(X)
+        columns = list(self.columns) if self.columns is not None else [str(i) for i in range(X.shape[1])]
+
+        init = None
+        previous = None if self.state is None else self.state.load(columns, self.n_components)
+        if previous is not None and fingerprint_close(previous, data_mean, data_scale, self.warm_tolerance):
+            init = _rescale(previous, -offset / factor, 1 / factor)
+
+        self.stochastic_, self.n_batches_ = len(X) > self.minibatch_rows, 0
+        if self.stochastic_:
+            self.start_ = 'warm' if init is not None else 'cold'
+            if init is None:
+                rng = np.random.default_rng(self.random_state)
+                rows = rng.choice(len(X), min(INIT_SAMPLE, len(X)), replace=False)
+                init = _params(self._restarts(X[rows]))
+            init, self.n_batches_ = stochastic_em(X, init, self.batch_size, tol=self.tol,
+                                                  random_state=self.random_state)
+            model = _fit_one(X, self.n_components, self.random_state, POLISH_ITER, self.tol, init)
+        else:
+            model = None
+            if init is not None:
+                model = _fit_one(X, self.n_components, self.random_state, self.max_iter, self.tol, init)
+            self.start_ = 'warm' if model is not None and model.converged_ else 'cold'
+            if self.start_ == 'cold':
+                model = self._restarts(X)
+
+        self.model_ = model
+        self.n_iter_, self.lower_bound_ = model.n_iter_, model.lower_bound_
+        if self.state is not None:
+            self.state.save(columns, _rescale(_params(model), offset, factor), data_mean, data_scale, len(X))
+        return self
+
+    def fit_predict(self, X, y=None):
+        return self.fit(X).predict(X)
+
+    def predict(self, X):
+        return self.model_.predict(np.asarray(X, dtype=float))
@@ -1,42 +1,82 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
-import streamlit as st
+from instrumentation import show_figure
 
 
-def cap_outliers(series):
+def iqr_bounds(series):
     """
-    Cap outliers using IQR method.
+    Lower and upper IQR fences (Q1 - 1.5*IQR, Q3 + 1.5*IQR).
     """
     Q1, Q3 = series.quantile([0.25, 0.75])
     IQR = Q3 - Q1
-    lower, upper = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
+    return Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
+
+
+def cap_outliers(series):
+    """
+    Cap outliers using IQR method.
+    """
+    lower, upper = iqr_bounds(series)
     return np.where(series > upper, upper,
            np.where(series < lower, lower, series))
 
 
-def plot_boxplots_before_after(df, cols, width=6, height=1):
+def _cap_one(series):
+    return iqr_bounds(series), cap_outliers(series)
+
+
+def cap_columns(df, cols, copy=True, n_jobs=1):
     """
-    Plot before and after boxplots side by side for each column.
-    Returns modified DataFrame.
+    Apply IQR capping to `cols`.
+    Returns the capped copy of df and the (lower, upper) bounds used per column.
+    With copy=False only the capped columns are new; the rest are shared with df.
+    n_jobs > 1 caps the columns on that many threads.
     """
-    df_copy = df.copy()
+    df_copy = df.copy(deep=copy)
+    cols = [col for col in cols if col in df_copy.columns]
+    if n_jobs > 1 and len(cols) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(min(n_jobs, len(cols))) as pool:
+            results = list(pool.map(_cap_one, [df_copy[col] for col in cols]))
+    else:
+        results = [_cap_one(df_copy[col]) for col in cols]
+    bounds = {}
+    for col, (col_bounds, capped) in zip(cols, results):
+        bounds[col] = col_bounds
+        df_copy[col] = capped
+    return df_copy, bounds
 
-    for col in cols:
-        if col in df_copy.columns:
-            fig, axes = plt.subplots(1, 2, figsize=(width, height))
 
-            # Before
-            sns.boxplot(x=df[col], ax=axes[0])
-            axes[0].set_title(f'Before - {col}', fontsize=9)
+def boxplot_figure(before, after, col, width=6, height=1):
+    """Before/after boxplots for one column side by side."""
+    # seaborn is only needed for rendering; capping runs in the pipeline without it
+    import seaborn as sns
+    fig, axes = plt.subplots(1, 2, figsize=(width, height))
 
-            # Apply outlier capping
-            df_copy[col] = cap_outliers(df_copy[col])
+    # Before
+    sns.boxplot(x=before, ax=axes[0])
+    axes[0].set_title(f'Before - {col}', fontsize=9)
 
-            # After
-            sns.boxplot(x=df_copy[col], ax=axes[1])
-            axes[1].set_title(f'After - {col}', fontsize=9)
+    # After
+    sns.boxplot(x=after, ax=axes[1])
+    axes[1].set_title(f'After - {col}', fontsize=9)
+    return fig
+
+
+def plot_boxplots(before, after, cols, width=6, height=1):
+    """Render before/after boxplots for each column of two already-computed frames."""
+    for col in cols:
+        if col in after.columns:
+            fig = boxplot_figure(before[col], after[col], col, width, height)
+            show_figure(fig, f"Boxplots: {col}", clear_figure=True)
+            plt.close(fig)
 
-            st.pyplot(fig, clear_figure=True)
 
+def plot_boxplots_before_after(df, cols, width=6, height=1):
+    """
+    Plot before and after boxplots side by side for each column.
+    Returns modified DataFrame.
+    """
+    df_copy, _ = cap_columns(df, cols)
+    plot_boxplots(df, df_copy, cols, width, height)
     return df_copy
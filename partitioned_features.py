@@ -0,0 +1,130 @@
+"""
+Row-partitioned feature engineering on a process pool.
+
+    df_fe, new_features, insights = feature_engineering_partitioned(df, as_of='2024-06-30', partitions=16)
+
+The parent parses the join dates once and writes the numeric inputs into a
+float block in shared memory. Each worker attaches to that block and
+evaluates the FeatureTransformer plan for its range of rows. The derived
+columns go straight into shared output arrays, so only the small insight
+partial aggregates are sent back. Rows are independent and the partials
+merge exactly, so the frame and the insights are bit-identical to
+feature_engineering().
+
+Workers come from a forkserver: they never inherit the threads of the
+dashboard or of the stage graph.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from feature_engineering import (FeatureTransformer, feature_engineering, format_insights, insight_partials,
+                                 merge_insight_partials)
+from instrumentation import span
+
+MIN_PARTITION_ROWS = 20_000  # smaller partitions cost more in process start-up than they save
+
+
+class SharedArrays:
+    """
+    NumPy arrays in shared memory, laid out as {key: (shape, dtype)}.
+    Created by the parent (names=None) or attached to by name in a worker;
+    close() releases them, and the creator also unlinks them.
+    """
+
+    def __init__(self, layout, names=None):
+        self.layout = layout
+        self.owner = names is None
+        self.blocks, self.arrays = {}, {}
+        for key, (shape, dtype) in layout.items():
+            if self.owner:
+                size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+                shm = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                shm = shared_memory.SharedMemory(name=names[key])
+            self.blocks[key] = shm
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    @property
+    def names(self):
+        return {key: shm.name for key, shm in self.blocks.items()}
+
+    def close(self):
+        self.arrays.clear()
+        for shm in self.blocks.values():
+            shm.close()
+            if self.owner:
+                shm.unlink()
+
+
+def partition_edges(rows, partitions, min_rows=MIN_PARTITION_ROWS):
+    """Row boundaries of at most `partitions` near-equal chunks of at least `min_rows` rows."""
+    partitions = max(1, min(partitions, rows // max(min_rows, 1)))
+    return np.linspace(0, rows, partitions + 1).astype(int)
+
+
+def _evaluate_partition(transformer, arrays, start, stop):
+    joined = arrays['_joined'][start:stop].view('datetime64[ns]') if '_joined' in arrays else None
+    values = transformer._evaluate(arrays['_block'][start:stop], joined)
+    for name in transformer.new_features_:
+        arrays[name][start:stop] = values[name]
+    return insight_partials(values, transformer.new_features_)
+
+
+def _run_partition(transformer, layout, names, start, stop):
+    """Worker: evaluate rows [start, stop) in place and return their insight partials."""
+    shared = SharedArrays(layout, names)
+    try:
+        return _evaluate_partition(transformer, shared.arrays, start, stop)
+    finally:
+        shared.close()
+
+
+def feature_engineering_partitioned(df, copy=True, as_of=None, partitions=None, min_rows=MIN_PARTITION_ROWS):
+    """
+    feature_engineering() over row partitions in `partitions` processes
+    (default: CPU count). Frames too small to split run serially.
+    Returns (df_copy, new_features, insights) like feature_engineering().
+    """
+    partitions = partitions or os.cpu_count() or 1
+    edges = partition_edges(len(df), partitions, min_rows)
+    if len(edges) <= 2:
+        return feature_engineering(df, copy=copy, as_of=as_of)
+
+    transformer = FeatureTransformer(as_of=as_of).fit(df)
+    transformer.as_of = transformer._today()  # every worker measures tenure at the same date
+    new_features = list(transformer.new_features_)
+    out = df.copy(deep=copy)
+
+    # Output dtypes follow from the plan and input dtypes alone: evaluate zero rows to get them
+    probe = transformer._evaluate(np.empty((0, len(transformer.numeric_inputs_))),
+                                  None if transformer.date_input_ is None else np.empty(0, dtype='datetime64[ns]'))
+    layout = {'_block': ((len(df), len(transformer.numeric_inputs_)), 'float64')}
+    if transformer.date_input_ is not None:
+        layout['_joined'] = ((len(df),), 'int64')
+    layout.update({name: ((len(df),), probe[name].dtype.str) for name in new_features})
+
+    shared = SharedArrays(layout)
+    try:
+        joined = transformer._inputs(df, block=shared.arrays['_block'])[1]
+        if joined is not None:
+            shared.arrays['_joined'][:] = joined.view('int64')
+            out[transformer.date_input_] = joined
+
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        with span(f"Feature partitions x{len(edges) - 1}", rows=len(df)):
+            with ProcessPoolExecutor(len(edges) - 1, mp_context=context) as pool:
+                futures = [pool.submit(_run_partition, transformer, layout, shared.names, start, stop)
+                           for start, stop in zip(edges[:-1], edges[1:])]
+                partials = [future.result() for future in futures]
+        values = {name: shared.arrays[name].copy() for name in new_features}
+    finally:
+        shared.close()
+
+    insights = format_insights(reduce(merge_insight_partials, partials))
+    return transformer._assign(out, values), new_features, insights
@@ -0,0 +1,195 @@
+"""
+Side-by-side comparison of several portfolios (branches, quarters).
+
+    results = compare_portfolios({'Q1': 'q1.csv', 'Q2': 'q2.csv'})
+    auc_table(results)
+
+    python portfolio_comparison.py q1.csv q2.csv q3.csv --output-dir comparison
+
+Each portfolio runs the analysis pipeline on its own StageGraph with its own
+memo cache (or the dashboard's shared CacheManager), so a file that did not
+change is not processed again. All the graphs submit their stages to one
+shared thread pool: N portfolios use max_workers threads, not N x
+max_workers, and one portfolio's stages fill the gaps left by another's.
+Each portfolio's aggregates are computed once: summary statistics, segment
+profiles and sizes, credit-model AUCs and deposit regression coefficients.
+The result keeps only those, and the comparison tables are built from them.
+"""
+import argparse
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+import pandas as pd
+
+from analysis_pipeline import build_pipeline
+from customer_segmentation import SEGMENT_METHODS
+
+MAX_WORKERS = 4
+COMPARISON_TARGETS = ['summary', 'segments', 'credit', 'deposit']
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def shared_executor():
+    """The process-wide stage pool shared by every portfolio (and every session)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='stage')
+        return _executor
+
+
+def portfolio_name(source):
+    """Display name of a CSV path or uploaded file: its file name without the extension."""
+    return os.path.splitext(os.path.basename(getattr(source, 'name', str(source))))[0]
+
+
+def portfolio_aggregates(values):
+    """The comparison figures of one portfolio from its pipeline outputs."""
+    summary, deposit = values['summary'], values['deposit']
+    fit = deposit['fit']
+    coefficients = pd.Series(list(fit['coef']) + [fit['intercept']], index=list(deposit['features']) + ['(intercept)'])
+    segments = values['segments']
+    return {
+        'rows': summary['shape'][0],
+        'columns': summary['shape'][1],
+        'missing': sum(summary['nulls'].values()),
+        'means': summary['description']['mean'],
+        'profiles': None if segments is None else segments['profiles'],
+        'counts': None if segments is None else segments['counts'],
+        'aucs': values['credit']['aucs'],
+        'coefficients': coefficients,
+        'r2': deposit['r2'],
+    }
+
+
+def run_portfolio(source, cache=None, executor=None, outlier_cols=None):
+    """Aggregates of one portfolio; its stages run on `executor` and are memoised in `cache`."""
+    pipeline = build_pipeline(cache=cache, executor=executor)
+    sources = {'source': source, 'as_of': date.today(), 'model_state': None, 'sample_rows': None}
+    raw = pipeline.run(sources, targets=['raw'])['raw']
+    # Same default as the dashboard and the batch report: cap the first four numeric columns
+    sources['outlier_cols'] = tuple(outlier_cols or raw.select_dtypes(include='number').columns[:4])
+    return portfolio_aggregates(pipeline.run(sources, targets=COMPARISON_TARGETS))
+
+
+def compare_portfolios(sources, caches=None, executor=None, outlier_cols=None, progress=None):
+    """
+    Aggregates per portfolio for {name: CSV path or file} `sources`, all processed
+    concurrently on one shared stage pool (default: shared_executor()).
+    `caches` ({name: dict}) keeps each portfolio's stage outputs between calls;
+    entries of portfolios no longer compared are dropped. A CacheManager instead
+    is shared by all portfolios (and sessions) and keyed by content.
+    `progress(done, total, label)` is called as portfolios finish.
+    """
+    executor = executor or shared_executor()
+    caches = {} if caches is None else caches
+    if hasattr(caches, 'lookup'):
+        shared = caches
+        caches = {name: shared for name in sources}
+    for name in set(caches) - set(sources):
+        del caches[name]
+    if progress is not None:
+        progress(0, len(sources), f"processing {len(sources)} portfolios")
+
+    results = {}
+    # One driver thread per portfolio waits on its graph; the stage work itself runs on `executor`
+    with ThreadPoolExecutor(max_workers=max(1, len(sources)), thread_name_prefix='portfolio') as drivers:
+        futures = {drivers.submit(contextvars.copy_context().run, run_portfolio, source,
+                                  caches.setdefault(name, {}), executor, outlier_cols): name
+                   for name, source in sources.items()}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress(done, len(sources), f"finished {futures[future]}")
+    return {name: results[name] for name in sources}
+
+
+# --- Side-by-side tables (one column per portfolio) ---
+def summary_table(results):
+    rows = {}
+    for name, agg in results.items():
+        rows[name] = pd.concat([pd.Series({'Rows': agg['rows'], 'Columns': agg['columns'],
+                                           'Missing values': agg['missing']}),
+                                agg['means'].add_prefix('Mean ')])
+    return pd.DataFrame(rows)
+
+
+def segment_table(results, method):
+    """Segment profiles and sizes of `method`, indexed by (portfolio, segment)."""
+    frames = {name: agg['profiles'][method].assign(Customers=agg['counts'][method])
+              for name, agg in results.items() if agg['profiles'] is not None}
+    return pd.concat(frames, names=['Portfolio', 'Segment']) if frames else pd.DataFrame()
+
+
+def auc_table(results):
+    return pd.DataFrame({name: agg['aucs'] for name, agg in results.items()})
+
+
+def coefficient_table(results):
+    table = pd.DataFrame({name: agg['coefficients'] for name, agg in results.items()})
+    table.loc['R²'] = [agg['r2'] for agg in results.values()]
+    return table
+
+
+def render_comparison(results):
+    """Dashboard view: the side-by-side tables for the compared portfolios."""
+    import streamlit as st
+    st.subheader("📋 Summary Statistics")
+    st.dataframe(summary_table(results).round(2), use_container_width=True)
+
+    st.subheader("👥 Segment Profiles")
+    tabs = st.tabs([name for _, name, _ in SEGMENT_METHODS.values()])
+    for tab, method in zip(tabs, SEGMENT_METHODS):
+        with tab:
+            columns = st.columns(len(results))
+            for column, (name, agg) in zip(columns, results.items()):
+                with column:
+                    st.markdown(f"**{name}**")
+                    if agg['profiles'] is None:
+                        st.caption("Missing segmentation features.")
+                    else:
+                        st.dataframe(agg['profiles'][method].assign(Customers=agg['counts'][method]).round(2),
+                                     use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("💳 Credit Model AUC")
+        aucs = auc_table(results)
+        st.dataframe(aucs.round(4), use_container_width=True)
+        st.bar_chart(aucs.T)
+    with col2:
+        st.subheader("💰 Deposit Regression Coefficients")
+        st.dataframe(coefficient_table(results).round(4), use_container_width=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare several banking portfolios side by side")
+    parser.add_argument("inputs", nargs="+", help="portfolio CSV files")
+    parser.add_argument("--output-dir", default="comparison")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="threads shared by all portfolios")
+    args = parser.parse_args(argv)
+
+    sources = {}
+    for path in args.inputs:
+        name = portfolio_name(path)
+        sources[path if name in sources else name] = path  # same file name in two folders: use the path
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix='stage') as executor:
+        results = compare_portfolios(sources, executor=executor)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    tables = {'summary': summary_table(results), 'model_auc': auc_table(results),
+              'deposit_coefficients': coefficient_table(results)}
+    tables.update({f"segment_profile_{method.lower()}": segment_table(results, method) for method in SEGMENT_METHODS})
+    for name, table in tables.items():
+        table.to_csv(os.path.join(args.output_dir, f"{name}.csv"))
+    print(auc_table(results).round(4).to_string())
+    print(f"Comparison written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
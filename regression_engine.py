@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+
+class RegressionStats:
+    """
+    Sufficient statistics for ordinary least squares over a fixed set of columns.
+
+    Instead of raw XᵀX, Xᵀy and yᵀy the engine keeps the row count, the column
+    means and the centred cross-product matrix of [X, y]. That is the same
+    information (XᵀX = C + n·x̄x̄ᵀ) but does not lose precision on large sums,
+    and two blocks merge exactly (Chan et al.), so chunks can be streamed,
+    combined across workers, or appended later without revisiting old rows.
+    """
+
+    def __init__(self, features, target):
+        self.features = list(features)
+        self.target = target
+        self.columns = self.features + [target]
+        k = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+
+    # --- Accumulation ---
+    def _block(self, chunk):
+        block = chunk[self.columns].to_numpy(dtype=float)
+        block = block[~np.isnan(block).any(axis=1)]
+        other = RegressionStats(self.features, self.target)
+        if len(block):
+            other.n = len(block)
+            other.mean = block.mean(axis=0)
+            centred = block - other.mean
+            other.comoment = centred.T @ centred
+        return other
+
+    def update(self, chunk):
+        """Add a chunk of rows (DataFrame with the feature and target columns). Rows with NaNs are skipped."""
+        return self.merge(self._block(chunk))
+
+    def remove(self, chunk):
+        """Take back rows previously added with `update` (e.g. the old version of changed customers)."""
+        return self.subtract(self._block(chunk))
+
+    def merge(self, other):
+        """Fold another RegressionStats over the same columns into this one."""
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge regression stats over different columns")
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.comoment = other.n, other.mean.copy(), other.comoment.copy()
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.n * other.n / n)
+        self.mean = self.mean + delta * (other.n / n)
+        self.n = n
+        return self
+
+    def subtract(self, other):
+        """Inverse of `merge`: remove a block whose rows are contained in this one."""
+        if other.columns != self.columns:
+            raise ValueError("Cannot subtract regression stats over different columns")
+        if other.n == 0:
+            return self
+        if other.n > self.n:
+            raise ValueError("Cannot remove more rows than were added")
+        n = self.n - other.n
+        if n == 0:
+            self.n, self.mean, self.comoment = 0, np.zeros_like(self.mean), np.zeros_like(self.comoment)
+            return self
+        mean = (self.n * self.mean - other.n * other.mean) / n
+        delta = other.mean - mean
+        self.comoment = self.comoment - other.comoment - np.outer(delta, delta) * (n * other.n / self.n)
+        self.mean, self.n = mean, n
+        return self
+
+    @classmethod
+    def from_frame(cls, df, features, target):
+        return cls(features, target).update(df)
+
+    @classmethod
+    def from_chunks(cls, chunks, features, target):
+        """Accumulate from any iterable of DataFrames, e.g. pd.read_csv(..., chunksize=...)."""
+        stats = cls(features, target)
+        for chunk in chunks:
+            stats.update(chunk)
+        return stats
+
+    # --- Raw moments (for callers that want the textbook form) ---
+    def gram(self):
+        """Return (XᵀX, Xᵀy, yᵀy) over the intercept-augmented design [1, X]."""
+        p = len(self.features)
+        raw = self.comoment + self.n * np.outer(self.mean, self.mean)
+        xtx = np.empty((p + 1, p + 1))
+        xtx[0, 0] = self.n
+        xtx[0, 1:] = xtx[1:, 0] = self.n * self.mean[:p]
+        xtx[1:, 1:] = raw[:p, :p]
+        xty = np.concatenate([[self.n * self.mean[p]], raw[:p, p]])
+        return xtx, xty, raw[p, p]
+
+    # --- Closed-form solutions ---
+    def _index(self, features):
+        features = self.features if features is None else list(features)
+        missing = [f for f in features if f not in self.features]
+        if missing:
+            raise KeyError(f"Features not tracked by these stats: {missing}")
+        return features, [self.features.index(f) for f in features]
+
+    def solve(self, features=None):
+        """
+        Fit OLS with an intercept on `features` (any subset of the tracked ones; all by default).
+        Returns a dict with coefficients, intercept, standard errors, in-sample R² and MSE.
+        """
+        features, idx = self._index(features)
+        t = len(self.features)
+        sxx = self.comoment[np.ix_(idx, idx)]
+        sxy = self.comoment[idx, t]
+        syy = self.comoment[t, t]
+        xbar = self.mean[idx]
+
+        sxx_inv = np.linalg.pinv(sxx)
+        coef = sxx_inv @ sxy
+        intercept = self.mean[t] - xbar @ coef
+
+        sse = max(syy - coef @ sxy, 0.0)
+        dof = self.n - len(features) - 1
+        sigma2 = sse / dof if dof > 0 else np.nan
+        std_err = np.sqrt(np.clip(np.diag(sxx_inv), 0, None) * sigma2)
+        intercept_se = np.sqrt(sigma2 * (1 / self.n + xbar @ sxx_inv @ xbar))
+
+        return {
+            'features': features,
+            'coef': coef,
+            'intercept': intercept,
+            'std_err': std_err,
+            'intercept_std_err': intercept_se,
+            'r2': 1 - sse / syy if syy > 0 else np.nan,
+            'mse': sse / self.n,
+            'sigma2': sigma2,
+            'n': self.n,
+            'xbar': xbar,
+            'sxx_inv': sxx_inv,
+        }
+
+    def score(self, fit):
+        """
+        R² and MSE of a fitted model (output of solve, possibly from other stats) on the rows
+        summarised by these stats, without touching the rows themselves.
+        """
+        features, idx = self._index(fit['features'])
+        t = len(self.features)
+        coef = fit['coef']
+        sxx = self.comoment[np.ix_(idx, idx)]
+        sxy = self.comoment[idx, t]
+        syy = self.comoment[t, t]
+        resid_mean = self.mean[t] - fit['intercept'] - self.mean[idx] @ coef
+        sse = max(syy - 2 * coef @ sxy + coef @ sxx @ coef, 0.0) + self.n * resid_mean ** 2
+        return {
+            'r2': 1 - sse / syy if syy > 0 else np.nan,
+            'mse': sse / self.n,
+        }
+
+    def confidence_band(self, fit, X, level=0.95):
+        """
+        Analytic confidence band for the mean prediction at the rows of X:
+        ŷ ± t·σ·sqrt(1/n + (x - x̄)ᵀ Sxx⁻¹ (x - x̄)). Returns (y_hat, lower, upper).
+        """
+        from scipy import stats as sps  # deferred: only the plots need the t quantile
+
+        X = np.asarray(X, dtype=float).reshape(-1, len(fit['features']))
+        y_hat = X @ fit['coef'] + fit['intercept']
+        d = X - fit['xbar']
+        leverage = 1 / fit['n'] + np.einsum('ij,jk,ik->i', d, fit['sxx_inv'], d)
+        t = sps.t.ppf(0.5 + level / 2, fit['n'] - len(fit['features']) - 1)
+        half = t * np.sqrt(fit['sigma2'] * leverage)
+        return y_hat, y_hat - half, y_hat + half
+
+    def copy(self):
+        return RegressionStats(self.features, self.target).merge(self)
+
+    def corr(self, feature):
+        """Pearson correlation between one feature and the target."""
+        i, t = self.features.index(feature), len(self.features)
+        return self.comoment[i, t] / np.sqrt(self.comoment[i, i] * self.comoment[t, t])
+
+    def predict(self, X, fit):
+        X = X[fit['features']] if isinstance(X, pd.DataFrame) else X
+        return np.asarray(X, dtype=float) @ fit['coef'] + fit['intercept']
@@ -0,0 +1,272 @@
+"""
+Low-latency credit-risk scoring for single applicants.
+
+The Random Forest and Gradient Boosting models trained by compare_models are
+exported into flat NumPy node arrays, with all trees of an ensemble
+concatenated. Scoring advances every tree one level at a time in a single
+vectorised step, with no pandas and no sklearn input validation. One record
+and a small batch go through the same code. Leaves loop onto themselves, so
+trees that finish early simply stay put until all have finished.
+Probabilities match the sklearn models' predict_proba.
+
+    python risk_scoring.py Banking.csv --output risk_scorer.npz --repeat 5000
+
+The SVM is not exported: an RBF kernel over its support vectors is a different
+kind of model, and it is not the one used for origination decisions.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from credit_risk_modelling import RISK_FEATURES
+
+COMPILABLE = ("Random Forest", "Gradient Boosting")
+
+
+class CompiledEnsemble:
+    """
+    Tree ensemble as flat arrays, all trees concatenated: per node the split
+    feature, threshold, left child (the right child is always left + 1), where
+    missing values go, and the leaf value; plus the root node of each tree.
+    Score = link(base + sum of the leaf values reached).
+    """
+    FIELDS = ('feature', 'threshold', 'left', 'missing_left', 'value', 'roots')
+    CHECK_EVERY = 8  # levels walked between "all trees at a leaf?" checks
+
+    def __init__(self, feature, threshold, left, missing_left, value, roots, depth, base=0.0, link='mean'):
+        self.feature, self.threshold, self.left = feature, threshold, left
+        self.missing_left, self.value = missing_left, value
+        self.roots, self.depth = roots, int(depth)
+        self.base, self.link = float(base), link
+
+    @classmethod
+    def from_trees(cls, trees, leaf_value, base=0.0, link='mean'):
+        """Concatenate sklearn `tree_` objects; leaf_value(tree_) gives each node's output."""
+        feature, threshold, left, missing_left, value, roots = [], [], [], [], [], []
+        offset, depth = 0, 0
+        for tree in trees:
+            # Renumber breadth-first so that siblings are adjacent (right = left + 1)
+            order, new_id, new_left = [0], {0: 0}, {}
+            for node in order:
+                if tree.children_left[node] >= 0:
+                    new_left[node] = len(order)
+                    for child in (tree.children_left[node], tree.children_right[node]):
+                        new_id[child] = len(order)
+                        order.append(child)
+            order = np.asarray(order)
+            is_leaf = tree.children_left[order] < 0
+            own = np.arange(len(order)) + offset
+            children = np.array([new_left.get(node, 0) for node in order]) + offset
+            missing = getattr(tree, 'missing_go_to_left', np.ones(tree.node_count, dtype=bool))
+
+            feature.append(np.where(is_leaf, 0, tree.feature[order]))
+            # Leaves loop onto themselves: +inf threshold and NaNs sent left keep them in place
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold[order]))
+            left.append(np.where(is_leaf, own, children))
+            missing_left.append(np.where(is_leaf, True, missing[order].astype(bool)))
+            value.append(leaf_value(tree)[order])
+            roots.append(offset)
+            offset += len(order)
+            depth = max(depth, tree.max_depth)
+        return cls(np.concatenate(feature).astype(np.intp), np.concatenate(threshold),
+                   np.concatenate(left).astype(np.intp), np.concatenate(missing_left),
+                   np.concatenate(value), np.asarray(roots, dtype=np.intp), depth, base, link)
+
+    def predict_proba(self, X):
+        """Class-1 probability for one record (1-D, RISK_FEATURES order) or a batch (2-D)."""
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        single = X.ndim == 1
+        X = np.atleast_2d(X)
+        flat = X.ravel()
+        has_missing = np.isnan(flat).any()
+
+        # One entry per (record, tree), all advanced one level per step
+        nodes = np.tile(self.roots, len(X))
+        offsets = 0 if single else np.repeat(np.arange(len(X)) * X.shape[1], len(self.roots))
+        for level in range(self.depth):
+            x = flat[offsets + self.feature[nodes]]
+            go_right = x > self.threshold[nodes]
+            if has_missing:
+                go_right |= np.isnan(x) & ~self.missing_left[nodes]
+            nodes = self.left[nodes] + go_right
+            if level % self.CHECK_EVERY == self.CHECK_EVERY - 1 and (self.left[nodes] == nodes).all():
+                break
+        total = self.value[nodes].reshape(len(X), len(self.roots)).sum(axis=1)
+        if single:
+            total = total[0]
+        if self.link == 'mean':
+            return total / len(self.roots)
+        return 1.0 / (1.0 + np.exp(-(self.base + total)))
+
+    def to_arrays(self, prefix):
+        meta = np.array([self.depth, self.base, 0.0 if self.link == 'mean' else 1.0])
+        return {f"{prefix}/{name}": getattr(self, name) for name in self.FIELDS} | {f"{prefix}/meta": meta}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        depth, base, link = arrays[f"{prefix}/meta"]
+        parts = [arrays[f"{prefix}/{name}"] for name in cls.FIELDS]
+        return cls(*parts, depth=depth, base=base, link='mean' if link == 0.0 else 'logit')
+
+
+def compile_model(model):
+    """CompiledEnsemble for a fitted binary RandomForestClassifier or GradientBoostingClassifier."""
+    from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+
+    if isinstance(model, RandomForestClassifier):
+        def leaf_proba(tree):
+            counts = tree.value[:, 0, :]
+            return counts[:, 1] / counts.sum(axis=1)
+        return CompiledEnsemble.from_trees([est.tree_ for est in model.estimators_], leaf_proba)
+
+    if isinstance(model, GradientBoostingClassifier):
+        if model.n_trees_per_iteration_ != 1:
+            raise ValueError("Only binary gradient boosting models can be compiled")
+        base = 0.0
+        if model.init_ != 'zero':
+            # Same clipping as sklearn's binomial loss when turning the prior into log-odds
+            eps = np.finfo(np.float32).eps
+            prior = np.clip(model.init_.predict_proba(np.zeros((1, model.n_features_in_)))[0, 1], eps, 1 - eps)
+            base = np.log(prior / (1 - prior))
+        rate = model.learning_rate
+        return CompiledEnsemble.from_trees([est.tree_ for est in model.estimators_[:, 0]],
+                                           lambda tree: rate * tree.value[:, 0, 0], base=base, link='logit')
+
+    raise TypeError(f"Cannot compile {type(model).__name__}; supported: {', '.join(COMPILABLE)}")
+
+
+class RiskScorer:
+    """
+    Compiled credit models plus the feature transformer, for scoring applicants
+    given as plain dicts of raw customer fields.
+    """
+
+    def __init__(self, models, transformer=None):
+        self.models = models
+        self.transformer = transformer
+
+    @classmethod
+    def from_results(cls, results, transformer=None, names=COMPILABLE):
+        """Export the tree models from a compare_models() result."""
+        return cls({name: compile_model(results['models'][name]) for name in names}, transformer)
+
+    def features(self, record):
+        """RISK_FEATURES vector for one raw customer record."""
+        if self.transformer is not None:
+            record = self.transformer.transform_record(record)
+        return np.array([float(record[col]) for col in RISK_FEATURES])
+
+    def score(self, record, model="Gradient Boosting"):
+        """High-risk probability for one raw customer record."""
+        return float(self.models[model].predict_proba(self.features(record)))
+
+    def score_batch(self, X, model="Gradient Boosting"):
+        """High-risk probabilities for an (n, len(RISK_FEATURES)) array of engineered features."""
+        return self.models[model].predict_proba(X)
+
+    # --- Persistence (plain arrays, no pickle) ---
+    def save(self, path):
+        arrays = {}
+        for name, compiled in self.models.items():
+            arrays |= compiled.to_arrays(name)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path, transformer=None):
+        with np.load(path, allow_pickle=False) as arrays:
+            arrays = dict(arrays)
+        names = sorted({key.split('/', 1)[0] for key in arrays})
+        return cls({name: CompiledEnsemble.from_arrays(arrays, name) for name in names}, transformer)
+
+
+def _percentiles(seconds):
+    us = np.asarray(seconds) * 1e6
+    return {'p50_us': float(np.percentile(us, 50)), 'p99_us': float(np.percentile(us, 99)),
+            'mean_us': float(us.mean())}
+
+
+def latency_benchmark(scorer, results, X, repeat=2000, batch_size=32):
+    """
+    Per-call latency of compiled scoring vs sklearn predict_proba on a one-row
+    DataFrame (single record), and per batch of `batch_size` rows.
+    `X` is a DataFrame of RISK_FEATURES rows to draw from.
+    Returns a list of dicts with p50/p99/mean microseconds.
+    """
+    values = X[RISK_FEATURES].to_numpy(dtype=float)
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(X), repeat)
+    rows = []
+    for name, compiled in scorer.models.items():
+        model = results['models'][name]
+        cases = {
+            ('single', 'compiled'): lambda i: compiled.predict_proba(values[i]),
+            ('single', 'sklearn'): lambda i: model.predict_proba(X.iloc[[i]][RISK_FEATURES]),
+            (f'batch {batch_size}', 'compiled'): lambda i: compiled.predict_proba(values[i:i + batch_size]),
+            (f'batch {batch_size}', 'sklearn'): lambda i: model.predict_proba(X.iloc[i:i + batch_size][RISK_FEATURES]),
+        }
+        for (mode, path), call in cases.items():
+            call(0)  # warm-up
+            times = []
+            for i in picks if mode == 'single' else np.minimum(picks, max(len(X) - batch_size, 0)):
+                start = time.perf_counter()
+                call(i)
+                times.append(time.perf_counter() - start)
+            rows.append({'model': name, 'mode': mode, 'path': path, **_percentiles(times)})
+    return rows
+
+
+def max_difference(scorer, results, X):
+    """Largest absolute gap between compiled and sklearn probabilities over the rows of X."""
+    values = X[RISK_FEATURES].to_numpy(dtype=float)
+    return {name: float(np.abs(compiled.predict_proba(values)
+                               - results['models'][name].predict_proba(X[RISK_FEATURES])[:, 1]).max())
+            for name, compiled in scorer.models.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the credit models for low-latency scoring and time them")
+    parser.add_argument("input", help="Banking CSV to train on")
+    parser.add_argument("--output", default="risk_scorer.npz")
+    parser.add_argument("--max-rows", type=int, default=20000, help="training sample (SVC scales super-linearly)")
+    parser.add_argument("--repeat", type=int, default=2000, help="timed calls per model and mode")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--as-of", default=None)
+    parser.add_argument("--json", default=None, help="also write the latency figures to this file")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    from banking_analysis import load_and_preprocess, optimize_dtypes
+    from outlier_detection import cap_columns
+    from feature_engineering import FeatureTransformer
+    from credit_risk_modelling import compare_models
+
+    df, _ = optimize_dtypes(load_and_preprocess(args.input))
+    if len(df) > args.max_rows:
+        df = df.sample(n=args.max_rows, random_state=42)
+    cols = df.select_dtypes(include="number").columns[:4].tolist()
+    capped, _ = cap_columns(df, cols, copy=False)
+    transformer = FeatureTransformer(as_of=args.as_of).fit(capped)
+    df_fe = transformer.transform(capped, copy=False)
+
+    print(f"Training on {len(df_fe):,} rows ...")
+    results = compare_models(df_fe)
+    scorer = RiskScorer.from_results(results, transformer)
+    scorer.save(args.output)
+    print(f"Saved compiled models to {args.output}")
+    for name, gap in max_difference(scorer, results, df_fe).items():
+        print(f"  {name}: {len(scorer.models[name].roots)} trees, depth {scorer.models[name].depth}, "
+              f"max |compiled - sklearn| = {gap:.2e}")
+
+    figures = pd.DataFrame(latency_benchmark(scorer, results, df_fe, args.repeat, args.batch_size))
+    print("\nLatency (microseconds per call):")
+    print(figures.to_string(index=False, float_format=lambda v: f"{v:,.1f}"))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'rows': len(df_fe), 'repeat': args.repeat, 'latency': figures.to_dict('records')}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Stratified sampling for interactive exploration of large uploads.
+
+Strata are Nationality x Loyalty Classification x (Risk Weighting above the
+median), with proportional allocation. Every stratum keeps at least
+`min_per_stratum` rows, so small groups still get a variance estimate.
+Estimates from the sample are design-weighted (weight N_h / n_h). Their
+95% confidence intervals use the stratified variance with the
+finite-population correction. Means over a domain (e.g. one nationality)
+use the linearised ratio estimator, which reduces to the plain stratified
+formula when the domain is the whole population.
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+STRATA = ['Nationality', 'Loyalty Classification']
+RISK_COL = 'Risk Weighting'
+DEFAULT_SAMPLE_ROWS = 50_000
+AUTO_SAMPLE_ROWS = 200_000  # uploads larger than this open in sampling mode
+
+
+def strata_codes(df):
+    """Integer stratum per row and the stratum labels (uses whichever strata columns are present)."""
+    keys = [df[col].astype(str) for col in STRATA if col in df.columns]
+    if RISK_COL in df.columns:
+        risk = df[RISK_COL]
+        keys.append(pd.Series(np.where(risk > risk.median(), 'high risk', 'low risk'), index=df.index))
+    if not keys:
+        return np.zeros(len(df), dtype=np.intp), pd.DataFrame(index=[0])
+    names = [key.name or 'Risk' for key in keys]
+    codes, labels = pd.MultiIndex.from_arrays(keys).factorize()
+    return codes, pd.DataFrame(list(labels), columns=names)
+
+
+class StratifiedSample:
+    """Row index of a stratified sample plus the design needed for weighted estimates."""
+
+    def __init__(self, df, rows=DEFAULT_SAMPLE_ROWS, seed=42, min_per_stratum=2):
+        codes, labels = strata_codes(df)
+        population = np.bincount(codes, minlength=len(labels))
+        allocated = np.round(population * min(1.0, rows / max(len(df), 1))).astype(np.int64)
+        allocated = np.minimum(np.maximum(allocated, min_per_stratum), population)
+
+        # Shuffle within strata, then keep the first n_h rows of each
+        rng = np.random.default_rng(seed)
+        order = np.lexsort((rng.random(len(df)), codes))
+        sorted_codes = codes[order]
+        starts = np.searchsorted(sorted_codes, np.arange(len(labels)))
+        rank = np.arange(len(df)) - starts[sorted_codes]
+        taken = np.sort(order[rank < allocated[sorted_codes]])
+
+        self.index = df.index[taken]
+        self.codes = codes[taken]
+        self.population_rows = len(df)
+        self.population = population
+        self.sampled = allocated
+        self.weights = population[self.codes] / allocated[self.codes]
+        self.strata = labels.assign(Population=population, Sampled=allocated)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def fraction(self):
+        return len(self) / max(self.population_rows, 1)
+
+    def take(self, frame):
+        """The sampled rows of `frame` (any frame indexed like the one sampled)."""
+        return frame.loc[self.index]
+
+    # --- Estimates ---
+    def domain_mean(self, values, mask=None, level=0.95):
+        """
+        Weighted mean of `values` (aligned with the sample) over the rows in `mask`
+        (all rows by default). Returns (estimate, standard error, lower, upper).
+        """
+        y = np.asarray(values, dtype=float)
+        d = np.ones(len(y), dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        d = d & ~np.isnan(y)
+        w = self.weights
+        size = (w * d).sum()
+        if size == 0:
+            return np.nan, np.nan, np.nan, np.nan
+        estimate = (w * d * np.where(d, y, 0.0)).sum() / size
+
+        # Linearised variable z_i = d_i (y_i - estimate) / N_d, variance summed over strata
+        z = np.where(d, y - estimate, 0.0) / size
+        n_h = np.bincount(self.codes, minlength=len(self.sampled)).astype(float)
+        sums = np.bincount(self.codes, weights=z, minlength=len(n_h))
+        squares = np.bincount(self.codes, weights=z * z, minlength=len(n_h))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            s2 = np.where(n_h > 1, (squares - sums ** 2 / n_h) / (n_h - 1), 0.0)
+            fpc = 1 - n_h / self.population
+            variance = np.nansum(self.population ** 2 * fpc * s2 / n_h)
+        se = np.sqrt(max(variance, 0.0))
+        z_crit = NormalDist().inv_cdf(0.5 + level / 2)
+        return estimate, se, estimate - z_crit * se, estimate + z_crit * se
+
+    def mean_table(self, frame, columns=None, level=0.95):
+        """Weighted means with confidence intervals for the numeric columns of a sampled frame."""
+        frame = frame.loc[self.index]
+        columns = columns or frame.select_dtypes(include='number').columns.tolist()
+        rows = {col: self.domain_mean(frame[col].to_numpy(dtype=float), level=level) for col in columns}
+        return pd.DataFrame.from_dict(rows, orient='index', columns=['Estimate', 'Std. Error', 'Lower', 'Upper'])
+
+    def group_mean_table(self, frame, by, value, level=0.95):
+        """Weighted mean of `value` per group of the `by` columns, with confidence intervals."""
+        frame = frame.loc[self.index]
+        values = frame[value].to_numpy(dtype=float)
+        rows = {}
+        for key, positions in frame.groupby(by, observed=True).indices.items():
+            mask = np.zeros(len(frame), dtype=bool)
+            mask[positions] = True
+            rows[key] = self.domain_mean(values, mask, level)
+        table = pd.DataFrame.from_dict(rows, orient='index', columns=['Estimate', 'Std. Error', 'Lower', 'Upper'])
+        table.index = pd.MultiIndex.from_tuples(table.index, names=by) if len(by) > 1 else table.index.rename(by[0])
+        return table.sort_index(key=lambda s: s.astype(str))
+
+    def share_table(self, labels, level=0.95):
+        """Estimated population share of each label (e.g. segment), aligned with the sample, with CIs."""
+        labels = np.asarray(labels)
+        rows = {label: self.domain_mean(labels == label, level=level) for label in np.unique(labels)}
+        return pd.DataFrame.from_dict(rows, orient='index', columns=['Share', 'Std. Error', 'Lower', 'Upper'])
+
+    def correlation_interval(self, frame, a, b, level=0.95):
+        """Correlation of two columns in the sample with a Fisher-z interval (sample size n)."""
+        frame = frame.loc[self.index, [a, b]].dropna()
+        r = frame[a].corr(frame[b])
+        n = len(frame)
+        if n < 4 or not np.isfinite(r) or abs(r) >= 1:
+            return r, np.nan, np.nan
+        z_crit = NormalDist().inv_cdf(0.5 + level / 2)
+        z, half = np.arctanh(r), z_crit / np.sqrt(n - 3)
+        return r, np.tanh(z - half), np.tanh(z + half)
+
+
+def build_sample(df, rows):
+    """StratifiedSample of `rows` rows, or None when sampling is off or would keep every row."""
+    if not rows or rows >= len(df):
+        return None
+    return StratifiedSample(df, rows)
@@ -0,0 +1,403 @@
+"""
+Local HTTP scoring service for the credit-risk models.
+
+Serves the compiled models written by risk_scoring.py. Concurrent
+single-customer requests are queued, and one worker thread scores them in
+small batches. A batch closes when it reaches --max-batch requests or when
+--window-ms has passed since its first request. Each batch is one vectorised
+predict_proba call per model.
+
+The model file is re-read when it changes on disk. A file that fails to load
+leaves the current models in service.
+
+With --feature-store, a request can name a customer by Client ID instead of
+sending its fields. The features are then a point lookup in the stored
+partition for --as-of (latest by default), and nothing is recomputed.
+
+    python risk_scoring.py Banking.csv --output risk_scorer.npz
+    python scoring_service.py serve risk_scorer.npz --port 8502
+    python scoring_service.py serve risk_scorer.npz --feature-store feature_store --as-of 2024-06-30
+    python scoring_service.py load-test Banking.csv --url http://127.0.0.1:8502 --concurrency 16
+
+Endpoints:
+    POST /score     {"customer": {raw fields}}, {"features": {RISK_FEATURES}} or {"client_id": "IND81288"},
+                    optional "model"
+    GET  /metrics   request/batch counts, throughput, latency percentiles, model version
+    GET  /health
+    POST /reload    re-read the model file now
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import numpy as np
+
+from credit_risk_modelling import RISK_FEATURES
+from risk_scoring import RiskScorer
+
+DEFAULT_MODEL = "Gradient Boosting"
+LATENCY_WINDOW = 10000  # most recent requests kept for the percentiles
+THROUGHPUT_SECONDS = 60
+
+
+class ModelStore:
+    """The current RiskScorer, reloaded when the file's mtime changes (checked at most every `check_seconds`)."""
+
+    def __init__(self, path, check_seconds=1.0):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.lock = threading.Lock()
+        self.scorer, self.mtime, self.version, self.loaded_at = None, None, 0, None
+        self.last_error = None
+        self._checked = 0.0
+        self.reload(force=True)
+        if self.scorer is None:
+            raise RuntimeError(f"Could not load {path}: {self.last_error}")
+
+    def reload(self, force=False):
+        """Load the file if it changed (or always with force=True). Returns True when new models were swapped in."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if not force and mtime == self.mtime:
+                return False
+            scorer = RiskScorer.load(self.path)
+        except Exception as exc:  # keep serving the previous models
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            return False
+        with self.lock:
+            self.scorer, self.mtime = scorer, mtime
+            self.version += 1
+            self.loaded_at = datetime.now().isoformat(timespec='seconds')
+            self.last_error = None
+        return True
+
+    def current(self):
+        now = time.monotonic()
+        if now - self._checked >= self.check_seconds:
+            self._checked = now
+            self.reload()
+        return self.scorer, self.version
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = self.errors = self.batches = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.completed = deque()  # completion times inside the throughput window
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+
+    def record_batch(self, size):
+        with self.lock:
+            self.batches += 1
+            self.batch_sizes.append(size)
+
+    def record_request(self, seconds, ok=True):
+        now = time.monotonic()
+        with self.lock:
+            self.requests += 1
+            self.errors += not ok
+            self.latencies.append(seconds)
+            self.completed.append(now)
+            while self.completed and self.completed[0] < now - THROUGHPUT_SECONDS:
+                self.completed.popleft()
+
+    def snapshot(self):
+        with self.lock:
+            latencies = np.asarray(self.latencies) * 1000
+            window = min(THROUGHPUT_SECONDS, time.monotonic() - self.started) or 1.0
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'batches': self.batches,
+                'mean_batch_size': float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+                'throughput_rps': len(self.completed) / window,
+                'latency_ms': {
+                    'p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+                    'p99': float(np.percentile(latencies, 99)) if len(latencies) else None,
+                    'max': float(latencies.max()) if len(latencies) else None,
+                },
+                'uptime_s': time.monotonic() - self.started,
+            }
+
+
+class _Pending:
+    __slots__ = ('model', 'features', 'done', 'result', 'error', 'batch_size', 'version')
+
+    def __init__(self, model, features):
+        self.model, self.features = model, features
+        self.done = threading.Event()
+        self.result = self.error = self.batch_size = self.version = None
+
+
+class MicroBatcher:
+    """Collects submitted feature vectors and scores them together on one worker thread."""
+
+    def __init__(self, store, metrics, max_batch=64, window_ms=2.0):
+        self.store, self.metrics = store, metrics
+        self.max_batch, self.window = max_batch, window_ms / 1000
+        self.queue = queue.Queue()
+        threading.Thread(target=self._run, name='micro-batcher', daemon=True).start()
+
+    def submit(self, model, features, timeout=10.0):
+        """Block until the batch holding this request is scored; returns (probability, batch size, model version)."""
+        item = _Pending(model, features)
+        self.queue.put(item)
+        if not item.done.wait(timeout):
+            raise TimeoutError("scoring timed out")
+        if item.error is not None:
+            raise item.error
+        return item.result, item.batch_size, item.version
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._score(batch)
+
+    def _score(self, batch):
+        scorer, version = self.store.current()
+        by_model = {}
+        for item in batch:
+            by_model.setdefault(item.model, []).append(item)
+        for model, items in by_model.items():
+            try:
+                if model not in scorer.models:
+                    raise KeyError(f"unknown model {model!r}; available: {', '.join(scorer.models)}")
+                probs = scorer.models[model].predict_proba(np.vstack([item.features for item in items]))
+                for item, prob in zip(items, probs):
+                    item.result = float(prob)
+            except Exception as exc:
+                for item in items:
+                    item.error = exc
+            for item in items:
+                item.batch_size, item.version = len(batch), version
+                item.done.set()
+        self.metrics.record_batch(len(batch))
+
+
+class ScoringService:
+    """Request parsing (raw customer -> RISK_FEATURES) in front of the batcher."""
+
+    def __init__(self, store, max_batch=64, window_ms=2.0, as_of=None, feature_store=None):
+        self.store = store
+        self.feature_store = feature_store
+        self.metrics = Metrics()
+        self.batcher = MicroBatcher(store, self.metrics, max_batch, window_ms)
+        self.as_of = as_of
+        self._transformers = {}
+
+    def _transformer(self, columns):
+        # The feature plan depends only on which raw fields are present
+        key = frozenset(columns)
+        if key not in self._transformers:
+            import pandas as pd
+            from feature_engineering import FeatureTransformer
+            self._transformers[key] = FeatureTransformer(as_of=self.as_of).fit(pd.DataFrame(columns=list(columns)))
+        return self._transformers[key]
+
+    def features(self, payload):
+        if 'features' in payload:
+            values = payload['features']
+            if isinstance(values, dict):
+                values = [values[col] for col in RISK_FEATURES]
+        elif 'customer' in payload:
+            record = self._transformer(payload['customer']).transform_record(payload['customer'])
+            values = [record[col] for col in RISK_FEATURES]
+        elif 'client_id' in payload:
+            if self.feature_store is None:
+                raise ValueError("'client_id' requests need a service started with a feature store")
+            found = self.feature_store.lookup([payload['client_id']], self.as_of, columns=RISK_FEATURES)
+            if found.empty:
+                raise KeyError(f"unknown client {payload['client_id']!r}")
+            values = found[RISK_FEATURES].to_numpy()[0]
+        else:
+            raise ValueError("expected a 'customer', 'features' or 'client_id' object")
+        values = np.asarray(values, dtype=float)
+        if values.shape != (len(RISK_FEATURES),):
+            raise ValueError(f"expected {len(RISK_FEATURES)} features: {', '.join(RISK_FEATURES)}")
+        return values
+
+    def score(self, payload):
+        model = payload.get('model', DEFAULT_MODEL)
+        prob, batch_size, version = self.batcher.submit(model, self.features(payload))
+        return {'probability': prob, 'high_risk': prob >= 0.5, 'model': model,
+                'model_version': version, 'batch_size': batch_size}
+
+    def status(self):
+        return {**self.metrics.snapshot(),
+                'model': {'path': self.store.path, 'version': self.store.version, 'loaded_at': self.store.loaded_at,
+                          'models': list(self.store.scorer.models), 'last_reload_error': self.store.last_error},
+                'batching': {'max_batch': self.batcher.max_batch, 'window_ms': self.batcher.window * 1000}}
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, so clients reuse connections
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send(200, service.status())
+            elif self.path == '/health':
+                self._send(200, {'status': 'ok', 'model_version': service.store.version})
+            else:
+                self._send(404, {'error': f"no route {self.path}"})
+
+        def do_POST(self):
+            start = time.perf_counter()
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path == '/reload':
+                self._send(200, {'reloaded': service.store.reload(force=True), 'version': service.store.version,
+                                 'error': service.store.last_error})
+                return
+            if self.path != '/score':
+                self._send(404, {'error': f"no route {self.path}"})
+                return
+            try:
+                result = service.score(json.loads(body))
+            except (ValueError, KeyError, TypeError) as exc:
+                service.metrics.record_request(time.perf_counter() - start, ok=False)
+                self._send(400, {'error': str(exc)})
+                return
+            except Exception as exc:
+                service.metrics.record_request(time.perf_counter() - start, ok=False)
+                self._send(500, {'error': f"{type(exc).__name__}: {exc}"})
+                return
+            service.metrics.record_request(time.perf_counter() - start)
+            self._send(200, result)
+
+        def log_message(self, format, *args):
+            pass  # one line per request would dominate the service's own cost
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default of 5 resets connections under a burst of clients
+
+
+def serve(model_path, host='127.0.0.1', port=8502, max_batch=64, window_ms=2.0, as_of=None, check_seconds=1.0,
+          feature_store=None):
+    """`feature_store` is a FeatureStore root directory (enables 'client_id' requests)."""
+    if feature_store is not None:
+        from feature_store import FeatureStore
+        feature_store = FeatureStore(feature_store)
+    service = ScoringService(ModelStore(model_path, check_seconds), max_batch, window_ms, as_of, feature_store)
+    server = _Server((host, port), make_handler(service))
+    print(f"Scoring {', '.join(service.store.scorer.models)} from {model_path} on http://{host}:{port} "
+          f"(batches of up to {max_batch}, {window_ms} ms window)")
+    return server, service
+
+
+# --- Loopback load test ---
+def load_test(url, records, concurrency=16, requests=2000, model=DEFAULT_MODEL):
+    """
+    Send `requests` single-customer POSTs from `concurrency` threads (one
+    keep-alive connection each) and return client-side latency/throughput
+    figures plus the server's /metrics.
+    """
+    parsed = urlparse(url)
+    per_thread = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    def worker(index):
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+        latencies, batch_sizes = [], []
+        for n in range(per_thread[index]):
+            payload = json.dumps({'customer': records[(index * 7919 + n) % len(records)], 'model': model})
+            start = time.perf_counter()
+            conn.request('POST', '/score', payload, {'Content-Type': 'application/json'})
+            response = json.loads(conn.getresponse().read())
+            latencies.append(time.perf_counter() - start)
+            batch_sizes.append(response['batch_size'])
+        conn.close()
+        return latencies, batch_sizes
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        parts = list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies = np.concatenate([p[0] for p in parts]) * 1000
+    batch_sizes = np.concatenate([p[1] for p in parts])
+
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+    conn.request('GET', '/metrics')
+    server = json.loads(conn.getresponse().read())
+    conn.close()
+    return {
+        'requests': int(len(latencies)),
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'throughput_rps': len(latencies) / elapsed,
+        'latency_ms': {'p50': float(np.percentile(latencies, 50)), 'p99': float(np.percentile(latencies, 99))},
+        'mean_batch_size': float(batch_sizes.mean()),
+        'server': server,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-batching HTTP scoring service for the credit-risk models")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("serve", help="serve a model file written by risk_scoring.py")
+    run.add_argument("model_path")
+    run.add_argument("--host", default="127.0.0.1")
+    run.add_argument("--port", type=int, default=8502)
+    run.add_argument("--max-batch", type=int, default=64)
+    run.add_argument("--window-ms", type=float, default=2.0, help="how long a batch waits for more requests")
+    run.add_argument("--as-of", default=None,
+                     help="tenure reference date for raw customer records (and the feature store partition)")
+    run.add_argument("--feature-store", default=None, help="feature store root for 'client_id' requests")
+    run.add_argument("--check-seconds", type=float, default=1.0, help="how often to look for a new model file")
+    test = sub.add_parser("load-test", help="fire concurrent single-customer requests at a running service")
+    test.add_argument("input", help="Banking CSV to draw customer records from")
+    test.add_argument("--url", default="http://127.0.0.1:8502")
+    test.add_argument("--concurrency", type=int, default=16)
+    test.add_argument("--requests", type=int, default=2000)
+    test.add_argument("--model", default=DEFAULT_MODEL)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server, _ = serve(args.model_path, args.host, args.port, args.max_batch, args.window_ms,
+                          args.as_of, args.check_seconds, args.feature_store)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        import pandas as pd
+        records = json.loads(pd.read_csv(args.input, nrows=5000).to_json(orient='records'))
+        result = load_test(args.url, records, args.concurrency, args.requests, args.model)
+        server = result.pop('server')
+        print(json.dumps(result, indent=2))
+        print(f"Server: {server['requests']:,} requests in {server['batches']:,} batches "
+              f"(mean {server['mean_batch_size']:.1f}), p50 {server['latency_ms']['p50']:.2f} ms, "
+              f"p99 {server['latency_ms']['p99']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Small dependency-aware stage scheduler.
+
+A Stage declares the named values it reads and the names it produces. The
+StageGraph runs every stage whose inputs are available on a thread pool, so
+independent analyses overlap and end-to-end time approaches the critical path.
+
+Outputs are memoised by a key derived from the stage name and the keys of its
+inputs (source values are keyed by content), so a rerun only executes stages
+downstream of a source that actually changed. With a CacheManager as the
+cache, outputs are stored under that key alone, so graphs in different
+sessions reuse each other's results for the same inputs.
+
+Each run records per stage the wall time, the growth of the process peak RSS
+and the MB of frame data the stage added on top of its inputs (`run_report`).
+"""
+import contextlib
+import contextvars
+import hashlib
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+
+from instrumentation import span, owned_mb, max_rss_mb
+
+
+class Stage:
+    def __init__(self, name, func, inputs=(), outputs=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        outputs = name if outputs is None else outputs
+        self.outputs = (outputs,) if isinstance(outputs, str) else tuple(outputs)
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+
+def fingerprint(value):
+    """Content key for a source value (bytes, frames, file-like objects or anything picklable)."""
+    h = hashlib.sha1()
+    if hasattr(value, 'getvalue'):
+        value = value.getvalue()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        h.update(value)
+    elif isinstance(value, pd.DataFrame):
+        h.update(pickle.dumps(list(value.columns)))
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    else:
+        h.update(pickle.dumps(value))
+    return h.hexdigest()
+
+
+class StageGraph:
+    """
+    Runs stages concurrently once their inputs are ready.
+    `cache` (any dict, e.g. st.session_state) keeps memoised outputs between runs,
+    the latest per stage; a CacheManager (lookup/store by key) keeps them for every key.
+    `executor` is a thread pool shared with other graphs; by default each run
+    gets its own pool of `max_workers` threads.
+    """
+
+    def __init__(self, stages, cache=None, max_workers=4, executor=None):
+        self.stages = {s.name: s for s in stages}
+        self.cache = {} if cache is None else cache
+        self.max_workers = max_workers
+        self.executor = executor
+        self.producer = {}
+        for s in stages:
+            for out in s.outputs:
+                if out in self.producer:
+                    raise ValueError(f"Output {out!r} is produced by both {self.producer[out]!r} and {s.name!r}")
+                self.producer[out] = s.name
+        self.last_run = {}
+        self.last_keys = {}
+
+    def _cached(self, name, key):
+        """Memoised outputs of stage `name` under `key`, or None."""
+        if hasattr(self.cache, 'lookup'):
+            return self.cache.lookup(key)
+        cached = self.cache.get(name)
+        return cached[1] if cached is not None and cached[0] == key else None
+
+    def _memoise(self, name, key, outputs, seconds):
+        if hasattr(self.cache, 'store'):
+            self.cache.store(key, outputs, seconds)
+        else:
+            self.cache[name] = (key, outputs)
+
+    def _required(self, targets, sources):
+        """Stages needed to produce `targets` from `sources`, in no particular order."""
+        needed, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name in sources:
+                continue
+            if name not in self.producer:
+                raise KeyError(f"Nothing produces {name!r}")
+            stage = self.producer[name]
+            if stage not in needed:
+                needed.add(stage)
+                stack.extend(self.stages[stage].inputs)
+        return needed
+
+    def run(self, sources, targets=None):
+        """
+        Compute `targets` (all stage outputs by default) from the `sources` dict.
+        Returns a dict with the sources and every computed output; their memo keys
+        are left in `last_keys`.
+        """
+        if targets is None:
+            targets = list(self.producer)
+        needed = self._required(targets, sources)
+
+        values = dict(sources)
+        keys = {name: fingerprint(value) for name, value in sources.items()}
+        done = set()
+        self.last_run = {}
+
+        def stage_key(stage):
+            h = hashlib.sha1(stage.name.encode())
+            for inp in stage.inputs:
+                h.update(keys[inp].encode())
+            return h.hexdigest()
+
+        def finish(stage, key, outputs):
+            for out, value in zip(stage.outputs, outputs):
+                values[out] = value
+                keys[out] = hashlib.sha1(f"{key}:{out}".encode()).hexdigest()
+            done.add(stage.name)
+
+        def execute(stage, args):
+            start, rss = time.perf_counter(), max_rss_mb()
+            with span(f"Stage: {stage.name}", category='stage'):
+                result = stage.func(*args)
+            outputs = result if len(stage.outputs) > 1 else (result,)
+            frames = [a for a in args if isinstance(a, pd.DataFrame)]
+            stats = {
+                'cached': False,
+                'seconds': time.perf_counter() - start,
+                # process-wide: overlapping stages share the same high-water mark
+                'peak_rss_delta_mb': max_rss_mb() - rss,
+                'new_mb': sum(owned_mb(out, frames) for out in outputs if isinstance(out, pd.DataFrame)),
+            }
+            return outputs, stats
+
+        # A shared executor is left running for the other graphs
+        pool_context = (ThreadPoolExecutor(max_workers=self.max_workers) if self.executor is None
+                        else contextlib.nullcontext(self.executor))
+        with pool_context as pool:
+            running = {}
+            while len(done) < len(needed):
+                progressed = False
+                for name in needed - done - {s.name for s in running.values()}:
+                    stage = self.stages[name]
+                    if not all(inp in keys for inp in stage.inputs):
+                        continue
+                    progressed = True
+                    key = stage_key(stage)
+                    cached = self._cached(name, key)
+                    if cached is not None:
+                        finish(stage, key, cached)
+                        self.last_run[name] = {'cached': True, 'seconds': 0.0,
+                                               'peak_rss_delta_mb': 0.0, 'new_mb': 0.0}
+                        continue
+                    args = [values[inp] for inp in stage.inputs]
+                    # copy_context keeps the active tracer (and other context vars) in the worker
+                    future = pool.submit(contextvars.copy_context().run, execute, stage, args)
+                    running[future] = stage
+
+                if not running:
+                    if not progressed:
+                        raise ValueError(f"Dependency cycle among stages: {sorted(needed - done)}")
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    try:
+                        outputs, stats = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+                    key = stage_key(stage)
+                    self._memoise(stage.name, key, outputs, stats['seconds'])
+                    finish(stage, key, outputs)
+                    self.last_run[stage.name] = stats
+        self.last_keys = keys
+        return values
+
+    def run_report(self):
+        """Per-stage table for the last run: cached flag, seconds, peak RSS growth and MB added."""
+        return pd.DataFrame.from_dict(self.last_run, orient='index').rename_axis('stage')
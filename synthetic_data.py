@@ -0,0 +1,117 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+# Schema and category levels of the original Banking.csv export
+COLUMNS = [
+    'Client ID', 'Name', 'Age', 'Location ID', 'Joined Bank', 'Banking Contact',
+    'Nationality', 'Occupation', 'Fee Structure', 'Loyalty Classification',
+    'Estimated Income', 'Superannuation Savings', 'Amount of Credit Cards',
+    'Credit Card Balance', 'Bank Loans', 'Bank Deposits', 'Checking Accounts',
+    'Saving Accounts', 'Foreign Currency Account', 'Business Lending',
+    'Properties Owned', 'Risk Weighting', 'BRId', 'GenderId', 'IAId',
+]
+NATIONALITIES = ['European', 'Asian', 'American', 'Australian', 'African']
+NATIONALITY_P = [0.45, 0.23, 0.13, 0.10, 0.09]
+LOYALTY = ['Jade', 'Silver', 'Gold', 'Platinum']
+LOYALTY_P = [0.38, 0.26, 0.22, 0.14]
+FEE_STRUCTURES = ['High', 'Mid', 'Low']
+FEE_P = [0.52, 0.31, 0.17]
+OCCUPATIONS = ['Accountant', 'Engineer', 'Nurse', 'Teacher', 'Developer', 'Analyst',
+               'Manager', 'Sales Associate', 'Technician', 'Consultant', 'Pharmacist', 'Designer']
+CONTACTS = ['Anthony Torres', 'Jonathan Hawkins', 'Jerry Shaw', 'Joe Carroll', 'Kimberly Ray',
+            'Stephen Murray', 'Lisa Sanchez', 'Victor Dean', 'Nicholas Ward', 'Ernest Knight']
+FIRST_NAMES = ['Raymond', 'Julia', 'Kevin', 'Doris', 'Ernest', 'Gloria', 'Alan', 'Lois',
+               'Clarence', 'Shirley', 'Joe', 'Peter', 'Mary', 'Albert', 'Ruth', 'Frank']
+LAST_NAMES = ['Mills', 'Spencer', 'Robertson', 'Alvarez', 'Lopez', 'Ward', 'Garza', 'Turner',
+              'Stewart', 'Hart', 'Black', 'Hudson', 'Carter', 'Ellis', 'Payne', 'Ross']
+DATE_FORMATS = ["%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d"]
+DATE_FORMAT_P = [0.70, 0.10, 0.10, 0.10]
+
+CHUNK_ROWS = 250_000
+
+
+def _chunk(rng, start, n):
+    """Generate rows [start, start + n) with the given generator."""
+    ids = np.arange(start, start + n)
+    age = np.clip(np.round(rng.normal(51, 19, n)), 17, 85).astype(int)
+
+    # Join dates over ~20 years, written in a mix of day-first and year-first formats
+    joined = pd.Series(pd.Timestamp('2000-01-01') + pd.to_timedelta(rng.integers(0, 7700, n), unit='D'))
+    fmt = rng.choice(len(DATE_FORMATS), n, p=DATE_FORMAT_P)
+    joined_str = np.empty(n, dtype=object)
+    for i, f in enumerate(DATE_FORMATS):
+        mask = fmt == i
+        joined_str[mask] = joined[mask].dt.strftime(f).to_numpy()
+
+    income = np.round(rng.lognormal(np.log(150000) + 0.004 * (age - 50), 0.55, n), 2)
+    wealth = rng.lognormal(0, 0.8, n)
+    deposits = np.round(income * 4.2 * wealth * rng.lognormal(0, 0.35, n), 2)
+    loans = np.round(income * rng.lognormal(1.2, 0.9, n), 2)
+    card_balance = np.round(rng.gamma(2.0, 1600, n), 2)
+    properties = rng.choice(4, n, p=[0.25, 0.35, 0.25, 0.15])
+
+    # Risk rises with leverage; coarse 1-5 score like the source data
+    dti = (loans + card_balance) / income
+    risk = np.clip(np.round(1 + 1.1 * np.log1p(dti) + rng.normal(0, 0.7, n)), 1, 5).astype(int)
+
+    return pd.DataFrame({
+        'Client ID': pd.Series(ids).map('IND{:07d}'.format).to_numpy(),
+        'Name': np.char.add(np.char.add(rng.choice(FIRST_NAMES, n), ' '), rng.choice(LAST_NAMES, n)).astype(object),
+        'Age': age,
+        'Location ID': rng.integers(1, 35000, n),
+        'Joined Bank': joined_str,
+        'Banking Contact': rng.choice(CONTACTS, n).astype(object),
+        'Nationality': rng.choice(NATIONALITIES, n, p=NATIONALITY_P).astype(object),
+        'Occupation': rng.choice(OCCUPATIONS, n).astype(object),
+        'Fee Structure': rng.choice(FEE_STRUCTURES, n, p=FEE_P).astype(object),
+        'Loyalty Classification': rng.choice(LOYALTY, n, p=LOYALTY_P).astype(object),
+        'Estimated Income': income,
+        'Superannuation Savings': np.round(income * rng.lognormal(-0.6, 0.6, n), 2),
+        'Amount of Credit Cards': rng.choice([1, 2, 3], n, p=[0.55, 0.3, 0.15]),
+        'Credit Card Balance': card_balance,
+        'Bank Loans': loans,
+        'Bank Deposits': deposits,
+        'Checking Accounts': np.round(deposits * rng.uniform(0.1, 0.5, n), 2),
+        'Saving Accounts': np.round(deposits * rng.uniform(0.05, 0.4, n), 2),
+        'Foreign Currency Account': np.round(deposits * rng.uniform(0.0, 0.1, n), 2),
+        'Business Lending': np.round(rng.lognormal(np.log(850000), 0.6, n), 2),
+        'Properties Owned': properties,
+        'Risk Weighting': risk,
+        'BRId': rng.integers(1, 5, n),
+        'GenderId': rng.integers(1, 3, n),
+        'IAId': rng.integers(1, 23, n),
+    }, columns=COLUMNS)
+
+
+def iter_banking_chunks(n_rows, seed=42):
+    """
+    Yield the synthetic dataset in fixed-size chunks. Each chunk has its own
+    generator spawned from `seed`, so the output is identical however it is consumed.
+    """
+    n_chunks = -(-n_rows // CHUNK_ROWS)
+    for i, child in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        start = i * CHUNK_ROWS
+        yield _chunk(np.random.default_rng(child), start, min(CHUNK_ROWS, n_rows - start))
+
+
+def generate_banking_data(n_rows, seed=42):
+    """Return a synthetic Banking.csv-shaped DataFrame with `n_rows` rows."""
+    return pd.concat(iter_banking_chunks(n_rows, seed), ignore_index=True)
+
+
+def write_banking_csv(path, n_rows, seed=42):
+    """Stream a synthetic dataset to CSV without holding it all in memory."""
+    for i, chunk in enumerate(iter_banking_chunks(n_rows, seed)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Banking.csv")
+    parser.add_argument("rows", type=int, help="number of customers")
+    parser.add_argument("--output", default="Banking.csv")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    write_banking_csv(args.output, args.rows, args.seed)
+    print(f"Wrote {args.rows:,} rows to {args.output}")
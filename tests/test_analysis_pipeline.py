@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis_pipeline import build_pipeline
+from banking_analysis import load_and_preprocess, optimize_dtypes
+from feature_engineering import feature_engineering
+from outlier_detection import cap_columns
+from synthetic_data import write_banking_csv
+
+AS_OF = '2024-06-30'
+
+
+@pytest.fixture(scope='module')
+def path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'banking.csv'
+    write_banking_csv(path, 2000, seed=19)
+    return str(path)
+
+
+def sources(path, cols):
+    return {'source': path, 'outlier_cols': cols, 'as_of': AS_OF}
+
+
+def test_pipeline_features_match_direct_calls(path):
+    cols = ['Age', 'Bank Deposits']
+    values = build_pipeline().run(sources(path, cols), targets=['features'])
+    raw, _ = optimize_dtypes(load_and_preprocess(path))
+    capped, bounds = cap_columns(raw, cols)
+    df_fe, new_features, insights = feature_engineering(capped, as_of=AS_OF)
+    pd.testing.assert_frame_equal(values['features'], df_fe)
+    assert values['new_features'] == new_features and values['feature_insights'] == insights
+    assert values['outlier_bounds'] == bounds
+
+
+def test_changing_outlier_columns_reuses_the_load(path):
+    graph = build_pipeline()
+    graph.run(sources(path, ['Age']), targets=['features'])
+    graph.run(sources(path, ['Age', 'Bank Deposits']), targets=['features'])
+    report = graph.run_report()['cached']
+    assert report['load'] and not report['outliers'] and not report['features']
+
+
+def test_stages_share_untouched_columns(path):
+    graph = build_pipeline()
+    values = graph.run(sources(path, ['Age']), targets=['features'])
+    raw, capped, features = values['raw'], values['capped'], values['features']
+    for frame in (capped, features):
+        assert np.shares_memory(frame['Bank Deposits'].to_numpy(), raw['Bank Deposits'].to_numpy())
+    assert not np.shares_memory(capped['Age'].to_numpy(), raw['Age'].to_numpy())
+    report = graph.run_report()
+    assert report.loc['outliers', 'new_mb'] < report.loc['features', 'new_mb'] < raw.memory_usage().sum() / 1024 ** 2
+
+
+def test_exploration_tabs_run_as_stages_on_the_loaded_frame(path):
+    from bivariate_analysis import bivariate_blocks
+    from geographical_analysis import geo_summary
+    from univariate_analysis import univariate_sections
+    views = ['univariate', 'bivariate', 'geographical']
+    graph = build_pipeline()
+    values = graph.run({**sources(path, ['Age']), 'sample_rows': None}, targets=views + ['features'])
+    raw = values['raw']
+    assert [[b[2] for b in blocks] for _, blocks in values['univariate']] == \
+        [[b[2] for b in blocks] for _, blocks in univariate_sections(raw)]
+    assert {k: [b[2] for b in v] for k, v in values['bivariate'].items()} == \
+        {k: [b[2] for b in v] for k, v in bivariate_blocks(raw).items()}
+    assert values['geographical'] == geo_summary(raw)
+    # They do not wait for capping or features: another capping choice reuses them
+    graph.run({**sources(path, ['Bank Deposits']), 'sample_rows': None}, targets=views + ['features'])
+    assert all(graph.last_run[view]['cached'] for view in views)
+    assert not graph.last_run['features']['cached']
+    # With a sample they describe the sample
+    sampled = graph.run({**sources(path, ['Age']), 'sample_rows': 500}, targets=views)
+    assert sampled['geographical'] == geo_summary(sampled['sample'].take(raw))
@@ -0,0 +1,52 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import arrow_backend
+from analysis_pipeline import build_pipeline
+from banking_analysis import load_and_preprocess
+from synthetic_data import write_banking_csv
+
+pytest.importorskip('pyarrow')
+
+AS_OF = '2024-06-30'
+
+
+@pytest.fixture(scope='module')
+def path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'banking.csv'
+    write_banking_csv(path, 3000, seed=23)
+    return str(path)
+
+
+def test_load_matches_pandas(path):
+    want = load_and_preprocess(path)
+    pd.testing.assert_frame_equal(arrow_backend.load_and_preprocess(path), want)
+    with open(path, 'rb') as f:
+        pd.testing.assert_frame_equal(arrow_backend.load_and_preprocess(io.BytesIO(f.read())), want)
+
+
+def test_null_free_numeric_columns_are_zero_copy(path):
+    table = arrow_backend.read_csv(path)
+    buffer = table.column('Bank Deposits').chunk(0).buffers()[1]
+    df = arrow_backend.to_pandas(table)
+    assert np.shares_memory(df['Bank Deposits'].to_numpy(), np.frombuffer(buffer, dtype=np.float64))
+
+
+def test_group_means_match_pandas(path):
+    df = load_and_preprocess(path)
+    df['Loyalty Classification'] = df['Loyalty Classification'].astype('category')
+    by, values = ['Nationality', 'Loyalty Classification'], ['Bank Deposits', 'Age']
+    want = df.groupby(by, observed=True)[values].mean().reset_index()
+    pd.testing.assert_frame_equal(arrow_backend.group_means(df, by, values), want, rtol=1e-12)
+
+
+def test_arrow_pipeline_frames_match_pandas(path):
+    source = {'source': path, 'outlier_cols': ['Age', 'Bank Deposits'], 'as_of': AS_OF, 'sample_rows': None}
+    want = build_pipeline().run(source, targets=['features'])
+    got = build_pipeline(backend='arrow', threads=3).run(source, targets=['features'])
+    for name in ('raw', 'capped', 'features'):
+        pd.testing.assert_frame_equal(got[name], want[name], check_exact=True)
+    assert got['feature_insights'] == want['feature_insights']
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import numpy as np
+
+from background_jobs import JobManager
+from cache_manager import CacheManager
+
+
+def wait(job, timeout=10):
+    deadline = time.time() + timeout
+    while not job.future.done() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def total(values, progress):
+    progress(1, 1, 'summing')
+    return {'sum': values.sum(), 'copy': values.copy()}
+
+
+def slow(release, progress):
+    while not release.wait(0.01):
+        progress(0, 1, 'waiting')
+    return 'finished'
+
+
+def fail(progress):
+    raise RuntimeError('boom')
+
+
+def test_same_key_returns_the_running_job():
+    jobs = JobManager()
+    release = threading.Event()
+    job = jobs.submit(('slow',), "Slow", slow, release)
+    assert jobs.submit(('slow',), "Slow", slow, threading.Event()) is job
+    release.set()
+    wait(job)
+    assert job.status == 'done' and job.result() == 'finished'
+    assert job.fraction() == 0.0 and job.elapsed() > 0
+
+
+def test_progress_and_result():
+    job = JobManager().submit(('total',), "Total", total, np.arange(10))
+    wait(job)
+    assert job.status == 'done'
+    assert (job.done_steps, job.total_steps, job.step) == (1, 1, 'summing')
+    assert job.result()['sum'] == 45
+
+
+def test_cancel_takes_effect_at_the_next_progress_call():
+    job = JobManager().submit(('slow',), "Slow", slow, threading.Event())
+    while job.status == 'queued':
+        time.sleep(0.01)
+    job.cancel()
+    wait(job)
+    assert job.status == 'cancelled'
+
+
+def test_failed_job_restarts_only_on_request():
+    jobs = JobManager()
+    job = jobs.submit(('fail',), "Fail", fail)
+    wait(job)
+    assert job.status == 'failed'
+    assert jobs.submit(('fail',), "Fail", fail) is job
+    again = jobs.submit(('fail',), "Fail", fail, restart=True)
+    assert again is not job
+    wait(again)
+
+
+def test_finished_job_keeps_result_in_cache_only(tmp_path):
+    cache = CacheManager(budget_mb=100, spill_dir=str(tmp_path))
+    jobs = JobManager(cache=cache)
+    values = np.arange(1000)
+    job = jobs.submit(('total',), "Total", total, values)
+    wait(job)
+    assert job.status == 'done'
+    assert job.args is None and job.func is None
+    assert job.future.result() is None
+    assert job.result()['sum'] == values.sum()
+    assert ('job', ('total',)) in cache
+
+
+def test_evicted_result_is_recomputed(tmp_path):
+    cache = CacheManager(budget_mb=100, spill_dir=str(tmp_path))
+    jobs = JobManager(cache=cache)
+    job = jobs.submit(('total',), "Total", total, np.arange(10))
+    wait(job)
+    cache.clear()
+    assert job.status == 'evicted'
+    again = jobs.submit(('total',), "Total", total, np.arange(10))
+    assert again is not job
+    wait(again)
+    assert again.result()['sum'] == 45
+
+
+def test_cancel_waits_for_the_last_subscriber():
+    release = threading.Event()
+    job = JobManager().submit(('slow',), "Slow", slow, release)
+    job.subscribe('alice')
+    job.subscribe('bob')
+    assert not job.withdraw('alice')
+    assert job.status in ('queued', 'running')
+    assert job.withdraw('bob')
+    wait(job)
+    assert job.status == 'cancelled'
+
+
+def test_closed_sessions_do_not_keep_a_job_alive():
+    release = threading.Event()
+    job = JobManager().submit(('slow',), "Slow", slow, release)
+    job.subscribe('alice')
+    job.subscribe('closed')
+    assert job.withdraw('alice', active=lambda session: session != 'closed')
+    wait(job)
+    assert job.status == 'cancelled'
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from banking_analysis import load_and_preprocess, optimize_dtypes, summarize_data
+from feature_engineering import feature_engineering
+from outlier_detection import cap_columns
+from synthetic_data import write_banking_csv
+
+
+@pytest.fixture(scope='module')
+def frames(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'banking.csv'
+    write_banking_csv(path, 3000, seed=41)
+    df = load_and_preprocess(str(path))
+    return (df,) + optimize_dtypes(df)
+
+
+def test_values_survive_the_downcast(frames):
+    df, optimized, _ = frames
+    for col in df.columns:
+        if isinstance(optimized[col].dtype, pd.CategoricalDtype):
+            assert list(optimized[col].cat.categories) == list(pd.unique(df[col].dropna()))
+        np.testing.assert_array_equal(optimized[col].to_numpy(dtype=object), df[col].to_numpy(dtype=object))
+    assert optimized['Joined Bank'].dtype == object
+    assert all(optimized[col].dtype == np.float64 for col in df.select_dtypes('float').columns)
+    assert optimized['Age'].dtype.itemsize < df['Age'].dtype.itemsize
+
+
+def test_memory_report(frames):
+    df, optimized, report = frames
+    assert report.loc['Total', 'Before MB'] == pytest.approx(df.memory_usage(deep=True, index=False).sum() / 1024 ** 2)
+    assert report.loc['Total', 'After MB'] < report.loc['Total', 'Before MB'] / 2
+    assert report.loc['Loyalty Classification', 'After dtype'] == 'category'
+
+
+def test_downstream_results_are_unchanged(frames):
+    df, optimized, _ = frames
+    pd.testing.assert_frame_equal(summarize_data(optimized)['description'], summarize_data(df)['description'])
+    cols = ['Age', 'Bank Deposits']
+    (capped, bounds), (capped_opt, bounds_opt) = cap_columns(df, cols), cap_columns(optimized, cols)
+    assert bounds_opt == bounds
+    features, new_features, insights = feature_engineering(capped)
+    features_opt, _, insights_opt = feature_engineering(capped_opt)
+    assert insights_opt == insights
+    for name in new_features:
+        np.testing.assert_array_equal(features_opt[name].to_numpy(dtype=object), features[name].to_numpy(dtype=object))
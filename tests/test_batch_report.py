@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import batch_report
+from banking_analysis import load_and_preprocess
+from outlier_detection import iqr_bounds
+from synthetic_data import write_banking_csv
+
+
+def test_batch_report_imports_without_streamlit():
+    code = "import sys, batch_report; sys.exit('streamlit' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code],
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).returncode == 0
+
+
+@pytest.fixture(scope='module')
+def report(tmp_path_factory):
+    root = tmp_path_factory.mktemp('report')
+    path = str(write_banking_csv(root / 'banking.csv', 600, seed=1))
+    output = str(root / 'out')
+    batch_report.main([path, '--output-dir', output, '--trace'])
+    with open(os.path.join(output, 'summary.json')) as f:
+        return path, output, json.load(f)
+
+
+def test_manifest_lists_written_files(report):
+    _, output, summary = report
+    assert summary['shape'][0] == 600
+    assert summary['figures'] and summary['tables']
+    for path in summary['figures'] + summary['tables']:
+        assert os.path.getsize(os.path.join(output, path)) > 0
+    for name in ('insights.md', 'trace.json', 'trace.chrome.json'):
+        assert os.path.exists(os.path.join(output, name))
+    assert set(summary['model_auc']) == {"SVM", "Random Forest", "Gradient Boosting"}
+
+
+def test_tables_match_the_compute_functions(report):
+    path, output, summary = report
+    df = load_and_preprocess(path)
+    bounds = pd.read_csv(os.path.join(output, 'tables', 'outlier_bounds.csv'), index_col=0)
+    assert list(bounds.index) == summary['outlier_columns'] == df.select_dtypes('number').columns[:4].tolist()
+    for col in bounds.index:
+        assert tuple(bounds.loc[col]) == pytest.approx(iqr_bounds(df[col]))
+    auc = pd.read_csv(os.path.join(output, 'tables', 'model_auc.csv'), index_col=0).iloc[:, 0]
+    assert auc.to_dict() == pytest.approx(summary['model_auc'])
@@ -0,0 +1,22 @@
+import json
+
+import benchmark_pipeline
+
+
+def test_benchmark_writes_a_result_per_stage(tmp_path):
+    output = tmp_path / 'results.json'
+    benchmark_pipeline.main(['--sizes', '400', '--stages', 'load', 'outliers', '--repeat', '2',
+                             '--data-dir', str(tmp_path / 'data'), '--output', str(output)])
+    report = json.loads(output.read_text())
+    assert [(r['dataset_rows'], r['stage']) for r in report['results']] == [(400, 'load'), (400, 'outliers')]
+    for result in report['results']:
+        assert len(result['wall_s']) == 2 and result['peak_alloc_mb'] > 0
+        assert result['rows_processed'] == 400
+    benchmark_pipeline.compare(output, output)
+
+
+def test_start_up_imports_stay_light():
+    heavy = {result['target']: set(result['heavy_loaded']) for result in benchmark_pipeline.measure_imports(1)}
+    assert heavy['app_shell'] == heavy['banking_analysis'] == set()
+    assert not heavy['analysis_pipeline'] & {'seaborn', 'scipy', 'sklearn', 'sklearn_extra'}
+    assert not heavy['app_analysis'] & {'sklearn', 'sklearn_extra'}
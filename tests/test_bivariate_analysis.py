@@ -0,0 +1,48 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import gaussian_kde
+
+from bivariate_analysis import binned_kde, tier_violin_stats, violin_figure
+
+
+def test_binned_kde_matches_exact_kde():
+    values = np.random.default_rng(0).normal(100_000, 20_000, 5000)
+    support, density = binned_kde(values)
+    np.testing.assert_allclose(density, gaussian_kde(values)(support), atol=density.max() * 1e-3)
+
+
+def test_tier_stats_follow_category_order_with_exact_quartiles():
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({
+        'Loyalty Classification': pd.Categorical(rng.choice(['Gold', 'Jade'], 500),
+                                                 categories=['Platinum', 'Jade', 'Gold']),
+        'Estimated Income': rng.normal(90_000, 15_000, 500),
+    })
+    stats = tier_violin_stats(df)
+    assert [s['tier'] for s in stats] == ['Jade', 'Gold']
+    for s in stats:
+        values = df.loc[df['Loyalty Classification'] == s['tier'], 'Estimated Income']
+        assert s['n'] == len(values)
+        np.testing.assert_allclose(s['quartiles'], np.percentile(values, [25, 50, 75]))
+        assert s['support'].min() < values.min() and s['support'].max() > values.max()
+
+
+@pytest.mark.parametrize('n', [2, 3, 5])
+def test_binned_kde_small_sample_stays_on_grid(n):
+    values = np.arange(n) * 1000.0 + 50_000
+    support, density = binned_kde(values, gridsize=512)
+    assert support.shape == density.shape == (512,)
+    np.testing.assert_allclose(density, gaussian_kde(values)(support), rtol=0.05, atol=density.max() * 1e-3)
+
+
+def test_violin_figure_with_tiny_tier():
+    df = pd.DataFrame({
+        'Loyalty Classification': ['Jade'] * 200 + ['Gold'] * 2 + ['Silver'] * 3,
+        'Estimated Income': np.r_[np.random.default_rng(1).normal(90_000, 15_000, 200),
+                                  [40_000, 250_000], [60_000, 61_000, 150_000]],
+    })
+    stats = tier_violin_stats(df)
+    assert [s['n'] for s in stats] == [200, 2, 3]
+    plt.close(violin_figure(stats))
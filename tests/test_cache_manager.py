@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache_manager import CacheManager, MB, size_of
+from stage_scheduler import Stage, StageGraph
+
+
+def frame(rows=50_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'income': rng.normal(80_000, 20_000, rows),
+        'age': rng.integers(18, 90, rows).astype('int8'),
+        'tier': pd.Categorical(rng.choice(['Gold', 'Jade', 'Silver'], rows)),
+        'name': rng.choice(['a', 'b', None], rows).astype(object),
+        'joined': pd.date_range('2000-01-01', periods=rows, freq='h'),
+    })
+
+
+def mapped(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+@pytest.fixture
+def cache(tmp_path):
+    def make(budget_mb, policy='lru', **kwargs):
+        return CacheManager(budget_mb=budget_mb, policy=policy, spill_dir=str(tmp_path), **kwargs)
+    return make
+
+
+def test_size_of_counts_shared_objects_once():
+    df = frame(1000)
+    assert size_of(df) == df.memory_usage(deep=True).sum()
+    assert size_of({'a': df, 'b': [df, df]}) == size_of(df) + 2
+
+
+def test_lru_spills_frames_and_serves_them_mapped(cache):
+    df = frame()
+    manager = cache(budget_mb=size_of(df) * 1.5 / MB)
+    manager.store('first', (df, {'lower': 1.0}))
+    manager.store('second', (frame(seed=1),))
+    assert manager.resident <= manager.budget
+    assert manager.counts['spilled'] == 1
+
+    value = manager.lookup('first')
+    pd.testing.assert_frame_equal(value[0], df)
+    assert value[1] == {'lower': 1.0}
+    assert mapped(value[0]['income'].to_numpy())
+
+
+def test_nested_results_are_spilled(cache):
+    labels = {'kmeans': np.arange(100_000), 'gmm': np.arange(100_000) % 4}
+    result = {'labels': labels, 'pca': np.ones((100_000, 2)), 'profiles': {'kmeans': frame(10)}}
+    manager = cache(budget_mb=0.5)
+    manager.store('segments', result)
+    assert manager.resident < 0.5 * MB
+    back = manager.lookup('segments')
+    np.testing.assert_array_equal(back['labels']['gmm'], labels['gmm'])
+    pd.testing.assert_frame_equal(back['profiles']['kmeans'], result['profiles']['kmeans'])
+
+
+def test_unspillable_entries_are_dropped(cache):
+    manager = cache(budget_mb=1)
+    manager.store('report', 'x' * (2 * MB))
+    assert 'report' not in manager
+    assert manager.counts['dropped'] == 1
+
+
+@pytest.mark.parametrize('policy, spilled', [('lru', 'small_slow'), ('cost', 'big_fast')])
+def test_eviction_policies(cache, policy, spilled):
+    big, small = frame(), frame(5_000)
+    manager = cache(budget_mb=(size_of(big) + 1.5 * size_of(small)) / MB, policy=policy)
+    manager.store('small_slow', (small,), seconds=10.0)
+    manager.store('big_fast', (big,), seconds=0.1)
+    manager.store('other', (frame(5_000, seed=2),), seconds=1.0)
+    report = manager.report().set_index('entry')
+    assert list(report.index[report['spilled_mb'] > 0]) == [spilled]
+
+
+def test_disk_budget(cache):
+    manager = cache(budget_mb=0.1, disk_budget_mb=size_of(frame()) * 1.5 / MB)
+    for i in range(3):
+        manager.store(i, (frame(seed=i),))
+    assert manager.on_disk <= manager.disk_budget
+    assert 0 not in manager and 2 in manager
+
+
+def test_stage_graphs_share_results_by_content(cache):
+    manager = cache(budget_mb=100)
+    calls = []
+
+    def double(x):
+        calls.append(x)
+        return x * 2
+    for _ in range(2):  # two sessions
+        graph = StageGraph([Stage('doubled', double, inputs=['x'])], cache=manager)
+        assert graph.run({'x': 21})['doubled'] == 42
+    assert calls == [21]
+    assert graph.last_run['doubled']['cached']
+
+
+def test_spill_does_not_block_lookups(cache, monkeypatch):
+    import threading
+    import time
+    import cache_manager
+
+    writing, release = threading.Event(), threading.Event()
+    spill_frame = cache_manager._spill_frame
+
+    def slow_spill_frame(frame, path):
+        writing.set()
+        release.wait(5)
+        spill_frame(frame, path)
+    monkeypatch.setattr(cache_manager, '_spill_frame', slow_spill_frame)
+
+    df = frame()
+    manager = cache(budget_mb=size_of(df) * 1.5 / MB)
+    manager.store('first', (df,))
+    manager.store('small', {'x': 1})
+    writer = threading.Thread(target=manager.store, args=('second', (frame(seed=1),)))
+    writer.start()
+    assert writing.wait(5)
+    start = time.perf_counter()
+    assert manager.lookup('small') == {'x': 1}
+    assert manager.lookup('first')[0] is df  # still in memory while it is written out
+    assert time.perf_counter() - start < 1
+    release.set()
+    writer.join()
+    assert manager.report().set_index('entry').loc['first', 'spilled_mb'] > 0
+    pd.testing.assert_frame_equal(manager.lookup('first')[0], df)
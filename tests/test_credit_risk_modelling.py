@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from banking_analysis import load_and_preprocess
+from credit_risk_modelling import RISK_FEATURES, compare_models_cv, cv_summary, model_insights, risk_target
+from feature_engineering import feature_engineering
+from synthetic_data import write_banking_csv
+
+
+@pytest.fixture(scope='module')
+def data(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'banking.csv'
+    write_banking_csv(path, 600, seed=13)
+    return feature_engineering(load_and_preprocess(str(path)), as_of='2024-06-30')[0]
+
+
+@pytest.fixture(scope='module')
+def results(data):
+    calls = []
+    out = compare_models_cv(data, n_splits=3, n_jobs=1,
+                            progress=lambda done, total, label: calls.append((done, total)))
+    out['calls'] = calls
+    return out
+
+
+def test_fold_aucs_match_a_plain_cross_validation(data, results):
+    X = data[RISK_FEATURES].to_numpy(dtype=float)
+    y = risk_target(data).to_numpy()
+    expected = []
+    for train_idx, test_idx in StratifiedKFold(3, shuffle=True, random_state=42).split(X, y):
+        mean, std = X[train_idx].mean(axis=0), X[train_idx].std(axis=0)
+        model = RandomForestClassifier(random_state=42).fit((X[train_idx] - mean) / std, y[train_idx])
+        probs = model.predict_proba((X[test_idx] - mean) / std)[:, 1]
+        expected.append(roc_auc_score(y[test_idx], probs))
+    np.testing.assert_allclose(results['fold_aucs']['Random Forest'], expected)
+    assert results['aucs']['Random Forest'] == pytest.approx(np.mean(expected))
+    assert results['pooled_aucs']['SVM'] == pytest.approx(roc_auc_score(y, results['probs']['SVM']))
+
+
+def test_progress_and_summary(results):
+    assert results['calls'][0] == (0, 9) and results['calls'][-1] == (9, 9)
+    summary = cv_summary(results)
+    assert list(summary.columns) == ['Mean AUC', 'Std', 'Min', 'Max', 'Pooled OOF AUC']
+    assert summary['Mean AUC'].is_monotonic_decreasing
+    assert (summary['Min'] <= summary['Mean AUC']).all() and (summary['Mean AUC'] <= summary['Max']).all()
+
+
+def test_parallel_fits_match_serial(data, results):
+    parallel = compare_models_cv(data, n_splits=3, n_jobs=2)
+    np.testing.assert_allclose(parallel['fold_aucs'].to_numpy(), results['fold_aucs'].to_numpy())
+
+
+def test_insights_claim_better_than_random_only_when_true():
+    aucs = {"SVM": 0.52, "Random Forest": 0.55, "Gradient Boosting": 0.51}
+    versus = dict(model_insights(aucs)[0])["Versus Random"]
+    assert versus.startswith("All models scored above 0.5 AUC")
+    versus = dict(model_insights(aucs, {"SVM": 0.53, "Random Forest": 0.54, "Gradient Boosting": 0.486})[0])
+    assert versus["Versus Random"].startswith("Gradient Boosting did not score above 0.5 AUC")
+    versus = dict(model_insights({**aucs, "SVM": 0.49})[0])["Versus Random"]
+    assert versus.startswith("SVM did not")
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from sklearn.metrics import pairwise_distances, silhouette_samples, silhouette_score
+
+from distance_engine import BlockedKMedoids, DistanceEngine, pam, silhouette
+
+
+def brute_force_pam(X, n_clusters, max_iter=300):
+    """KMedoids(method='pam', init='heuristic') on the full distance matrix."""
+    D = pairwise_distances(X)
+    medoids = np.argpartition(D.sum(axis=1), n_clusters - 1)[:n_clusters]
+    for _ in range(max_iter):
+        current = D[:, medoids].min(axis=1).sum()
+        best, swap = current, None
+        for h in range(len(X)):
+            if h in medoids:
+                continue
+            for i in range(n_clusters):
+                trial = medoids.copy()
+                trial[i] = h
+                total = D[:, trial].min(axis=1).sum()
+                if total < best - 1e-9:
+                    best, swap = total, (h, i)
+        if swap is None:
+            break
+        medoids[swap[1]] = swap[0]
+    return medoids, np.argmin(D[:, medoids], axis=1), D[:, medoids].min(axis=1).sum()
+
+
+@pytest.fixture(scope='module')
+def X():
+    rng = np.random.default_rng(0)
+    centres = np.array([[0, 0], [6, 0], [0, 6], [6, 6]])
+    return np.vstack([rng.normal(c, 1.0, size=(40, 2)) for c in centres])
+
+
+def test_tiles_match_pairwise_distances(X):
+    engine = DistanceEngine(X, tile_rows=7, tile_cols=13)
+    np.testing.assert_allclose(engine.distances(slice(None), slice(None)), pairwise_distances(X),
+                               rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(engine.row_sums(), pairwise_distances(X).sum(axis=1), rtol=1e-5)
+
+
+@pytest.mark.parametrize('n_jobs', [1, 3])
+def test_pam_matches_brute_force(X, n_jobs):
+    want_medoids, want_labels, want_inertia = brute_force_pam(X, 4)
+    engine = DistanceEngine(X, n_jobs=n_jobs, tile_rows=16, tile_cols=50)
+    medoids, labels, inertia, _ = pam(engine, 4)
+    assert sorted(medoids) == sorted(want_medoids)
+    order = {m: i for i, m in enumerate(want_medoids)}
+    np.testing.assert_array_equal([order[m] for m in medoids[labels]], want_labels)
+    assert inertia == pytest.approx(want_inertia, rel=1e-5)
+
+
+def test_blocked_kmedoids_protocol(X):
+    model = BlockedKMedoids(n_clusters=4, memory_mb=1, n_jobs=2)
+    labels = model.fit_predict(X)
+    np.testing.assert_array_equal(model.predict(X), labels)
+    np.testing.assert_array_equal(model.cluster_centers_, X[model.medoid_indices_])
+    with pytest.raises(ValueError):
+        BlockedKMedoids(n_clusters=len(X) + 1).fit(X)
+
+
+def test_silhouette_matches_sklearn(X):
+    engine = DistanceEngine(X, tile_rows=9, tile_cols=31)
+    labels = np.random.default_rng(1).integers(0, 4, len(X))
+    assert silhouette(engine, labels) == pytest.approx(silhouette_score(X, labels), abs=1e-5)
+    singleton = np.where(np.arange(len(X)) == 5, 3, labels % 3)  # cluster 3 has one member
+    assert silhouette(engine, singleton) == pytest.approx(silhouette_score(X, singleton), abs=1e-5)
+
+
+def test_sampled_silhouette_measures_against_every_point(X):
+    engine = DistanceEngine(X, tile_rows=9, tile_cols=31)
+    labels = BlockedKMedoids(n_clusters=4).fit_predict(X)
+    rows = np.sort(np.random.default_rng(7).choice(len(X), 50, replace=False))
+    want = silhouette_samples(X, labels)[rows].mean()
+    assert silhouette(engine, labels, sample_size=50, random_state=7) == pytest.approx(want, abs=1e-5)
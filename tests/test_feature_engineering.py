@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from banking_analysis import load_and_preprocess, optimize_dtypes
+from feature_engineering import FeatureTransformer, feature_engineering, parse_date
+from synthetic_data import write_banking_csv
+
+AS_OF = '2024-06-30'
+BALANCES = ['Checking Accounts', 'Saving Accounts', 'Foreign Currency Account']
+PRODUCTS = BALANCES + ['Credit Card Balance', 'Bank Loans', 'Bank Deposits']
+
+
+def reference_features(df, as_of):
+    """The derived columns written out with plain pandas, one formula per feature."""
+    df = df.copy()
+    for col in BALANCES:
+        if col not in df.columns:
+            df[col] = 0
+    out = {
+        'Customer Tenure': ((pd.Timestamp(as_of) - df['Joined Bank'].apply(parse_date)).dt.days / 365).round(1),
+        'Total Relationship Balance': df[BALANCES].sum(axis=1),
+    }
+    if 'Estimated Income' in df.columns:
+        out['Debt-to-Income Ratio'] = ((df['Bank Loans'] + df['Credit Card Balance'])
+                                       / df['Estimated Income']).replace([np.inf, -np.inf], np.nan)
+    out['Deposit-to-Loan Ratio'] = df['Bank Deposits'] / df['Bank Loans'].replace(0, np.nan)
+    out['Wealth Indicator'] = (out['Total Relationship Balance'] + df['Superannuation Savings']
+                               + df['Properties Owned'] * 500000.0)
+    out['Product Concentration'] = (df[[col for col in PRODUCTS if col in df.columns]] > 0).sum(axis=1)
+    out['Age_x_Balance'] = df['Age'] * out['Total Relationship Balance']
+    out['Age Group'] = pd.cut(df['Age'], [0, 25, 40, 60, 75, np.inf],
+                              labels=['Gen Z', 'Millenial', 'Gen X', 'Baby Boomer', 'Silent Generation'])
+    if 'Estimated Income' in df.columns:
+        out['Income Group'] = pd.cut(df['Estimated Income'], [0, 200000, 300000, 400000, np.inf],
+                                     labels=['Low Net Worth', 'Medium Net Worth', 'High Net Worth',
+                                             'Premium Customers'])
+    return out
+
+
+@pytest.fixture(scope='module')
+def raw(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'banking.csv'
+    write_banking_csv(path, 2000, seed=5)
+    df = load_and_preprocess(str(path))
+    # Edge cases: zero loans and income, missing income, an unparseable date
+    df.loc[0, 'Bank Loans'] = 0
+    df.loc[1, 'Estimated Income'] = 0
+    df.loc[2, 'Estimated Income'] = np.nan
+    df.loc[3, 'Joined Bank'] = 'not a date'
+    return df
+
+
+def test_transformer_imports_without_streamlit():
+    code = "import sys, feature_engineering; sys.exit('streamlit' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code],
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).returncode == 0
+
+
+@pytest.mark.parametrize('variant', ['raw', 'optimized', 'missing columns'])
+def test_transform_matches_reference_formulas(raw, variant):
+    df = raw
+    if variant == 'optimized':
+        df, _ = optimize_dtypes(raw)
+    elif variant == 'missing columns':
+        df = raw.drop(columns=['Foreign Currency Account', 'Estimated Income'])
+    df_fe, new_features, _ = feature_engineering(df, as_of=AS_OF)
+    expected = reference_features(df, AS_OF)
+    assert set(expected) <= set(new_features)
+    for name, values in expected.items():
+        got = df_fe[name]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            assert list(got.astype(object)) == list(values.astype(object)), name
+        else:
+            np.testing.assert_array_equal(got.to_numpy(dtype=float), values.to_numpy(dtype=float), err_msg=name)
+    assert pd.isna(df_fe.loc[3, 'Customer Tenure'])
+
+
+def test_transformer_protocol(raw):
+    transformer = FeatureTransformer(as_of=AS_OF)
+    assert transformer.set_params(as_of='2020-01-01').get_params() == {'as_of': '2020-01-01'}
+    transformer.set_params(as_of=AS_OF).fit(raw)
+    names = list(transformer.get_feature_names_out())
+    assert names[:len(raw.columns)] == list(raw.columns)
+    pd.testing.assert_frame_equal(transformer.transform(raw), feature_engineering(raw, as_of=AS_OF)[0])
+    assert list(transformer.transform(raw.iloc[:10]).columns) == names
+
+
+def test_threaded_transform_matches_serial(raw):
+    serial, new_features, insights = feature_engineering(raw, as_of=AS_OF)
+    threaded, _, threaded_insights = feature_engineering(raw, as_of=AS_OF, n_jobs=3)
+    pd.testing.assert_frame_equal(threaded, serial)
+    assert threaded_insights == insights
+    assert set(new_features) <= set(serial.columns)
+
+
+def test_single_record_matches_frame(raw):
+    transformer = FeatureTransformer(as_of=AS_OF).fit(raw)
+    frame = transformer.transform(raw)
+    for i in (0, 1, 2, 3, 17, 1999):
+        record = transformer.transform_record(raw.iloc[i].to_dict())
+        for name in transformer.new_features_:
+            expected = frame[name].iloc[i]
+            if isinstance(expected, (float, np.floating)):
+                assert record[name] == pytest.approx(expected, nan_ok=True), name
+            else:
+                assert record[name] == expected, name
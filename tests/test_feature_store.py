@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from banking_analysis import load_and_preprocess, optimize_dtypes
+from feature_engineering import feature_engineering
+from feature_store import FeatureStore, load_or_build
+from synthetic_data import write_banking_csv
+
+AS_OF = '2024-06-30'
+
+
+@pytest.fixture(scope='module')
+def features(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'banking.csv'
+    write_banking_csv(path, 2000, seed=1)
+    df, _ = optimize_dtypes(load_and_preprocess(str(path)))
+    df_fe, _, _ = feature_engineering(df, as_of=AS_OF)
+    return df_fe
+
+
+def test_scan_round_trip(tmp_path, features):
+    store = FeatureStore(str(tmp_path))
+    store.write(features, AS_OF, {'outlier_cols': []})
+    pd.testing.assert_frame_equal(store.scan(AS_OF), features, check_categorical=True)
+    assert store.partitions() == [AS_OF]
+
+
+def test_lookup_by_customer_id(tmp_path, features):
+    store = FeatureStore(str(tmp_path))
+    store.write(features, AS_OF)
+    ids = list(features['Client ID'].iloc[[5, 1, 1500]]) + ['UNKNOWN']
+    found = store.lookup(ids, AS_OF)
+    assert list(found['Client ID']) == ids[:3]
+    np.testing.assert_array_equal(found['Estimated Income'], features['Estimated Income'].iloc[[5, 1, 1500]])
+
+
+def test_load_or_build_reuses_only_matching_params(tmp_path, features):
+    store = FeatureStore(str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return features, {'insights': []}
+    assert not load_or_build(store, AS_OF, compute, {'source': 'a'})[2]
+    assert load_or_build(store, AS_OF, compute, {'source': 'a'})[2]
+    assert not load_or_build(store, AS_OF, compute, {'source': 'b'})[2]
+    assert len(calls) == 2
+
+
+def test_replaced_file_at_same_path_is_rebuilt(tmp_path):
+    from batch_report import run_pipeline
+    store = FeatureStore(str(tmp_path / 'store'))
+    path = tmp_path / 'banking.csv'
+    hits = []
+    for seed in (1, 1, 2):  # same file twice, then a corrected file under the same name
+        write_banking_csv(path, 300, seed=seed)
+        manifest = run_pipeline(str(path), str(tmp_path / f'report{len(hits)}'), store=store, as_of=AS_OF)
+        hits.append(manifest['feature_store']['hit'])
+    assert hits == [False, True, False]
+
+
+def test_parameter_sets_on_one_date_keep_their_own_partitions(tmp_path, features):
+    store = FeatureStore(str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return features, {}
+    for _ in range(2):
+        for source in ('portfolio a', 'portfolio b'):
+            load_or_build(store, AS_OF, compute, {'source': source})
+    assert len(calls) == 2
+    assert store.partitions() == [AS_OF]
+    assert sorted(m['params']['source'] for m in store.manifests(AS_OF)) == ['portfolio a', 'portfolio b']
+    # Reads without parameters use the partition written last
+    store.write(features.iloc[:10], AS_OF, {'source': 'portfolio a'})
+    assert len(store.scan(AS_OF)) == 10
+    assert len(store.scan(AS_OF, params={'source': 'portfolio b'})) == len(features)
@@ -0,0 +1,52 @@
+import base64
+import re
+
+import pytest
+
+from analysis_pipeline import build_pipeline
+from html_report import _inline, export_html, render_figures, report_sections
+from outlier_detection import boxplot_figure
+from synthetic_data import write_banking_csv
+
+
+@pytest.fixture(scope='module')
+def values(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'banking.csv'
+    write_banking_csv(path, 1500, seed=29)
+    sources = {'source': str(path), 'outlier_cols': ['Age', 'Bank Deposits'], 'as_of': '2024-06-30',
+               'sample_rows': None}
+    return build_pipeline().run(sources, targets=['features', 'deposit'])
+
+
+def test_parallel_figures_match_serial(values):
+    raw, capped = values['raw'], values['capped']
+    figures = [(boxplot_figure, (raw[col], capped[col], col, 8, 2)) for col in ('Age', 'Bank Deposits')]
+    serial = render_figures(figures, processes=1)
+    assert render_figures(figures, processes=2) == serial
+    assert all(image.startswith(b'\x89PNG') for image in serial)
+    with pytest.raises(ValueError):
+        render_figures(figures, image_format='gif')
+
+
+def test_report_embeds_every_figure(values):
+    sections = report_sections(values)
+    assert len(sections) == 9
+    figures = sum(block[0] == 'figure' for _, blocks in sections for block in blocks)
+    text = export_html(sections, processes=2, image_format='jpeg')
+    images = re.findall(r'<img src="data:image/jpeg;base64,([^"]+)">', text)
+    assert len(images) == figures
+    assert all(base64.b64decode(image).startswith(b'\xff\xd8') for image in images)
+    assert "Segmentation results are not available." in text
+    assert "Credit model results are not available." in text
+    assert text.count('<h2>') == 9
+
+
+def test_text_is_escaped_except_bold_and_breaks():
+    assert _inline("**a** < b<br>c\nd") == "<b>a</b> &lt; b<br>c<br>d"
+    sections = [("<script>", [('code', "x < y"), ('items', [("<i>", "**ok**")])])]
+    text = export_html(sections, title="A & B")
+    assert "<script>" not in text and "&lt;script&gt;" in text
+    assert "<pre>x &lt; y</pre>" in text and "<li><b>&lt;i&gt;:</b> <b>ok</b></li>" in text
+    assert "<title>A &amp; B</title>" in text
+    with pytest.raises(ValueError):
+        export_html([("s", [('video', None)])])
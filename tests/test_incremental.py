@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from banking_analysis import load_and_preprocess
+from incremental import KEY, PortfolioState
+from synthetic_data import write_banking_csv
+
+AS_OF = '2024-06-30'
+
+
+@pytest.fixture(scope='module')
+def frames(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'banking.csv'
+    write_banking_csv(path, 3000, seed=3)
+    df = load_and_preprocess(str(path))
+    base, fresh = df.iloc[:2500].reset_index(drop=True), df.iloc[2500:2600]
+    changed = base.sample(200, random_state=0).copy()
+    changed['Bank Deposits'] *= 1.5
+    changed['Estimated Income'] += 1000
+    delta = pd.concat([changed, fresh], ignore_index=True)
+    merged = pd.concat([base[~base[KEY].isin(changed[KEY])], delta], ignore_index=True)
+    return base, delta, merged
+
+
+def test_refresh_matches_rebuild(frames):
+    base, delta, merged = frames
+    state = PortfolioState(base, AS_OF)
+    record = state.apply_delta(delta)
+    assert (record['updated'], record['inserted']) == (200, 100)
+    rebuilt = PortfolioState(merged, AS_OF)
+
+    got, want = state.summary(), rebuilt.summary()
+    assert got['shape'] == want['shape']
+    assert got['nulls'] == want['nulls']
+    assert got['unique_values'] == want['unique_values']
+    pd.testing.assert_frame_equal(got['description'], want['description'], rtol=1e-9)
+    pd.testing.assert_frame_equal(state.group_means(), rebuilt.group_means(), rtol=1e-9)
+    np.testing.assert_allclose(state.deposit_fit()['coef'], rebuilt.deposit_fit()['coef'], rtol=1e-6)
+    assert state.outlier_bounds(['Age', 'Bank Deposits']) == pytest.approx(
+        rebuilt.outlier_bounds(['Age', 'Bank Deposits']))
+    pd.testing.assert_frame_equal(state.features.sort_index(), rebuilt.features.sort_index(),
+                                  check_dtype=False, check_categorical=False)
+
+
+def test_refresh_does_not_hash_the_portfolio_index(frames, monkeypatch):
+    base, delta, _ = frames
+    state = PortfolioState(base, AS_OF)
+    sizes = []
+    isin = pd.Index.isin
+
+    def recording_isin(self, values, level=None):
+        sizes.append(max(len(self), len(values)))
+        return isin(self, values, level)
+    monkeypatch.setattr(pd.Index, 'isin', recording_isin)
+    state.apply_delta(delta.iloc[:50])
+    state.apply_delta(delta.iloc[50:])
+    assert max(sizes, default=0) <= len(delta)
@@ -0,0 +1,67 @@
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from instrumentation import Tracer, active_tracer, owned_mb, span, tracing
+
+
+def test_spans_nest_and_record_rows():
+    tracer = Tracer()
+    with tracing(tracer):
+        with span("outer", rows=10):
+            with span("inner", category='figure'):
+                sum(range(10000))
+    assert active_tracer() is None
+    frame = tracer.to_frame()
+    assert frame['name'].tolist() == ['outer', 'inner']
+    outer, inner = (frame.set_index('name').loc[name] for name in ('outer', 'inner'))
+    assert (outer['depth'], inner['depth']) == (0, 1)
+    assert outer['rows'] == 10 and inner['category'] == 'figure'
+    assert outer['wall_s'] >= inner['wall_s'] >= 0
+
+
+def test_span_is_a_no_op_without_a_tracer():
+    with span("untraced") as s:
+        pass
+    assert s is None and active_tracer() is None
+
+
+def test_failing_block_is_still_recorded():
+    tracer = Tracer()
+    with tracing(tracer), pytest.raises(ValueError):
+        with span("fails"):
+            raise ValueError
+    assert [r['name'] for r in tracer.records] == ['fails']
+
+
+def test_tracer_is_local_to_its_context():
+    tracer = Tracer()
+    seen = []
+    with tracing(tracer):
+        thread = threading.Thread(target=lambda: seen.append(active_tracer()))
+        thread.start()
+        thread.join()
+    assert seen == [None]
+
+
+def test_chrome_trace_events():
+    tracer = Tracer()
+    with tracing(tracer):
+        with span("load", rows=5):
+            pass
+    trace = json.loads(tracer.to_chrome_trace())
+    (event,) = trace['traceEvents']
+    assert event['name'] == 'load' and event['ph'] == 'X' and event['args']['rows'] == 5
+    assert json.loads(tracer.to_json())[0]['name'] == 'load'
+
+
+def test_owned_mb_counts_only_new_columns():
+    base = pd.DataFrame({'a': np.zeros(131072), 'b': np.ones(131072)})
+    derived = base.copy(deep=False)
+    derived['c'] = base['a'] + 1
+    assert owned_mb(base) == pytest.approx(2.0)
+    assert owned_mb(derived, [base]) == pytest.approx(1.0)
+    assert owned_mb(base.copy(), [base]) == pytest.approx(2.0)
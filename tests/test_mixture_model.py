@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.mixture import GaussianMixture
+from sklearn.preprocessing import StandardScaler
+
+from mixture_model import (MixtureState, ParallelGaussianMixture, _log_resp, default_state_dir, fingerprint_close,
+                           stochastic_em)
+
+
+@pytest.fixture(scope='module')
+def X():
+    rng = np.random.default_rng(0)
+    centres = np.array([[0, 0, 0], [5, 0, 2], [0, 5, -2], [5, 5, 4]])
+    return np.vstack([rng.normal(c, [1.0, 0.5, 1.5], size=(300, 3)) for c in centres])
+
+
+def test_restarts_never_worse_than_single_run(X):
+    single = GaussianMixture(n_components=4, random_state=42).fit(X)
+    gmm = ParallelGaussianMixture(n_components=4, n_jobs=2).fit(X)
+    assert gmm.start_ == 'cold' and not gmm.stochastic_
+    assert gmm.lower_bound_ >= single.lower_bound_ - 1e-12
+    one = ParallelGaussianMixture(n_components=4, n_init=1, n_jobs=1).fit(X)
+    np.testing.assert_allclose(one.model_.means_, single.means_)
+    np.testing.assert_array_equal(one.predict(X), single.predict(X))
+
+
+def test_warm_start_round_trips_through_original_units(X, tmp_path):
+    scaler = StandardScaler().fit(X)
+    X_scaled = scaler.transform(X)
+    state = MixtureState(str(tmp_path))
+    columns = ['a', 'b', 'c']
+    cold = ParallelGaussianMixture(n_components=4, n_jobs=1, state=state, columns=columns,
+                                   scaler=scaler).fit(X_scaled)
+    saved = state.load(columns, 4)
+    np.testing.assert_allclose(saved['means'], scaler.inverse_transform(cold.model_.means_))
+    assert saved['rows'] == len(X)
+
+    warm = ParallelGaussianMixture(n_components=4, n_jobs=1, state=state, columns=columns,
+                                   scaler=scaler).fit(X_scaled)
+    assert (cold.start_, warm.start_) == ('cold', 'warm')
+    assert warm.n_iter_ < cold.n_iter_
+    assert warm.lower_bound_ == pytest.approx(cold.lower_bound_, abs=1e-3)
+    assert state.load(columns, 3) is None
+
+
+def test_shifted_data_starts_cold(X, tmp_path):
+    state = MixtureState(str(tmp_path))
+    ParallelGaussianMixture(n_components=4, n_jobs=1, state=state).fit(X)
+    shifted = ParallelGaussianMixture(n_components=4, n_jobs=1, state=state).fit(X + X.std(axis=0))
+    assert shifted.start_ == 'cold'
+
+
+def test_fingerprint_close():
+    previous = {'data_mean': np.array([10.0, 0.0]), 'data_scale': np.array([2.0, 1.0])}
+    assert fingerprint_close(previous, np.array([10.05, 0.04]), np.array([2.05, 0.98]))
+    assert not fingerprint_close(previous, np.array([10.2, 0.0]), np.array([2.0, 1.0]))
+    assert not fingerprint_close(previous, np.array([10.0, 0.0]), np.array([2.2, 1.0]))
+    assert not fingerprint_close(previous, np.array([10.0]), np.array([2.0]))
+
+
+def test_log_resp_matches_sklearn(X):
+    model = GaussianMixture(n_components=4, random_state=0).fit(X)
+    params = {'weights': model.weights_, 'means': model.means_, 'covariances': model.covariances_}
+    log_resp, ll = _log_resp(X, params)
+    np.testing.assert_allclose(np.exp(log_resp), model.predict_proba(X), atol=1e-8)
+    assert ll == pytest.approx(model.score(X))
+
+
+def test_stochastic_em_reaches_full_em_likelihood(X):
+    full = GaussianMixture(n_components=4, random_state=42).fit(X)
+    gmm = ParallelGaussianMixture(n_components=4, n_jobs=1, minibatch_rows=500, batch_size=200).fit(X)
+    assert gmm.stochastic_ and gmm.n_batches_ > 0
+    assert gmm.model_.score(X) == pytest.approx(full.score(X), abs=0.05)
+
+    init = {'weights': np.full(4, 0.25), 'means': X[[0, 1, 2, 3]], 'covariances': np.stack([np.eye(3)] * 4)}
+    params, batches = stochastic_em(X, init, batch_size=100)
+    assert batches % 12 == 0
+    assert _log_resp(X, params)[1] >= _log_resp(X, init)[1]
+
+
+def test_dashboard_state_stays_out_of_the_working_directory(tmp_path, monkeypatch):
+    from analysis_pipeline import segment_features
+    from banking_analysis import load_and_preprocess
+    from feature_engineering import feature_engineering
+    from synthetic_data import write_banking_csv
+    data = tmp_path / 'banking.csv'
+    write_banking_csv(data, 300, seed=3)
+    df_fe = feature_engineering(load_and_preprocess(str(data)), as_of='2024-06-30')[0]
+    cwd = tmp_path / 'cwd'
+    cwd.mkdir()
+    monkeypatch.chdir(cwd)
+    monkeypatch.delenv('MODEL_STATE_DIR', raising=False)
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    assert default_state_dir() == str(tmp_path / 'home' / '.cache' / 'banking-analytics' / 'model_state')
+    assert MixtureState().root == default_state_dir()
+
+    monkeypatch.setenv('MODEL_STATE_DIR', str(tmp_path / 'state'))
+    segment_features(df_fe, default_state_dir())
+    assert [name for name in os.listdir(tmp_path / 'state') if name.startswith('gmm_')]
+    assert os.listdir(cwd) == []
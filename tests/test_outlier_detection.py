@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from outlier_detection import cap_columns, iqr_bounds
+
+
+def test_capping_module_imports_without_streamlit():
+    code = "import sys, outlier_detection; sys.exit('streamlit' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code],
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).returncode == 0
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_cap_columns(n_jobs):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'a': rng.normal(size=500), 'b': rng.exponential(size=500), 'c': np.arange(500)})
+    df.loc[0, 'a'] = 50.0
+    capped, bounds = cap_columns(df, ['a', 'b'], n_jobs=n_jobs)
+    for col in ('a', 'b'):
+        lower, upper = iqr_bounds(df[col])
+        assert bounds[col] == (lower, upper)
+        pd.testing.assert_series_equal(capped[col], df[col].clip(lower, upper))
+    assert df.loc[0, 'a'] == 50.0
+
+
+def test_cap_columns_without_copy_shares_untouched_columns():
+    df = pd.DataFrame({'a': np.r_[np.arange(99.0), 1e6], 'c': np.arange(100)})
+    capped, bounds = cap_columns(df, ['a'], copy=False)
+    assert capped['a'].max() == bounds['a'][1] and df['a'].max() == 1e6
+    assert np.shares_memory(capped['c'].to_numpy(), df['c'].to_numpy())
+    assert not np.shares_memory(capped['a'].to_numpy(), df['a'].to_numpy())
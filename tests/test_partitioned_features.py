@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from banking_analysis import load_and_preprocess
+from feature_engineering import (FeatureTransformer, feature_engineering, format_insights, insight_partials,
+                                 merge_insight_partials)
+from partitioned_features import feature_engineering_partitioned, partition_edges
+from synthetic_data import write_banking_csv
+
+AS_OF = '2024-06-30'
+
+
+@pytest.fixture(scope='module')
+def raw(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'banking.csv'
+    write_banking_csv(path, 3000, seed=11)
+    return load_and_preprocess(str(path))
+
+
+def test_partition_edges():
+    np.testing.assert_array_equal(partition_edges(100, 4, min_rows=10), [0, 25, 50, 75, 100])
+    np.testing.assert_array_equal(partition_edges(100, 4, min_rows=40), [0, 50, 100])
+    np.testing.assert_array_equal(partition_edges(100, 4, min_rows=200), [0, 100])
+
+
+@pytest.mark.parametrize('partitions', [3, 7])
+@pytest.mark.parametrize('as_of', [AS_OF, None])
+def test_partitioned_frame_is_identical_to_serial(raw, partitions, as_of):
+    serial, new_features, insights = feature_engineering(raw, as_of=as_of)
+    frame, partitioned_features, partitioned_insights = feature_engineering_partitioned(
+        raw, as_of=as_of, partitions=partitions, min_rows=100)
+    assert partitioned_features == new_features
+    pd.testing.assert_frame_equal(frame, serial, check_exact=True)
+    assert partitioned_insights == insights
+
+
+def test_missing_columns_are_skipped_alike(raw):
+    df = raw.drop(columns=['Joined Bank', 'Estimated Income'])
+    serial, new_features, insights = feature_engineering(df, as_of=AS_OF)
+    frame, _, partitioned_insights = feature_engineering_partitioned(df, as_of=AS_OF, partitions=4, min_rows=100)
+    pd.testing.assert_frame_equal(frame, serial, check_exact=True)
+    assert partitioned_insights == insights
+
+
+def test_insight_partials_merge_exactly(raw):
+    transformer = FeatureTransformer(as_of=AS_OF).fit(raw)
+    block, joined = transformer._inputs(raw)
+
+    def partials(start, stop):
+        values = transformer._evaluate(block[start:stop], None if joined is None else joined[start:stop])
+        return insight_partials(values, transformer.new_features_)
+    whole = format_insights(partials(0, len(raw)))
+    pieces = [partials(0, 1), partials(1, 1234), partials(1234, len(raw))]
+    merged = merge_insight_partials(merge_insight_partials(pieces[0], pieces[1]), pieces[2])
+    assert format_insights(merged) == whole
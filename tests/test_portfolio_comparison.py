@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from portfolio_comparison import (auc_table, coefficient_table, compare_portfolios, portfolio_name, run_portfolio,
+                                  summary_table)
+from synthetic_data import write_banking_csv
+
+
+def test_comparison_cli_imports_without_streamlit():
+    code = "import sys, portfolio_comparison; sys.exit('streamlit' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code],
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).returncode == 0
+
+
+@pytest.fixture(scope='module')
+def paths(tmp_path_factory):
+    root = tmp_path_factory.mktemp('data')
+    paths = {}
+    for name, seed in (('q1', 31), ('q2', 37)):
+        paths[name] = str(root / f'{name}.csv')
+        write_banking_csv(paths[name], 600, seed=seed)
+    return paths
+
+
+@pytest.fixture(scope='module')
+def compared(paths):
+    caches, calls = {}, []
+    with ThreadPoolExecutor(2) as pool:
+        results = compare_portfolios(paths, caches=caches, executor=pool,
+                                     progress=lambda done, total, label: calls.append(done))
+    return results, caches, calls
+
+
+def assert_same_aggregates(got, want):
+    assert (got['rows'], got['columns'], got['missing']) == (want['rows'], want['columns'], want['missing'])
+    pd.testing.assert_series_equal(got['means'], want['means'])
+    pd.testing.assert_series_equal(got['coefficients'], want['coefficients'])
+    assert got['aucs'] == pytest.approx(want['aucs'])
+    for method, profile in want['profiles'].items():
+        pd.testing.assert_frame_equal(got['profiles'][method], profile)
+
+
+def test_shared_pool_matches_each_portfolio_alone(paths, compared):
+    results, _, calls = compared
+    assert list(results) == ['q1', 'q2'] and calls == [0, 1, 2]
+    for name, path in paths.items():
+        with ThreadPoolExecutor(1) as pool:
+            assert_same_aggregates(results[name], run_portfolio(path, executor=pool))
+
+
+def test_tables_have_one_column_per_portfolio(compared):
+    results, _, _ = compared
+    for table in (summary_table(results), auc_table(results), coefficient_table(results)):
+        assert list(table.columns) == ['q1', 'q2']
+    assert summary_table(results).loc['Rows'].tolist() == [600, 600]
+    assert 'R²' in coefficient_table(results).index
+
+
+def test_caches_are_reused_and_pruned(paths, compared):
+    results, caches, _ = compared
+    assert set(caches) == {'q1', 'q2'}
+    cached = {name: dict(cache) for name, cache in caches.items()}
+    with ThreadPoolExecutor(2) as pool:
+        again = compare_portfolios({'q1': paths['q1']}, caches=caches, executor=pool)
+    assert set(caches) == {'q1'}
+    assert all(caches['q1'][stage] is cached['q1'][stage] for stage in cached['q1'])  # nothing recomputed
+    assert_same_aggregates(again['q1'], results['q1'])
+    assert portfolio_name('/data/q1.csv') == 'q1'
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats as sps
+
+from regression_engine import RegressionStats
+
+FEATURES = ['a', 'b', 'c']
+
+
+@pytest.fixture(scope='module')
+def df():
+    rng = np.random.default_rng(0)
+    X = rng.normal([1e6, 50, 0], [1e5, 10, 1], size=(3000, 3))
+    y = 2 + X @ [3e-3, -1.5, 4.0] + rng.normal(0, 5, len(X))
+    frame = pd.DataFrame(X, columns=FEATURES).assign(y=y)
+    frame.loc[[5, 10], 'b'] = np.nan
+    return frame
+
+
+def ols(frame, features):
+    """Reference fit on the design matrix [1, X], over the rows complete in every tracked column."""
+    frame = frame.dropna()
+    design = np.column_stack([np.ones(len(frame)), frame[features].to_numpy()])
+    y = frame['y'].to_numpy()
+    beta, *_ = np.linalg.lstsq(design, y, rcond=None)
+    resid = y - design @ beta
+    sigma2 = resid @ resid / (len(y) - design.shape[1])
+    cov = sigma2 * np.linalg.inv(design.T @ design)
+    return beta, np.sqrt(np.diag(cov)), resid, design, cov
+
+
+@pytest.mark.parametrize('features', [FEATURES, ['c', 'a']])
+def test_solve_matches_ols(df, features):
+    fit = RegressionStats.from_frame(df, FEATURES, 'y').solve(features)
+    beta, se, resid, _, _ = ols(df, features)
+    assert fit['n'] == len(df) - 2
+    np.testing.assert_allclose(fit['coef'], beta[1:], rtol=1e-8)
+    assert fit['intercept'] == pytest.approx(beta[0], rel=1e-6)
+    np.testing.assert_allclose(fit['std_err'], se[1:], rtol=1e-6)
+    assert fit['intercept_std_err'] == pytest.approx(se[0], rel=1e-6)
+    assert fit['mse'] == pytest.approx(resid @ resid / len(resid), rel=1e-8)
+    y = df.dropna()['y']
+    assert fit['r2'] == pytest.approx(1 - resid @ resid / ((y - y.mean()) ** 2).sum(), rel=1e-8)
+
+
+def test_chunks_merge_to_the_one_pass_stats(df):
+    whole = RegressionStats.from_frame(df, FEATURES, 'y')
+    chunked = RegressionStats.from_chunks([df.iloc[i:i + 700] for i in range(0, len(df), 700)], FEATURES, 'y')
+    assert chunked.n == whole.n
+    np.testing.assert_allclose(chunked.mean, whole.mean, rtol=1e-12)
+    np.testing.assert_allclose(chunked.comoment, whole.comoment, rtol=1e-9)
+    with pytest.raises(ValueError):
+        RegressionStats(FEATURES, 'y').merge(RegressionStats(['a'], 'y'))
+
+
+def test_remove_and_update_match_a_rebuild(df):
+    whole = RegressionStats.from_frame(df, FEATURES, 'y')
+    changed = df.iloc[100:400].assign(y=lambda f: f['y'] + 10)
+    updated = whole.copy().remove(df.iloc[100:400]).update(changed)
+    rebuilt = RegressionStats.from_frame(pd.concat([df.drop(df.index[100:400]), changed]), FEATURES, 'y')
+    np.testing.assert_allclose(updated.solve()['coef'], rebuilt.solve()['coef'], rtol=1e-8)
+    assert whole.n == len(df) - 2  # copy() left the original alone
+
+    assert RegressionStats(FEATURES, 'y').update(df).remove(df).n == 0
+    with pytest.raises(ValueError):
+        RegressionStats(FEATURES, 'y').update(df.iloc[:10]).remove(df.iloc[:20])
+
+
+def test_gram_is_the_raw_design_moments(df):
+    xtx, xty, yty = RegressionStats.from_frame(df, FEATURES, 'y').gram()
+    _, _, _, design, _ = ols(df, FEATURES)
+    y = df.dropna()['y'].to_numpy()
+    np.testing.assert_allclose(xtx, design.T @ design, rtol=1e-9)
+    np.testing.assert_allclose(xty, design.T @ y, rtol=1e-9)
+    assert yty == pytest.approx(y @ y, rel=1e-9)
+
+
+def test_held_out_score_matches_residuals(df):
+    train, test = df.iloc[:2000], df.iloc[2000:].dropna()
+    stats = RegressionStats.from_frame(train, FEATURES, 'y')
+    fit = stats.solve()
+    resid = test['y'].to_numpy() - stats.predict(test, fit)
+    scored = RegressionStats.from_frame(test, FEATURES, 'y').score(fit)
+    assert scored['mse'] == pytest.approx(resid @ resid / len(resid), rel=1e-8)
+    assert scored['r2'] == pytest.approx(1 - resid @ resid / ((test['y'] - test['y'].mean()) ** 2).sum(), rel=1e-8)
+    assert stats.corr('c') == pytest.approx(train.dropna()[['c', 'y']].corr().iloc[0, 1], rel=1e-9)
+
+
+def test_confidence_band_matches_the_design_formula(df):
+    train = df.iloc[:2000]
+    stats = RegressionStats.from_frame(train, FEATURES, 'y')
+    fit = stats.solve()
+    X = df.iloc[2000:].dropna()[FEATURES].to_numpy()[:5]
+    y_hat, lower, upper = stats.confidence_band(fit, X)
+    _, _, _, design, cov = ols(train, FEATURES)
+    rows = np.column_stack([np.ones(len(X)), X])
+    half = sps.t.ppf(0.975, len(design) - 4) * np.sqrt(np.einsum('ij,jk,ik->i', rows, cov, rows))
+    np.testing.assert_allclose(y_hat, rows @ np.r_[fit['intercept'], fit['coef']])
+    np.testing.assert_allclose(upper - y_hat, half, rtol=1e-6)
+    np.testing.assert_allclose(y_hat - lower, half, rtol=1e-6)
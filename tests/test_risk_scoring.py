@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.svm import SVC
+
+from banking_analysis import load_and_preprocess
+from credit_risk_modelling import RISK_FEATURES, risk_target
+from feature_engineering import FeatureTransformer
+from risk_scoring import RiskScorer, compile_model
+from synthetic_data import write_banking_csv
+
+AS_OF = '2024-06-30'
+
+
+@pytest.fixture(scope='module')
+def data(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'banking.csv'
+    write_banking_csv(path, 2000, seed=13)
+    raw = load_and_preprocess(str(path))
+    transformer = FeatureTransformer(as_of=AS_OF).fit(raw)
+    df = transformer.transform(raw)
+    return raw, transformer, df[RISK_FEATURES].to_numpy(dtype=float), risk_target(df).to_numpy()
+
+
+@pytest.fixture(scope='module')
+def models(data):
+    _, _, X, y = data
+    return {
+        "Random Forest": RandomForestClassifier(n_estimators=20, random_state=42).fit(X, y),
+        "Gradient Boosting": GradientBoostingClassifier(n_estimators=30, random_state=42).fit(X, y),
+    }
+
+
+@pytest.mark.parametrize('name', ["Random Forest", "Gradient Boosting"])
+def test_compiled_probabilities_match_sklearn(data, models, name):
+    _, _, X, _ = data
+    compiled = compile_model(models[name])
+    want = models[name].predict_proba(X)[:, 1]
+    np.testing.assert_allclose(compiled.predict_proba(X), want, rtol=1e-9, atol=1e-12)
+    assert float(compiled.predict_proba(X[7])) == pytest.approx(want[7], rel=1e-9)
+
+
+def test_zero_init_gradient_boosting(data):
+    _, _, X, y = data
+    model = GradientBoostingClassifier(n_estimators=10, init='zero', random_state=0).fit(X, y)
+    np.testing.assert_allclose(compile_model(model).predict_proba(X), model.predict_proba(X)[:, 1], rtol=1e-9)
+
+
+def test_missing_values_follow_sklearn(data):
+    _, _, X, y = data
+    X = X.copy()
+    X[np.random.default_rng(0).random(X.shape) < 0.1] = np.nan
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    np.testing.assert_allclose(compile_model(model).predict_proba(X), model.predict_proba(X)[:, 1], rtol=1e-9)
+
+
+def test_unsupported_models_are_rejected(data):
+    _, _, X, y = data
+    with pytest.raises(TypeError):
+        compile_model(SVC().fit(X[:200], y[:200]))
+    three = GradientBoostingClassifier(n_estimators=2).fit(X, y + (X[:, 0] > np.median(X[:, 0])))
+    with pytest.raises(ValueError):
+        compile_model(three)
+
+
+def test_scorer_round_trip_and_raw_records(data, models, tmp_path):
+    raw, transformer, X, _ = data
+    scorer = RiskScorer.from_results({'models': models}, transformer)
+    path = tmp_path / 'scorer.npz'
+    scorer.save(path)
+    loaded = RiskScorer.load(path, transformer)
+    assert sorted(loaded.models) == sorted(models)
+    for name, model in models.items():
+        np.testing.assert_array_equal(loaded.score_batch(X, name), scorer.score_batch(X, name))
+        for i in (0, 99):
+            assert loaded.score(raw.iloc[i].to_dict(), name) == pytest.approx(
+                model.predict_proba(X[i:i + 1])[0, 1], rel=1e-9)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from banking_analysis import load_and_preprocess
+from sampling import StratifiedSample, build_sample, strata_codes
+from synthetic_data import write_banking_csv
+
+
+@pytest.fixture(scope='module')
+def population(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'banking.csv'
+    write_banking_csv(path, 20000, seed=17)
+    return load_and_preprocess(str(path))
+
+
+def test_design(population):
+    sample = StratifiedSample(population, rows=1000, seed=0)
+    codes, labels = strata_codes(population)
+    assert len(sample) == sample.sampled.sum()
+    assert abs(len(sample) - 1000) <= len(labels)
+    assert (sample.sampled >= np.minimum(2, sample.population)).all()
+    assert sample.weights.sum() == pytest.approx(len(population))
+    np.testing.assert_array_equal(sample.codes, codes[population.index.get_indexer(sample.index)])
+    assert build_sample(population, len(population)) is None and build_sample(population, 0) is None
+
+
+def test_census_has_no_sampling_error(population):
+    sample = StratifiedSample(population, rows=len(population))
+    estimate, se, lower, upper = sample.domain_mean(population['Bank Deposits'].loc[sample.index])
+    assert estimate == pytest.approx(population['Bank Deposits'].mean())
+    assert se == pytest.approx(0.0, abs=1e-9)
+    shares = sample.share_table(population['Nationality'].loc[sample.index].to_numpy())
+    assert shares['Share'].sum() == pytest.approx(1.0)
+
+
+def test_confidence_intervals_cover_the_population_value(population):
+    deposits = population['Bank Deposits']
+    europe = (population['Nationality'] == 'European').to_numpy()
+    truth = deposits.mean(), deposits[europe].mean()
+    covered, repeats = np.zeros(2), 200
+    for seed in range(repeats):
+        sample = StratifiedSample(population, rows=1000, seed=seed)
+        values = deposits.loc[sample.index].to_numpy()
+        mask = europe[population.index.get_indexer(sample.index)]
+        for k, (_, _, lower, upper) in enumerate([sample.domain_mean(values), sample.domain_mean(values, mask)]):
+            covered[k] += lower <= truth[k] <= upper
+    # 95% intervals: the binomial 99.9% band over 200 repeats is roughly 90%-99%
+    assert ((covered / repeats >= 0.90) & (covered / repeats <= 0.99)).all(), covered / repeats
+
+
+def test_group_table_matches_domain_means(population):
+    sample = StratifiedSample(population, rows=2000, seed=1)
+    table = sample.group_mean_table(population, ['Nationality'], 'Bank Deposits')
+    frame = population.loc[sample.index]
+    for nationality, row in table.iterrows():
+        mask = (frame['Nationality'] == nationality).to_numpy()
+        assert tuple(row) == pytest.approx(sample.domain_mean(frame['Bank Deposits'].to_numpy(), mask))
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+
+from credit_risk_modelling import RISK_FEATURES
+from risk_scoring import RiskScorer
+from scoring_service import ModelStore, ScoringService, serve
+
+
+@pytest.fixture(scope='module')
+def X():
+    return np.random.default_rng(0).normal(size=(400, len(RISK_FEATURES)))
+
+
+def write_scorer(path, X, seed):
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int)
+    models = {"Random Forest": RandomForestClassifier(n_estimators=5, random_state=seed).fit(X, y),
+              "Gradient Boosting": GradientBoostingClassifier(n_estimators=10, random_state=seed).fit(X, y)}
+    RiskScorer.from_results({'models': models}).save(path)
+    return models
+
+
+def test_batched_scores_match_direct_scoring(X, tmp_path):
+    path = str(tmp_path / 'scorer.npz')
+    models = write_scorer(path, X, 0)
+    service = ScoringService(ModelStore(path), max_batch=16, window_ms=20.0)
+    payloads = [{'features': dict(zip(RISK_FEATURES, row)), 'model': name}
+                for row in X[:64] for name in models]
+    with ThreadPoolExecutor(32) as pool:
+        results = list(pool.map(service.score, payloads))
+    for payload, result in zip(payloads, results):
+        row = np.array([payload['features'][col] for col in RISK_FEATURES])
+        want = models[payload['model']].predict_proba(row[None, :])[0, 1]
+        assert result['probability'] == pytest.approx(want, rel=1e-9)
+        assert result['high_risk'] == (want >= 0.5)
+    assert max(result['batch_size'] for result in results) > 1
+    assert all(result['batch_size'] <= 16 for result in results)
+
+
+def test_bad_requests_are_rejected(X, tmp_path):
+    path = str(tmp_path / 'scorer.npz')
+    write_scorer(path, X, 0)
+    service = ScoringService(ModelStore(path))
+    with pytest.raises(ValueError):
+        service.score({'features': [1.0, 2.0]})
+    with pytest.raises(ValueError):
+        service.score({})
+    with pytest.raises(KeyError):
+        service.score({'features': list(X[0]), 'model': 'SVM'})
+    assert service.score({'features': list(X[0])})['model'] == "Gradient Boosting"
+
+
+def test_client_ids_are_scored_from_the_feature_store(X, tmp_path):
+    import pandas as pd
+    from feature_store import FeatureStore
+    path = str(tmp_path / 'scorer.npz')
+    models = write_scorer(path, X, 0)
+    frame = pd.DataFrame(X[:50], columns=RISK_FEATURES).assign(**{'Client ID': [f"IND{i:05d}" for i in range(50)]})
+    store = FeatureStore(str(tmp_path / 'store'))
+    store.write(frame, '2024-06-30')
+    service = ScoringService(ModelStore(path), as_of='2024-06-30', feature_store=store)
+    result = service.score({'client_id': 'IND00007', 'model': 'Random Forest'})
+    assert result['probability'] == pytest.approx(models['Random Forest'].predict_proba(X[7:8])[0, 1], rel=1e-9)
+    with pytest.raises(KeyError):
+        service.score({'client_id': 'UNKNOWN'})
+    with pytest.raises(ValueError):
+        ScoringService(ModelStore(path)).score({'client_id': 'IND00007'})
+
+
+def test_store_reloads_changed_file_and_keeps_models_on_bad_file(X, tmp_path):
+    path = str(tmp_path / 'scorer.npz')
+    write_scorer(path, X, 0)
+    store = ModelStore(path, check_seconds=0.0)
+    first, version = store.current()
+    assert version == 1 and store.current()[1] == 1
+
+    models = write_scorer(path, X, 1)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    scorer, version = store.current()
+    assert version == 2
+    np.testing.assert_allclose(scorer.score_batch(X, "Random Forest"),
+                               models["Random Forest"].predict_proba(X)[:, 1], rtol=1e-9)
+
+    with open(path, 'wb') as f:
+        f.write(b'not an npz')
+    assert not store.reload(force=True)
+    assert store.last_error is not None
+    assert store.current() == (scorer, 2)
+
+
+def test_http_round_trip(X, tmp_path):
+    path = str(tmp_path / 'scorer.npz')
+    models = write_scorer(path, X, 0)
+    server, service = serve(path, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        body = json.dumps({'features': list(X[3]), 'model': "Random Forest"}).encode()
+        with urllib.request.urlopen(urllib.request.Request(f"{url}/score", data=body)) as response:
+            result = json.load(response)
+        assert result['probability'] == pytest.approx(models["Random Forest"].predict_proba(X[3:4])[0, 1])
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(urllib.request.Request(f"{url}/score", data=b'{"features": [1]}'))
+        assert error.value.code == 400
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            metrics = json.load(response)
+        assert (metrics['requests'], metrics['errors']) == (2, 1)
+        assert metrics['model']['version'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
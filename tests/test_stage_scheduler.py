@@ -0,0 +1,80 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from stage_scheduler import Stage, StageGraph, fingerprint
+
+
+def counting_stages(calls, barrier=None):
+    def record(name, func):
+        def run(*args):
+            calls.append(name)
+            return func(*args)
+        return run
+
+    def wait_for_sibling(value):
+        if barrier is not None:
+            barrier.wait(timeout=5)  # only passes if both branches run at the same time
+        return value
+
+    return [
+        Stage('double', record('double', lambda x: 2 * x), inputs=['x'], outputs='doubled'),
+        Stage('left', record('left', lambda d: wait_for_sibling(d + 1)), inputs=['doubled'], outputs='l'),
+        Stage('right', record('right', lambda d, y: wait_for_sibling(d * y)), inputs=['doubled', 'y'],
+              outputs='r'),
+        Stage('join', record('join', lambda l, r: (l, r)), inputs=['l', 'r'], outputs=['pair', 'total']),
+    ]
+
+
+def test_independent_stages_overlap_and_outputs_unpack():
+    calls = []
+    graph = StageGraph(counting_stages(calls, threading.Barrier(2)), max_workers=2)
+    values = graph.run({'x': 3, 'y': 10})
+    assert (values['pair'], values['total']) == (7, 60)
+    assert calls[0] == 'double' and calls[-1] == 'join'
+    assert set(graph.run_report().index) == {'double', 'left', 'right', 'join'}
+
+
+def test_rerun_recomputes_only_downstream_of_a_changed_source():
+    calls = []
+    graph = StageGraph(counting_stages(calls))
+    graph.run({'x': 3, 'y': 10})
+    calls.clear()
+    assert graph.run({'x': 3, 'y': 10})['total'] == 60
+    assert calls == []
+    assert graph.run_report()['cached'].all()
+    assert graph.run({'x': 3, 'y': 11})['total'] == 66
+    assert sorted(calls) == ['join', 'right']
+
+
+def test_targets_run_only_what_they_need():
+    calls = []
+    values = StageGraph(counting_stages(calls)).run({'x': 3}, targets=['l'])
+    assert values['l'] == 7
+    assert sorted(calls) == ['double', 'left']
+    with pytest.raises(KeyError):
+        StageGraph(counting_stages([])).run({'x': 3}, targets=['r'])
+
+
+def test_errors():
+    with pytest.raises(ValueError, match='produced by both'):
+        StageGraph([Stage('a', int, outputs='v'), Stage('b', int, outputs='v')])
+    cycle = [Stage('a', int, inputs=['b'], outputs='a'), Stage('b', int, inputs=['a'], outputs='b')]
+    with pytest.raises(ValueError, match='cycle'):
+        StageGraph(cycle).run({}, targets=['a'])
+
+    def fail(x):
+        raise RuntimeError('boom')
+    graph = StageGraph([Stage('bad', fail, inputs=['x'])])
+    with pytest.raises(RuntimeError, match='boom'):
+        graph.run({'x': 1})
+    assert graph.cache == {}
+
+
+def test_fingerprint_is_by_content():
+    df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    assert fingerprint(df) == fingerprint(df.copy())
+    assert fingerprint(df) != fingerprint(df.assign(a=[1, 3]))
+    assert fingerprint(df) != fingerprint(df.rename(columns={'b': 'c'}))
+    assert fingerprint(b'abc') == fingerprint(bytearray(b'abc'))
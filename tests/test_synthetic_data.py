@@ -0,0 +1,24 @@
+import io
+
+import pandas as pd
+
+import synthetic_data
+from banking_analysis import load_and_preprocess
+from synthetic_data import COLUMNS, generate_banking_data, write_banking_csv
+
+
+def test_streamed_csv_matches_the_frame(tmp_path, monkeypatch):
+    monkeypatch.setattr(synthetic_data, 'CHUNK_ROWS', 300)
+    path = write_banking_csv(tmp_path / 'banking.csv', 1000, seed=3)
+    frame = generate_banking_data(1000, seed=3)
+    assert list(frame.columns) == COLUMNS and len(frame) == 1000
+    assert frame['Client ID'].is_unique
+    pd.testing.assert_frame_equal(pd.read_csv(path), pd.read_csv(io.StringIO(frame.to_csv(index=False))))
+    assert not generate_banking_data(1000, seed=4).equals(frame)
+
+
+def test_output_loads_like_banking_csv(tmp_path):
+    df = load_and_preprocess(str(write_banking_csv(tmp_path / 'banking.csv', 500)))
+    assert len(df) == 500
+    assert df['Bank Deposits'].dtype.kind == 'f' and df['Age'].dtype.kind in 'if'
+    assert set(df['Loyalty Classification']) <= set(synthetic_data.LOYALTY)